@@ -0,0 +1,21 @@
+#Checks that a sharded run combined by ppi2pdb merge writes the same output as a serial run
+#Requirements
+#mentha2pdb.py
+#ppi2pdb (pip install ..)
+#2025-04-28 symbolic link to the local version of Mentha (see do.sh)
+
+#targets of the check, balanced over the shards by number of mentha interactions
+printf "P54252\nQ9GZQ8\nO15315\nP55072\n" > check_targets.txt
+
+python ../mentha2pdb.py -i 2025-04-28 -t check_targets.txt -s 0.2 -o check_serial.csv -p
+for i in 1 2 3; do
+    python ../mentha2pdb.py -i 2025-04-28 -t check_targets.txt -s 0.2 -o check_sharded.csv -p --shard $i/3
+done
+ppi2pdb merge check_sharded.shard-*-of-3.json
+
+if diff check_serial.csv check_sharded.csv; then
+    echo "sharded output identical to the serial one"
+else
+    echo "sharded output differs from the serial one"
+    exit 1
+fi
@@ -0,0 +1,45 @@
+"""
+MAVISp INTERACTOME module tools: mentha2pdb, string2pdb and aggregate.
+
+The functions below can be used from other Python programs and return pandas
+DataFrames. They are imported lazily, together with pandas, numpy and requests,
+the first time they are accessed, e.g.:
+
+    import ppi2pdb
+
+    data = ppi2pdb.load_mentha('2025-04-28', '0.2')
+    for target, df in ppi2pdb.mentha_interactors(['Q9GZQ8', 'P54252'], data=data).items():
+        ...
+"""
+
+__version__ = "1.0.0"
+
+# public name -> (module, attribute)
+_API = {
+    'load_mentha': ('mentha2pdb', 'load_mentha'),
+    'mentha_interactors': ('mentha2pdb', 'mentha_interactors'),
+    'load_aliases': ('string2pdb', 'load_aliases'),
+    'string_interactors': ('string2pdb', 'string2pdb'),
+    'load_string_db': ('string_db', 'load_string_db'),
+    'aggregate_target': ('aggregate', 'aggregate_target'),
+    'aggregate_files': ('aggregate', 'aggregate_files'),
+    'run_batch': ('aggregate', 'run_batch'),
+}
+
+__all__ = sorted(_API)
+
+
+def __getattr__(name):
+    if name not in _API:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import importlib
+
+    module_name, attribute = _API[name]
+    value = getattr(importlib.import_module(f"{__name__}.{module_name}"), attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,223 @@
+"""
+AlphaFold inputs of the target - interactor pairs (-a in mentha2pdb, --afmulti
+in string2pdb).
+
+The sequences of the targets and interactors are taken from UniRef (the human
+representative member of the cluster of the accession), each accession once
+and in parallel, and written in one or several formats (--af-format):
+- fasta: inputs_afmulti/<TARGET_GENE>/<INTERACTOR_GENE>/input.fasta, one
+  AlphaFold-Multimer input per pair, as in previous versions;
+- af3: AlphaFold3 jobs (alphafoldserver dialect, which the AlphaFold3 local
+  runner also reads) in batches of --af3-batch-size jobs per json file,
+  inputs_afmulti/<prefix>_af3_0001.json, ...;
+- multifasta: one inputs_afmulti/<prefix>.fasta with every distinct sequence once.
+
+The af3 and multifasta formats also write inputs_afmulti/<prefix>_manifest.tsv,
+with the job, sequence records and batch file of every pair. Pairs with the
+same two sequences (e.g. A-B listed for target A and B-A for target B) are a
+single job, and the two chains of a homodimer a single sequence with count 2.
+
+All the files are written in parallel to a temporary file renamed over the
+final name, so a job (re)submitted while the inputs are written never reads a
+partial file.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+from pathlib import Path
+import threading
+
+from .http_client import THREAD_POOL, api_url, make_request
+from .metrics import timed
+
+AF_DIR = 'inputs_afmulti'
+
+AF_FORMATS = ('fasta', 'af3', 'multifasta')
+
+# Default number of AlphaFold3 jobs per json file
+AF3_BATCH = 100
+
+MANIFEST_COLUMNS = ['job', 'target uniprot id', 'target uniprot gene', 'interactor uniprot id',
+                    'interactor uniprot gene', 'target sequence', 'interactor sequence', 'af3 file']
+
+
+def clean_gene(gene):
+    """
+    Returns a UniProt gene name usable as folder name: U2AF1L5 {ECO:0000312|HGNC:HGNC:51830}
+    and U2AF1L5{ECO:0000312|HGNC:HGNC:51830} -> U2AF1L5.
+    """
+    if ' ' in gene:
+        gene = gene.split(' ')[0].rstrip()
+    if '{' in gene:
+        gene = gene.split('{')[0].rstrip()
+    return gene
+
+
+def uniref_sequence(accession):
+    """
+    Returns the sequence of a UniProt AC, from the human representative member
+    of its UniRef cluster: None if UniRef has no result for it, '' if none is human.
+    """
+    result = make_request(api_url('uniprot', '/uniref/search?query=uniprot_id:'), 'get', accession)
+    if not result or result['results'] == []:
+        return None
+    for res in result['results']:
+        if accession in res['id'] and res['representativeMember']['organismName'] == 'Homo sapiens (Human)':
+            return res['representativeMember']['sequence']['value']
+    return ''
+
+
+@timed('uniref_sequences')
+def uniref_sequences(accessions):
+    """
+    Looks up the sequences of UniProt ACs, each once and in parallel.
+
+    Returns:
+        dict of UniProt AC -> sequence (see uniref_sequence())
+    """
+    accessions = list(dict.fromkeys(accessions))
+    with ThreadPoolExecutor(max_workers=THREAD_POOL) as executor:
+        return dict(zip(accessions, executor.map(uniref_sequence, accessions)))
+
+
+def write_atomic(path, text):
+    """
+    Writes text to path through a temporary file in the same folder, renamed over path.
+    """
+    tmp = f'{path}.tmp-{os.getpid()}-{threading.get_ident()}'
+    with open(tmp, 'w') as fh:
+        fh.write(text)
+    os.replace(tmp, path)
+
+
+def write_all(files):
+    """
+    Writes a dict of path -> text in parallel, see write_atomic().
+    """
+    with ThreadPoolExecutor(max_workers=THREAD_POOL) as executor:
+        list(executor.map(write_atomic, files.keys(), files.values()))
+
+
+def target_pairs(dataframe, columns):
+    """
+    Returns the (target, target gene, interactor, interactor gene) pairs of a tool output, in order.
+
+    Args:
+        dataframe: mentha2pdb or string2pdb output.
+        columns: its target AC, target gene, interactor AC and interactor gene columns.
+    Returns:
+        list of distinct tuples, with the gene of the first row of every target as target gene
+    """
+    target_column, target_gene_column, interactor_column, interactor_gene_column = columns
+    target_genes = dataframe.drop_duplicates(target_column).set_index(target_column)[target_gene_column]
+    return list(dict.fromkeys(
+        (target, clean_gene(target_genes[target]), interactor, clean_gene(interactor_gene))
+        for target, interactor, interactor_gene in zip(dataframe[target_column], dataframe[interactor_column],
+                                                       dataframe[interactor_gene_column])))
+
+
+def fasta_tree(pairs, sequences, directory=AF_DIR):
+    """
+    Returns the <directory>/<TARGET_GENE>/<INTERACTOR_GENE>/input.fasta files of the pairs, as a dict
+    of path -> text. The interactors without any UniRef result are skipped.
+    """
+    files = {}
+    for target, target_gene, interactor, interactor_gene in pairs:
+        if sequences[interactor] is None:
+            print('***INTERACTOR {} of target {} returned NO results, skipping folder/sequence creation'.format(
+                interactor, target))
+            continue
+        path = os.path.join(directory, target_gene, interactor_gene, 'input.fasta')
+        files[path] = '>{}\n{}\n>{}\n{}\n'.format(target_gene, sequences[target] or '', interactor_gene,
+                                                 sequences[interactor])
+    return files
+
+
+def af3_jobs(pairs, sequences):
+    """
+    Deduplicates the pairs into AlphaFold3 jobs.
+
+    Args:
+        pairs: list from target_pairs().
+        sequences: dict of UniProt AC -> sequence.
+    Returns:
+        (jobs, records, manifest): list of AlphaFold3 jobs (alphafoldserver dialect), dict of
+        sequence -> (record name, gene) of the first accession with it, and the manifest rows
+        (without the af3 file) of the pairs with both sequences
+    """
+    jobs, job_index, records, manifest, names = [], {}, {}, [], set()
+    skipped = 0
+    for target, target_gene, interactor, interactor_gene in pairs:
+        target_sequence, interactor_sequence = sequences[target], sequences[interactor]
+        if not target_sequence or not interactor_sequence:
+            skipped += 1
+            continue
+        for accession, gene, sequence in ((target, target_gene, target_sequence),
+                                          (interactor, interactor_gene, interactor_sequence)):
+            records.setdefault(sequence, (accession, gene))
+
+        key = tuple(sorted((target_sequence, interactor_sequence)))
+        if key not in job_index:
+            name = f'{target_gene}_{interactor_gene}'
+            n = 1
+            while name in names:
+                n += 1
+                name = f'{target_gene}_{interactor_gene}_{n}'
+            names.add(name)
+            if target_sequence == interactor_sequence:
+                chains = [{'proteinChain': {'sequence': target_sequence, 'count': 2}}]
+            else:
+                chains = [{'proteinChain': {'sequence': s, 'count': 1}} for s in (target_sequence, interactor_sequence)]
+            job_index[key] = len(jobs)
+            jobs.append({'name': name, 'modelSeeds': [], 'sequences': chains,
+                         'dialect': 'alphafoldserver', 'version': 1})
+        manifest.append((job_index[key], [jobs[job_index[key]]['name'], target, target_gene, interactor,
+                                          interactor_gene, records[target_sequence][0],
+                                          records[interactor_sequence][0]]))
+    if skipped:
+        print(f'{skipped} pair(s) without UniRef human sequence for target or interactor, no AlphaFold3 job')
+    return jobs, records, manifest
+
+
+@timed('write_af_inputs')
+def write_af_inputs(pairs, formats=('fasta',), prefix='inputs', batch_size=AF3_BATCH, directory=AF_DIR):
+    """
+    Writes the AlphaFold inputs of target - interactor pairs.
+
+    Args:
+        pairs: list from target_pairs().
+        formats: some of AF_FORMATS.
+        prefix: name of the af3 batches, multifasta and manifest files.
+        batch_size: number of AlphaFold3 jobs per json file.
+        directory: output folder.
+    Returns:
+        list of the written files
+    """
+    for target in dict.fromkeys(p[0] for p in pairs):
+        print('>>Making AlphaFold inputs for target {}                   '.format(target))
+    sequences = uniref_sequences([a for p in pairs for a in (p[0], p[2])])
+
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    files = {}
+    if 'fasta' in formats:
+        files.update(fasta_tree(pairs, sequences, directory))
+    if 'af3' in formats or 'multifasta' in formats:
+        jobs, records, manifest = af3_jobs(pairs, sequences)
+        batch_files = [''] * len(jobs)
+        if 'af3' in formats:
+            for n, start in enumerate(range(0, len(jobs), batch_size)):
+                name = f'{prefix}_af3_{n + 1:04d}.json'
+                files[os.path.join(directory, name)] = json.dumps(jobs[start:start + batch_size], indent=1)
+                batch_files[start:start + batch_size] = [name] * len(jobs[start:start + batch_size])
+        if 'multifasta' in formats:
+            files[os.path.join(directory, f'{prefix}.fasta')] = ''.join(
+                f'>{accession} {gene}\n{sequence}\n' for sequence, (accession, gene) in records.items())
+        files[os.path.join(directory, f'{prefix}_manifest.tsv')] = '\t'.join(MANIFEST_COLUMNS) + '\n' + ''.join(
+            '\t'.join(row + [batch_files[job]]) + '\n' for job, row in manifest)
+        print(f'>>{len(manifest)} pairs -> {len(jobs)} AlphaFold3 jobs, {len(records)} distinct sequences')
+
+    for folder in {os.path.dirname(path) for path in files}:
+        Path(folder).mkdir(parents=True, exist_ok=True)
+    write_all(files)
+    return list(files)
@@ -0,0 +1,516 @@
+# AGGREGATE
+# Copyright (C) 2024  Eleni Kiachaki and Matteo Tiberti, Cancer Structural Biology, Danish Cancer Institute
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import pandas as pd
+import re
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .formats import write_table
+from .metrics import timed
+from .store import store_results
+
+def process_pdbminer_data(data, final_df, target_column, interactor_column, structure_column, is_complexes=False):
+    """
+    Process pdbminer or pdbminer_complexes data and update final_df.
+
+    Args:
+        data: Input data (pdbminer or pdbminer_complexes).
+        final_df: The main dataframe to update.
+        target_column: Column for target UniProt AC.
+        interactor_column: Column for interactor UniProt AC.
+        structure_column: Column to update with structure IDs.
+        is_complexes: Whether the data is pdbminer_complexes.
+    """
+    
+    if final_df.empty:
+        print("Final dataframe is empty. Skipping pdbminer data processing.")
+        return final_df
+
+    for _, row in data.iterrows():
+        structure_id = row["structure_id"]
+        interactors = []
+
+        if is_complexes:
+            if row['complex_type'] != 'protein complex':
+                continue
+
+            # Parsing pdbminer_complexes:
+            complex_details = {
+                e.split(", ")[2].split('_')[1]: e.split(", ")[1]
+                for e in row['complex_details'].split(";")
+            }
+            # Skip rows with no binding residues
+            residues = str(row.get('residues', '')).strip()
+            if residues in ['', '[]']:
+                continue
+
+            m = re.match(r'^(\S+)\s+residues binding\s+(\S+)$', str(row['binding_partners']).strip())
+            if not m:
+                continue
+            chain_1, chain_2 = m.group(1), m.group(2)
+
+            self_chains = [c.strip() for c in str(row['self_chains']).split(';') if c.strip()]
+            target_uniprot_id = next(complex_details[ch] for ch in self_chains if ch in complex_details)
+            for sc in self_chains:
+                if sc not in complex_details:
+                    complex_details[sc] = target_uniprot_id
+            if chain_1 in self_chains or chain_2 in self_chains:
+                partner_chain = chain_2 if chain_1 in self_chains else chain_1
+                interactors = [complex_details[partner_chain]]
+
+        else:
+            # Parsing pdbminer:
+            target_uniprot_id = row["uniprot_id"]
+            complex_details = row["complex_protein_details"]
+            complex_details = complex_details.strip("[]").split(";")
+            interactors = []
+            for entry in complex_details:
+                uniprot_id = entry.split(", ")[1]
+                if uniprot_id == target_uniprot_id:
+                    continue 
+                interactors.append(uniprot_id)
+            if len(row['chains'].split(';')) > 1:
+                interactors.append(target_uniprot_id)
+
+        for interactor in interactors:
+            # Check if the target and interactor exist in final_df:
+            existing_row = final_df[
+                (final_df[target_column] == target_uniprot_id) &
+                (final_df[interactor_column] == interactor)
+            ]
+
+            if existing_row.empty:
+                # Add a new row for unmatched interactors:
+                target_protein = final_df["Target_protein"].iloc[0]
+                final_df = pd.concat([
+                    final_df,
+                    pd.DataFrame([{
+                        target_column: target_uniprot_id,
+                        "Target_protein": target_protein,
+                        interactor_column: interactor,
+                        "Mentha_score": None,
+                        "String_score": None,
+                        "PPI_Structure": "",
+                        "PDBminer_complexes_structure": "" if structure_column == "PDBminer_structure" else structure_id,
+                        "PDBminer_structure": "" if structure_column == "PDBminer_complexes_structure" else structure_id
+                    }])
+                ], ignore_index=True)
+
+            else:
+                # Update the structure column for existing rows:
+                idx = existing_row.index[0]
+                current_structures = final_df.at[idx, structure_column] or ""
+                final_df.at[idx, structure_column] = ";".join(
+                    sorted(set(filter(None, current_structures.split(";") + [structure_id])))
+                )
+
+
+    return final_df
+
+# Column types of the parquet/arrow outputs (see ppi2pdb.formats):
+OUTPUT_TYPES = {
+    "Target_Uniprot_AC": "string",
+    "Target_protein": "string",
+    "Interactor_UniProt_AC": "string",
+    "Interactor": "string",
+    "Mentha_score": "float",
+    "String_score": "float",
+    "PPI_Structure": "list<string>",
+    "PDBminer_complexes_structure": "list<string>",
+    "PDBminer_structure": "list<string>"
+}
+
+@timed('aggregate_target')
+def aggregate_target(mentha_df, string_df, pdbminer_c_df, pdbminer_df):
+    """
+    Aggregate the mentha2pdb, string2pdb, pdbminer and pdbminer_complexes results of a single target.
+
+    Args:
+        mentha_df: mentha2pdb output dataframe.
+        string_df: string2pdb output dataframe.
+        pdbminer_c_df: pdbminer_complexes output dataframe.
+        pdbminer_df: pdbminer output dataframe.
+    Returns:
+        The aggregated dataframe.
+    Raises:
+        ValueError if the Mentha and STRING results refer to different targets.
+    """
+
+    ## MENTHA2PDB OUTPUT PRE-PROCESSING: ##
+    
+    # Replace 'na' values with "":
+    mentha_df = mentha_df.replace('na', "")
+
+    # Keep only the required columns
+    mentha_df = mentha_df[[
+        "target uniprot id", 
+        "target uniprot gene", 
+        "interactor uniprot id", 
+        "interactor uniprot gene", 
+        "mentha score", 
+        "PDB id", 
+        "pDockQ HuMap", 
+        "pDockQ HuRI"
+    ]]
+
+    mentha_df = mentha_df.rename(columns={
+        "target uniprot gene": "Target_protein",
+        "target uniprot id": "Target_Uniprot_AC",
+        "interactor uniprot gene": "Interactor",
+        "interactor uniprot id": "Interactor_UniProt_AC",
+        "mentha score": "Mentha_score"
+    })
+
+    # Mentha scores are Decimal or 'na' when coming straight from mentha2pdb, numbers or "" when read from csv:
+    mentha_df["Mentha_score"] = pd.to_numeric(mentha_df["Mentha_score"], errors="coerce")
+
+    # Simplify gene names by keeping only the part before the first space or '{' :
+    mentha_df["Target_protein"] = mentha_df["Target_protein"].str.replace(r"[ {].*", "", regex=True)
+    mentha_df["Interactor"] = mentha_df["Interactor"].str.replace(r"[ {].*", "", regex=True)
+
+    # Initialize the "Structure" column with the PDB id values:
+    mentha_df["PPI_Structure"] = mentha_df["PDB id"].fillna("")
+
+    # Add "AF_Huri_HuMAP" to "Structure" if HuMap or HuRI values are not "":
+    if not mentha_df.empty:
+        mentha_df["PPI_Structure"] = mentha_df.apply(
+            lambda row: ";".join(filter(None, [row["PPI_Structure"], "AF_Huri_HuMAP"])) \
+                if row["pDockQ HuMap"] != "" or row["pDockQ HuRI"] != "" 
+                else row["PPI_Structure"],
+            axis=1
+        )
+
+    # Drop columns "PDB id", "pDockQ HuMap", and "pDockQ HuRI":
+    mentha_df = mentha_df.drop(columns=["PDB id", "pDockQ HuMap", "pDockQ HuRI"])
+
+    # Group by all columns except "Structure" and aggregate "Structure" as comma-separated strings
+    mentha_df = mentha_df.groupby([
+        "Target_Uniprot_AC", 
+        "Target_protein", 
+        "Interactor_UniProt_AC", 
+        "Interactor", 
+        "Mentha_score"
+    ], as_index=False, dropna=False).agg({"PPI_Structure": lambda x: ";".join(sorted(set(filter(None, x))))})
+
+    mentha_df.sort_values(by="Mentha_score", ascending=False, inplace=True)
+
+    ## STRING2PDB OUTPUT PRE-PROCESSING: ##
+    
+    string_df = string_df.apply(lambda col: col.fillna("") if col.dtype == "object" else col.fillna(0))
+
+    # Keep only required columns from string_df:
+    string_df = string_df[[
+        "Target_protein", 
+        "Target_Uniprot_AC", 
+        "Interactor", 
+        "Interactor_UniProt_AC", 
+        "String_score", 
+        "PDB_ID"
+    ]]
+
+    # Group by relevant columns and aggregate PDB_IDs:
+    string_df = string_df.groupby([
+        "Target_protein", 
+        "Target_Uniprot_AC", 
+        "Interactor", 
+        "Interactor_UniProt_AC", 
+        "String_score"
+    ], as_index=False).agg({
+    "PDB_ID": lambda x: ";".join(sorted(set(map(str, filter(None, x)))))
+    })
+
+    string_df.sort_values(by="String_score", ascending=False, inplace=True)
+
+    if mentha_df.empty and string_df.empty:
+
+        print(f"Warning: No results found in Mentha and STRING for the query protein")
+    
+    if not string_df.empty and not mentha_df.empty:
+
+        mentha_target_ac = mentha_df["Target_Uniprot_AC"].iloc[0]
+        string_target_ac = string_df["Target_Uniprot_AC"].iloc[0]
+        if mentha_target_ac != string_target_ac:
+            raise ValueError("Target Uniprot ACs do not match between Mentha and STRING outputs.")
+
+    ## MERGING ##
+    # Merge mentha_df and string_df:
+    merged_df = pd.merge(
+        mentha_df, 
+        string_df[["Interactor_UniProt_AC", "String_score", "PDB_ID"]], 
+        on="Interactor_UniProt_AC", 
+        how="left"
+    )
+
+    # Update Structure column:
+    merged_df["PPI_Structure"] = merged_df.apply(
+        lambda row: ";".join(filter(None, sorted(set(row["PPI_Structure"].split(";") + row["PDB_ID"].split(";")))))
+            if pd.notna(row["PDB_ID"]) 
+            else row["PPI_Structure"],
+        axis=1
+    )
+
+    # Drop unnecessary columns:
+    merged_df.drop(columns=[ "PDB_ID"], inplace=True)
+
+    merged_df.sort_values(by=["Mentha_score", "String_score"], ascending=[False, False], inplace=True)
+
+    # Find string entries not in mentha:
+    unmatched_string_df = string_df[~string_df["Interactor_UniProt_AC"].isin(mentha_df["Interactor_UniProt_AC"])]
+    unmatched_string_df = unmatched_string_df.rename(columns={"PDB_ID": "PPI_Structure"})
+    unmatched_string_df["Mentha_score"] = None 
+    unmatched_string_df["Mentha_score"] = unmatched_string_df["Mentha_score"].astype("float64")  
+    unmatched_string_df = unmatched_string_df[[
+        "Target_Uniprot_AC", "Target_protein", "Interactor_UniProt_AC", 
+        "Interactor", "Mentha_score", "String_score", "PPI_Structure"
+    ]]
+
+    # Concatenate the unmatched string entries to df:
+    final_df = pd.concat([merged_df, unmatched_string_df], ignore_index=True)
+
+    # Add columns for pdbminer/pdbminer_complexes
+    final_df["PDBminer_complexes_structure"] = ""
+    final_df["PDBminer_structure"] = ""
+
+    final_df = final_df[[
+        "Target_Uniprot_AC", 
+        "Target_protein", 
+        "Interactor_UniProt_AC", 
+        "Interactor", 
+        "Mentha_score", 
+        "String_score", 
+        "PPI_Structure", 
+        "PDBminer_complexes_structure",
+        "PDBminer_structure"
+    ]]
+
+     ## PROCESS PDBMINER_COMPLEXES ##
+    final_df = process_pdbminer_data(
+        pdbminer_c_df, final_df, 
+        target_column="Target_Uniprot_AC", 
+        interactor_column="Interactor_UniProt_AC", 
+        structure_column="PDBminer_complexes_structure", 
+        is_complexes=True
+    )
+
+    ## PROCESS PDBMINER ##
+    protein_complexes = pdbminer_df[pdbminer_df["complex_protein"] == "protein complex"]
+    final_df = process_pdbminer_data(
+        protein_complexes, final_df, 
+        target_column="Target_Uniprot_AC", 
+        interactor_column="Interactor_UniProt_AC", 
+        structure_column="PDBminer_structure", 
+        is_complexes=False
+    )
+
+    return final_df
+
+
+@timed('aggregate_files')
+def aggregate_files(mentha_file, string_file, pdbminer_c_file, pdbminer_file):
+    """
+    Load the four per-target input files and aggregate them.
+
+    Args:
+        mentha_file: Path to the mentha2pdb output csv file.
+        string_file: Path to the string2pdb output csv file.
+        pdbminer_c_file: Path to the pdbminer_complexes output csv file.
+        pdbminer_file: Path to the pdbminer output csv file.
+    Returns:
+        The aggregated dataframe.
+    """
+    mentha_df = pd.read_csv(mentha_file)
+    string_df = pd.read_csv(string_file)
+    pdbminer_c_df = pd.read_csv(pdbminer_c_file)
+    pdbminer_df = pd.read_csv(pdbminer_file)
+
+    return aggregate_target(mentha_df, string_df, pdbminer_c_df, pdbminer_df)
+
+
+# Per-target file names expected when aggregating a whole directory:
+BATCH_SUFFIXES = {
+    "mentha": ".csv",
+    "string": "_string_interactors.csv",
+    "pdbminer_complexes": "_filtered.csv",
+    "pdbminer": "_all.csv",
+}
+
+MANIFEST_COLUMNS = ["target", "mentha", "string", "pdbminer_complexes", "pdbminer"]
+
+# Failure report of a batch run, written to the output directory (by default the current directory)
+FAILURES_FILE = "failed_targets.csv"
+
+
+def find_batch_inputs(batch_input):
+    """
+    Collect the per-target input files of a batch run.
+
+    Args:
+        batch_input: Either a directory containing <AC>.csv, <AC>_string_interactors.csv,
+                     <AC>_filtered.csv and <AC>_all.csv files for every target, or a manifest
+                     csv file with columns target, mentha, string, pdbminer_complexes, pdbminer.
+                     Relative paths in the manifest are relative to the manifest location.
+    Returns:
+        list of dicts, one per target, with the MANIFEST_COLUMNS keys.
+    """
+    if os.path.isdir(batch_input):
+        outputs = tuple(suffix for key, suffix in BATCH_SUFFIXES.items() if key != "mentha") + ("_aggregated.csv",)
+        targets = sorted(f[:-len(".csv")] for f in os.listdir(batch_input)
+                         if f.endswith(".csv") and not f.endswith(outputs) and f != FAILURES_FILE)
+        return [{"target": target,
+                 **{key: os.path.join(batch_input, target + suffix) for key, suffix in BATCH_SUFFIXES.items()}}
+                for target in targets]
+
+    manifest = pd.read_csv(batch_input, dtype=str)
+    missing = [c for c in MANIFEST_COLUMNS if c not in manifest.columns]
+    if missing:
+        raise ValueError(f"manifest {batch_input} is missing column(s): {', '.join(missing)}")
+
+    base_dir = os.path.dirname(os.path.abspath(batch_input))
+    entries = []
+    for _, row in manifest.iterrows():
+        entry = {"target": row["target"].strip()}
+        for key in MANIFEST_COLUMNS[1:]:
+            entry[key] = os.path.join(base_dir, row[key].strip())
+        entries.append(entry)
+    return entries
+
+
+def aggregate_batch_entry(entry, output_dir, fmt="csv"):
+    """
+    Aggregate one target of a batch run and write its per-target csv (or fmt) file.
+    Runs in a worker process, so errors are returned instead of raised.
+
+    Returns:
+        (target, aggregated dataframe or None, error message or None)
+    """
+    target = entry["target"]
+    try:
+        missing = [entry[key] for key in MANIFEST_COLUMNS[1:] if not os.path.isfile(entry[key])]
+        if missing:
+            raise FileNotFoundError(f"missing input file(s): {', '.join(missing)}")
+
+        final_df = aggregate_files(entry["mentha"], entry["string"], entry["pdbminer_complexes"], entry["pdbminer"])
+        write_table(final_df, os.path.join(output_dir, f"{target}_aggregated.csv"), fmt, OUTPUT_TYPES,
+                    index=False, na_rep="")
+    except Exception as e:
+        return target, None, f"{type(e).__name__}: {e}\n{traceback.format_exc()}"
+
+    return target, final_df, None
+
+
+def write_partitions(results, output_dir, partition_size, fmt="csv"):
+    """
+    Write the aggregated dataframes of all targets as one dataset made of partitions of
+    partition_size targets each, in target order. With fmt parquet or arrow the combined
+    directory can be scanned as a single dataset (e.g. with pyarrow.dataset).
+    """
+    combined_dir = os.path.join(output_dir, "combined")
+    os.makedirs(combined_dir, exist_ok=True)
+
+    targets = sorted(results)
+    partitions = []
+    for n, start in enumerate(range(0, len(targets), partition_size)):
+        part = pd.concat([results[t] for t in targets[start:start + partition_size]], ignore_index=True)
+        part_name = write_table(part, os.path.join(combined_dir, f"part-{n:05d}.csv"), fmt, OUTPUT_TYPES,
+                                index=False, na_rep="")
+        partitions.append(part_name)
+
+    return partitions
+
+
+def run_batch(batch_input, output_dir, jobs=None, partition_size=1000, fmt="csv", store_args=None):
+    """
+    Aggregate all the targets listed in a directory or manifest in parallel.
+
+    Args:
+        batch_input: directory or manifest file, see find_batch_inputs().
+        output_dir: directory for the per-target csv files, the combined dataset and the failure report.
+        jobs: number of worker processes (default: number of cores).
+        partition_size: number of targets per partition of the combined dataset.
+        fmt: format of the per-target files and of the combined dataset, one of ppi2pdb.formats.FORMATS.
+        store_args: Namespace with the store (and release) options, to also upsert the results in
+                    the results store (see ppi2pdb.store).
+    Returns:
+        dict of failed targets -> error message
+    """
+    entries = find_batch_inputs(batch_input)
+    os.makedirs(output_dir, exist_ok=True)
+
+    print(f"Aggregating {len(entries)} targets from {batch_input}")
+
+    results = {}
+    failures = {}
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(aggregate_batch_entry, entry, output_dir, fmt) for entry in entries]
+        for n, future in enumerate(as_completed(futures), start=1):
+            target, final_df, error = future.result()
+            if error is None:
+                results[target] = final_df
+            else:
+                failures[target] = error
+                print(f"\nError: aggregation failed for target {target}: {error.splitlines()[0]}")
+            print(f"{n}/{len(entries)} targets processed", end='\r')
+    print()
+
+    if results:
+        partitions = write_partitions(results, output_dir, partition_size, fmt)
+        print(f"Combined dataset written in {len(partitions)} partition(s) to {os.path.join(output_dir, 'combined')}")
+
+    if store_args is not None:
+        store_results(store_args, 'aggregate', [('aggregate', [results[t] for t in sorted(results)], OUTPUT_TYPES,
+                                                 sorted(results))])
+
+    failures_file = os.path.join(output_dir, FAILURES_FILE)
+    pd.DataFrame(sorted(failures.items()), columns=["target", "error"]).to_csv(failures_file, index=False)
+
+    print(f"Batch aggregation complete: {len(results)} succeeded, {len(failures)} failed (see {failures_file}).")
+
+    return failures
+
+
+def main(args):
+    """
+    Runs aggregate with the command line arguments parsed by ppi2pdb.cli.
+    """
+    if args.batch:
+        failures = run_batch(args.batch, args.o or ".", jobs=args.jobs, partition_size=args.partition_size,
+                             fmt=args.format, store_args=args if args.store else None)
+        sys.exit(1 if failures else 0)
+
+    # Extract UPAC from mentha filename
+    upac_basename = os.path.basename(args.m)        
+    upac_id = os.path.splitext(upac_basename)[0]
+
+    try:
+        final_df = aggregate_files(args.m, args.s, args.c, args.p)
+    except ValueError as e:
+        print(f"Error: {e}")
+        exit(1)
+
+    # Use user-specified filename or create default:
+    if args.o:
+        filename = args.o
+    else:
+        filename = f"{upac_id}_aggregated.csv"
+
+    filename = write_table(final_df, filename, args.format, OUTPUT_TYPES, index=False, na_rep="")
+    print("Aggregation complete. Saved as", filename,".")
+
+    if args.store:
+        store_results(args, 'aggregate', [('aggregate', [final_df], OUTPUT_TYPES, [upac_id])])
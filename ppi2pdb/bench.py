@@ -0,0 +1,192 @@
+"""
+Benchmark of the bundled examples, replayed from recorded responses.
+
+Runs the targets of mentha2pdb/example (Q9GZQ8), mentha2pdb/example2
+(P54252), string2pdb/example (O15315), string2pdb/example2 (Q99728) and
+aggregate/example (O15315) with the options of their run scripts, and reports
+for every stage the wall time, the number of HTTP requests and the peak
+memory allocated by Python (tracemalloc).
+
+The HTTP responses come from a cassette directory (see ppi2pdb.replay): they
+are recorded with --record, replayed in-process by default, or served by a
+stand-in server with --stand-in, adding latency and errors if requested.
+"""
+
+import csv
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import traceback
+from contextlib import contextmanager
+
+from . import http_client, replay
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EXAMPLES = [
+    {'name': 'mentha2pdb/example', 'tool': 'mentha2pdb', 'target': 'Q9GZQ8'},
+    {'name': 'mentha2pdb/example2', 'tool': 'mentha2pdb', 'target': 'P54252'},
+    {'name': 'string2pdb/example', 'tool': 'string2pdb', 'target': 'O15315', 'threshold': 0.15, 'network': 'physical'},
+    {'name': 'string2pdb/example2', 'tool': 'string2pdb', 'target': 'Q99728', 'threshold': 0.9, 'network': 'functional'},
+    {'name': 'aggregate/example', 'tool': 'aggregate', 'target': 'O15315'},
+]
+
+REPORT_COLUMNS = ['example', 'stage', 'status', 'seconds', 'requests', 'peak_memory_mb', 'requests_by_service']
+
+
+class StageRecorder:
+    """
+    Measures the stages of the benchmark and collects one report row per stage.
+    """
+
+    def __init__(self):
+        self.rows = []
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def reset_peak(self):
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        else:
+            # python < 3.9
+            tracemalloc.stop()
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, example, name):
+        counts_before = dict(http_client.request_counts)
+        self.reset_peak()
+        row = {'example': example, 'stage': name, 'status': 'ok'}
+        start = time.perf_counter()
+        try:
+            yield row
+        except Exception as e:
+            row['status'] = f"error: {type(e).__name__}: {e}"
+            traceback.print_exc()
+        finally:
+            row['seconds'] = round(time.perf_counter() - start, 3)
+            row['peak_memory_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+            by_service = {name: count - counts_before.get(name, 0)
+                          for name, count in http_client.request_counts.items()
+                          if count - counts_before.get(name, 0)}
+            row['requests'] = sum(by_service.values())
+            row['requests_by_service'] = by_service
+            self.rows.append(row)
+
+
+def run_examples(args, recorder):
+    """
+    Runs the selected examples, writing their outputs in the current directory.
+    """
+    # imported here so that their import time is not part of the first stage
+    from . import aggregate, mentha2pdb, string2pdb
+
+    examples = [e for e in EXAMPLES if not args.examples or e['name'] in args.examples]
+    tools = {e['tool'] for e in examples}
+
+    mentha = None
+    if 'mentha2pdb' in tools:
+        if os.path.isfile(args.i):
+            with recorder.stage('-', 'load mentha'):
+                mentha = mentha2pdb.load_mentha(args.i, args.s)
+        else:
+            print(f"Warning: mentha database {args.i} not found, skipping the mentha2pdb examples")
+
+    aliases = None
+    if 'string2pdb' in tools:
+        if os.path.isfile(args.aliases_file_path):
+            with recorder.stage('-', 'load aliases'):
+                aliases = string2pdb.index_aliases(string2pdb.load_aliases(args.aliases_file_path))
+        else:
+            print(f"Warning: alias file {args.aliases_file_path} not found, skipping the string2pdb examples")
+
+    for example in examples:
+        name, target = example['name'], example['target']
+        http_client.clear_caches()
+
+        if example['tool'] == 'mentha2pdb' and mentha is not None:
+            with recorder.stage(name, 'mentha2pdb'):
+                df = mentha2pdb.mentha_interactors([target], data=mentha, pmid=True, extra_files=args.extra,
+                                                   extra_cutoff=args.extra_cutoff, af_folder=args.af,
+                                                   ensg_xref=args.ensg_xref)[target]
+                df.to_csv(f"{target}.csv", index=False, quoting=csv.QUOTE_NONE, sep=',')
+
+        elif example['tool'] == 'string2pdb' and aliases is not None:
+            with recorder.stage(name, 'string2pdb'):
+                df = string2pdb.string2pdb(target, aliases, threshold=example['threshold'],
+                                           network=example['network'])
+                df.to_csv(f"{target}_string_interactors.csv", index=False)
+
+        elif example['tool'] == 'aggregate':
+            example_dir = os.path.join(REPO_DIR, 'aggregate', 'example')
+            if not os.path.isdir(example_dir):
+                print(f"Warning: {example_dir} not found, skipping the aggregate example")
+                continue
+            with recorder.stage(name, 'aggregate'):
+                df = aggregate.aggregate_files(*[os.path.join(example_dir, target + suffix) for suffix in
+                                                 ('.csv', '_string_interactors.csv', '_filtered.csv', '_all.csv')])
+                df.to_csv(f"{target}_aggregated.csv", index=False, na_rep="")
+
+
+def print_report(rows):
+    print()
+    print(f"{'example':<22}{'stage':<14}{'seconds':>10}{'requests':>10}{'peak MB':>10}  status")
+    for row in rows:
+        print(f"{row['example']:<22}{row['stage']:<14}{row['seconds']:>10.3f}{row['requests']:>10}"
+              f"{row['peak_memory_mb']:>10.1f}  {row['status']}")
+    print(f"{'total':<36}{sum(r['seconds'] for r in rows):>10.3f}{sum(r['requests'] for r in rows):>10}")
+
+
+def main(args):
+    """
+    Runs the benchmark with the command line arguments parsed by ppi2pdb.cli.
+    """
+    for name in ('i', 'aliases_file_path', 'cassettes', 'json'):
+        if getattr(args, name):
+            setattr(args, name, os.path.abspath(getattr(args, name)))
+    if args.extra:
+        args.extra = [os.path.abspath(e) for e in args.extra]
+    if args.af:
+        args.af = os.path.abspath(args.af)
+
+    server = None
+    if args.record:
+        print(f"Recording responses to {args.cassettes}")
+        http_client.set_transport(replay.CassetteAdapter(args.cassettes, 'record'))
+    elif args.stand_in:
+        server = replay.make_stand_in_server(args.cassettes, latency=args.latency, jitter=args.jitter,
+                                             error_rate=args.error_rate, seed=args.seed)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        print(f"Replaying {args.cassettes} through the stand-in server at {url}")
+        replay.use_stand_in(url)
+    else:
+        print(f"Replaying {args.cassettes}")
+        http_client.set_transport(replay.CassetteAdapter(args.cassettes, 'replay'))
+
+    os.makedirs(args.o, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(args.o)
+    recorder = StageRecorder()
+    try:
+        run_examples(args, recorder)
+    finally:
+        os.chdir(cwd)
+        if server is not None:
+            server.shutdown()
+
+    print_report(recorder.rows)
+    if server is not None:
+        print(f"Stand-in server: {server.stats}")
+
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump({'mode': 'record' if args.record else 'stand-in' if args.stand_in else 'replay',
+                       'stages': [{c: row[c] for c in REPORT_COLUMNS} for row in recorder.rows]}, fh, indent=2)
+        print(f"Report written to {args.json}")
+
+    if any(row['status'] != 'ok' for row in recorder.rows):
+        sys.exit(1)
@@ -0,0 +1,638 @@
+"""
+Command line entry points of mentha2pdb, string2pdb, aggregate and ppi2pdb.
+
+Only argparse is needed to build the parsers: the modules doing the actual
+work (and pandas, numpy and requests with them) are imported after the
+arguments have been parsed and validated, so --help and usage errors return
+immediately.
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import warnings
+from decimal import Decimal
+
+
+FORMATS = ('csv', 'parquet', 'arrow')
+
+# ppi2pdb.store.SOURCES and SCORES
+STORE_SOURCES = ('mentha', 'string', 'aggregate')
+STORE_SCORES = ('mentha_score', 'string_score', 'resolution', 'pdockq_huri', 'pdockq_humap')
+
+
+def add_format_argument(parser):
+    parser.add_argument('--format', default='csv', choices=FORMATS,
+                        help="Output format (default: csv). parquet and arrow write typed columns, with nulls and "
+                             "list columns for the ';'-separated values, and require pyarrow.")
+
+
+def check_format(parser, args):
+    if args.format != 'csv' and importlib.util.find_spec('pyarrow') is None:
+        parser.error(f"--format {args.format} requires pyarrow (pip install pyarrow)")
+
+
+PROFILERS = ('cprofile', 'pyinstrument')
+
+# ppi2pdb.af_inputs.AF_FORMATS and AF3_BATCH
+AF_FORMATS = ('fasta', 'af3', 'multifasta')
+AF3_BATCH = 100
+
+# ppi2pdb.interfaces.STRUCTURE_FORMATS and CONTACT_DISTANCE
+STRUCTURE_FORMATS = ('cif', 'bcif')
+CONTACT_DISTANCE = 5.0
+
+PDB_INDEX_HELP = 'PDB index built by ppi2pdb build-pdb-index, used instead of the RCSB search'
+ENSG_XREF_HELP = ('Ensembl gene -> UniProt cross-reference file (UniProt idmapping.dat or BioMart export), '
+                  'used to map the HuRI pairs of extra files without NameUPAC column instead of querying UniProt')
+
+
+def add_profile_arguments(parser):
+    parser.add_argument('--profile', metavar='OUT_JSON',
+                        help='write the time spent in every stage, the HTTP requests per endpoint (counts, latency '
+                             'histograms, retries) and the cache hits to this json file')
+    parser.add_argument('--profiler', choices=PROFILERS,
+                        help='also profile the run with cProfile (OUT.prof) or pyinstrument (OUT.html), '
+                             'requires --profile')
+
+
+def check_profile(parser, args):
+    if args.profiler and not args.profile:
+        parser.error('--profiler requires --profile')
+    if args.profiler == 'pyinstrument' and importlib.util.find_spec('pyinstrument') is None:
+        parser.error('--profiler pyinstrument requires pyinstrument (pip install pyinstrument)')
+
+
+def run_profiled(module, args):
+    from . import metrics
+    metrics.run_profiled(module.main, args)
+
+
+def shard_argument(text):
+    from .shard import parse_shard
+    try:
+        return parse_shard(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def add_shard_argument(parser, outputs):
+    parser.add_argument('--shard', type=shard_argument, metavar='i/N',
+                        help=f'only process the i-th of N parts of the targets, balanced by number of mentha '
+                             f'interactions; {outputs}')
+
+
+def add_depth_arguments(parser, network):
+    parser.add_argument('--depth', type=int, choices=[1, 2], default=1,
+                        help=f'2 also expands the targets to the partners of their partners in the {network}, '
+                             f'written with their shared PDB entries to a separate _second_shell file (default: 1)')
+    parser.add_argument('--max-fanout', type=int, default=50,
+                        help='--depth 2: maximum number of partners, the best scoring ones, followed from every '
+                             'partner of a target (default: 50)')
+
+
+def check_depth(parser, args):
+    if args.max_fanout < 1:
+        parser.error('--max-fanout must be at least 1')
+
+
+def add_af_arguments(parser, option):
+    parser.add_argument('--af-format', nargs='+', choices=AF_FORMATS, default=['fasta'],
+                        help=f'{option}: AlphaFold inputs to write in inputs_afmulti, one or several of fasta (one '
+                             f'<target gene>/<interactor gene>/input.fasta per pair, the default), af3 (AlphaFold3 '
+                             f'json job batches) and multifasta (one fasta with every distinct sequence once); af3 '
+                             f'and multifasta also write a manifest of the pairs')
+    parser.add_argument('--af3-batch-size', type=int, default=AF3_BATCH,
+                        help=f'number of AlphaFold3 jobs per json file of --af-format af3 (default: {AF3_BATCH})')
+
+
+def check_af(parser, args):
+    if args.af3_batch_size < 1:
+        parser.error('--af3-batch-size must be at least 1')
+
+
+def add_interface_arguments(parser):
+    parser.add_argument('--interfaces', action='store_true',
+                        help='add whether the target and interactor chains of every PDB entry are in contact and '
+                             'their interface residues, computed from the structures (requires scipy)')
+    parser.add_argument('--structure-mirror', metavar='DIR',
+                        help='--interfaces: folder the structures are downloaded to once, compressed, and reused by '
+                             'the next runs (default: $PPI2PDB_CACHE_DIR/structures)')
+    parser.add_argument('--structure-source', metavar='DIR',
+                        help='--interfaces: local folder to read the structures from (<id>.cif(.gz) or '
+                             '<id>.bcif(.gz), flat or in the wwPDB divided layout), nothing is downloaded')
+    parser.add_argument('--structure-format', choices=STRUCTURE_FORMATS, default='cif',
+                        help='--interfaces: format of the downloaded structures, mmCIF or BinaryCIF (requires '
+                             'msgpack) (default: cif)')
+    parser.add_argument('--contact-distance', type=float, default=CONTACT_DISTANCE,
+                        help=f'--interfaces: heavy atom distance cutoff of the contacts, in Angstrom '
+                             f'(default: {CONTACT_DISTANCE})')
+    parser.add_argument('--interface-jobs', type=int, default=None,
+                        help='--interfaces: number of worker processes (default: number of cores)')
+
+
+def check_interfaces(parser, args):
+    if not args.interfaces:
+        return
+    if importlib.util.find_spec('scipy') is None:
+        parser.error('--interfaces requires scipy (pip install scipy)')
+    if args.structure_format == 'bcif' and importlib.util.find_spec('msgpack') is None:
+        parser.error('--structure-format bcif requires msgpack (pip install .[bcif])')
+    if args.contact_distance <= 0:
+        parser.error('--contact-distance must be positive')
+    if args.interface_jobs is not None and args.interface_jobs < 1:
+        parser.error('--interface-jobs must be at least 1')
+    if args.structure_source is not None and not os.path.isdir(args.structure_source):
+        parser.error(f'--structure-source {args.structure_source} is not a folder')
+    if args.structure_mirror is None:
+        cache_dir = os.environ.get('PPI2PDB_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'ppi2pdb'))
+        args.structure_mirror = os.path.join(cache_dir, 'structures') if cache_dir else 'structures'
+
+
+def use_pdb_index(parser, args):
+    if not args.pdb_index:
+        return
+    from .pdb_index import use_pdb_index
+    try:
+        use_pdb_index(args.pdb_index)
+    except OSError as e:
+        parser.error(f'could not read the PDB index {args.pdb_index} ({e})')
+
+
+def mentha2pdb_parser():
+    parser = argparse.ArgumentParser(prog='mentha2pdb')
+    parser.add_argument('-i', '--i', help='mentha database file')
+    parser.add_argument('-t', '--t', help='File with target uniprots')
+    parser.add_argument('-s', '--s', type=Decimal, nargs='+',
+                        help='Cutoff score, or several cutoff scores to write one output per cutoff')
+    parser.add_argument('-o', '--o', nargs='?', const='dataframe.csv', default='dataframe.csv', help='Output name')
+    parser.add_argument('-f', '--filter', action='store_true')
+    parser.add_argument('-p', '--p', action='store_true', help='option to add PMID column to output')
+    parser.add_argument('-x', '--x', action='store_true', help='option to have 1 csv output file per target uniprot ID')
+    parser.add_argument('-a', '--a', action='store_true', help='option to have inputs_afmulti folder with subfolders and input.fasta files')
+    add_af_arguments(parser, '-a')
+    parser.add_argument('-c', '--c', default='', help='Config file containing rows to insert into mentha db')
+    parser.add_argument('-extra', '--extra-files', dest='extra', nargs='*', required=False, default=None, help='list of extra files to process')
+    parser.add_argument('-ec','--extra-cutoff', dest='extra_cutoff', default=[0.5], type=float, nargs='+',
+                        help='Cutoff on extra files pair pDockQ scores, or several cutoffs to write one output per cutoff')
+    parser.add_argument('-af','--af-folder', dest='af', help='AF_Huri_HuMAP folder location')
+    parser.add_argument('--ensg-xref', help=ENSG_XREF_HELP)
+    parser.add_argument('--coverage', action='store_true',
+                        help='add the residues and fraction of the target and interactor sequences covered by every '
+                             'PDB entry and the best covering PDB entry of every pair')
+    add_interface_arguments(parser)
+    add_format_argument(parser)
+    add_profile_arguments(parser)
+    add_shard_argument(parser, 'writes <output>.shard-i-of-N.csv/.json, to be combined with ppi2pdb merge')
+    add_depth_arguments(parser, 'filtered mentha database')
+    parser.add_argument('--pdb-index', help=PDB_INDEX_HELP)
+    add_store_arguments(parser)
+    return parser
+
+
+def add_store_arguments(parser):
+    parser.add_argument('--store', metavar='DB',
+                        help='SQLite results store (created if needed) to upsert the rows of every target into, '
+                             'see ppi2pdb query')
+    parser.add_argument('--release', help='label of the database releases used (e.g. mentha-2025-04-28), '
+                                          'recorded with the run in the --store')
+
+
+def mentha2pdb_main(argv=None):
+    warnings.filterwarnings("ignore")
+    parser = mentha2pdb_parser()
+    args = parser.parse_args(argv)
+    check_format(parser, args)
+    check_profile(parser, args)
+    if args.shard and args.format != 'csv':
+        parser.error('--shard writes csv shards, --format can not be used with it')
+    if args.shard and args.depth == 2:
+        parser.error('--depth 2 can not be used with --shard')
+
+    # several -s/-ec values: cutoff sweep, the single value ones keep a scalar args.s/args.extra_cutoff
+    args.cutoffs, args.extra_cutoffs = args.s or [], args.extra_cutoff
+    args.s = min(args.cutoffs) if args.cutoffs else None
+    args.extra_cutoff = min(args.extra_cutoffs)
+    if len(args.cutoffs) > 1 or len(args.extra_cutoffs) > 1:
+        if args.shard or args.depth == 2 or args.store:
+            parser.error('several -s/-ec cutoffs can not be used with --shard, --depth 2 or --store')
+    check_depth(parser, args)
+    check_af(parser, args)
+    check_interfaces(parser, args)
+    use_pdb_index(parser, args)
+
+    if args.extra != None and args.af == None:
+        print('Detected extra files but no AF_Huri_HuMAP folder path, use the -af parameter')
+        print('quitting.')
+        sys.exit(0)
+
+    from . import mentha2pdb
+    try:
+        run_profiled(mentha2pdb, args)
+    except mentha2pdb.ModelFolderError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+def string2pdb_parser():
+    parser = argparse.ArgumentParser(
+        prog="string2pdb",
+        description="Retrieval of interaction data from the STRING database for a given gene name."
+    )
+    parser.add_argument(
+        "identifier",
+        type=str,
+        help="HUGO Gene name to retrieve interactors for."
+    )
+    parser.add_argument(
+        "--aliases_file_path",
+        type=str,
+        default="/data/databases/STRING/STRING_primary_upac.csv",
+        help="Path to the pre-processed alias file containing STRING ID and UniProt mappings."
+    )
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=0.15,
+        help="Minimum STRING confidence score for interaction filtering (default: 0.15). Interactions must also be supported by either curated databases or experimental data."
+    )
+    parser.add_argument(
+        "-n",
+        "--network",
+        type=str,
+        default="physical",
+        choices=["functional", "physical"],
+        help="STRING network type to be used: 'physical' for physical interactions, 'functional' for all interactions (default: 'physical')."
+    )
+    parser.add_argument(
+        "-a",
+        "--afmulti",
+        action="store_true",
+        help="option to have inputs_afmulti folder with subfolders and input.fasta files"
+    )
+    add_af_arguments(parser, '--afmulti')
+    parser.add_argument(
+        "--string-db",
+        type=str,
+        default=None,
+        help="Local STRING database built by ppi2pdb build-string-db, used instead of the STRING API."
+    )
+    add_depth_arguments(parser, 'local STRING database (--string-db)')
+    parser.add_argument("--pdb-index", type=str, default=None, help=PDB_INDEX_HELP)
+    add_format_argument(parser)
+    add_profile_arguments(parser)
+    add_store_arguments(parser)
+    return parser
+
+
+def string2pdb_main(argv=None):
+    parser = string2pdb_parser()
+    args = parser.parse_args(argv)
+    check_format(parser, args)
+    check_profile(parser, args)
+    check_depth(parser, args)
+    check_af(parser, args)
+    if args.depth == 2 and not args.string_db:
+        parser.error('--depth 2 needs the local STRING database, see --string-db')
+    use_pdb_index(parser, args)
+
+    from . import string2pdb
+    run_profiled(string2pdb, args)
+
+
+def aggregate_parser():
+    parser = argparse.ArgumentParser(
+        prog="aggregate",
+        description="Aggregate results from mentha2pdb, string2pdb, pdbminer, and pdbminer_complexes.")
+
+    parser.add_argument(
+        "-m",
+        help="Path to the mentha2pdb output csv file.")
+
+    parser.add_argument(
+        "-s",
+        help="Path to the string2pdb output csv file.")
+    parser.add_argument(
+        "-c",
+        help="Path to the pdbminer_complexes output csv file.")
+
+    parser.add_argument(
+        "-p",
+        help="Path to the pdbminer output csv file.")
+
+    parser.add_argument(
+        "-o",
+        help="Specify the output filename. If not provided, a default name will be used based on Target_Uniprot_AC. "
+             "In batch mode, the output directory (default: current directory)."
+    )
+
+    parser.add_argument(
+        "-b",
+        "--batch",
+        help="Batch mode: directory with <AC>.csv, <AC>_string_interactors.csv, <AC>_filtered.csv and <AC>_all.csv "
+             "files per target, or manifest csv with columns target,mentha,string,pdbminer_complexes,pdbminer. "
+             "Replaces -m, -s, -c and -p.")
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes in batch mode (default: number of cores).")
+
+    parser.add_argument(
+        "--partition-size",
+        type=int,
+        default=1000,
+        help="Number of targets per partition file of the combined batch dataset (default: 1000).")
+    add_format_argument(parser)
+    add_profile_arguments(parser)
+    add_store_arguments(parser)
+    return parser
+
+
+def aggregate_main(argv=None):
+    parser = aggregate_parser()
+    args = parser.parse_args(argv)
+
+    if args.batch:
+        if any([args.m, args.s, args.c, args.p]):
+            parser.error("-b/--batch cannot be used together with -m, -s, -c or -p")
+        if args.partition_size < 1:
+            parser.error("--partition-size must be at least 1")
+    else:
+        missing = [f"-{a}" for a in "mscp" if getattr(args, a) is None]
+        if missing:
+            parser.error(f"the following arguments are required: {', '.join(missing)}")
+    check_format(parser, args)
+    check_profile(parser, args)
+
+    from . import aggregate
+    run_profiled(aggregate, args)
+
+
+def add_pipeline_arguments(parser):
+    parser.add_argument('-t', required=True, help='File with target uniprots, one per line')
+    parser.add_argument('-o', default='.', help='Output directory (default: current directory)')
+    parser.add_argument('--write-intermediate', action='store_true',
+                        help='also write the mentha2pdb (<AC>.csv) and string2pdb (<AC>_string_interactors.csv) outputs')
+    add_format_argument(parser)
+    add_profile_arguments(parser)
+    add_shard_argument(parser, 'the outputs are per target, so shards need no merging')
+    add_store_arguments(parser)
+    add_source_arguments(parser)
+
+
+def add_source_arguments(parser):
+    mentha_group = parser.add_argument_group('mentha2pdb options')
+    mentha_group.add_argument('-i', required=True, help='mentha database file')
+    mentha_group.add_argument('-s', type=Decimal, required=True, help='Cutoff score')
+    mentha_group.add_argument('-f', '--filter', action='store_true')
+    mentha_group.add_argument('-c', default='', help='Config file containing rows to insert into mentha db')
+    mentha_group.add_argument('-extra', '--extra-files', dest='extra', nargs='*', default=None,
+                              help='list of extra files to process')
+    mentha_group.add_argument('-ec', '--extra-cutoff', dest='extra_cutoff', default=0.5, type=float,
+                              help='Cutoff on extra files pair pDockQ scores')
+    mentha_group.add_argument('-af', '--af-folder', dest='af', help='AF_Huri_HuMAP folder location')
+    mentha_group.add_argument('--ensg-xref', help=ENSG_XREF_HELP)
+
+    string_group = parser.add_argument_group('string2pdb options')
+    string_group.add_argument('--aliases_file_path', default="/data/databases/STRING/STRING_primary_upac.csv",
+                              help="Path to the pre-processed alias file containing STRING ID and UniProt mappings.")
+    string_group.add_argument('--threshold', type=float, default=0.15,
+                              help="Minimum STRING confidence score for interaction filtering (default: 0.15).")
+    string_group.add_argument('-n', '--network', default="physical", choices=["functional", "physical"],
+                              help="STRING network type to be used (default: 'physical').")
+    string_group.add_argument('--string-db',
+                              help="Local STRING database built by ppi2pdb build-string-db, used instead of the "
+                                   "STRING API.")
+
+    parser.add_argument('--pdb-index', help=PDB_INDEX_HELP)
+
+    aggregate_group = parser.add_argument_group('aggregate options')
+    aggregate_group.add_argument('--pdbminer-dir',
+                                 help='directory with the <AC>_all.csv (pdbminer) and <AC>_filtered.csv '
+                                      '(pdbminer_complexes) outputs of the targets')
+
+
+def pipeline_main(args, parser):
+    if args.extra is not None and args.af is None:
+        parser.error('Detected extra files but no AF_Huri_HuMAP folder path, use the -af parameter')
+    check_format(parser, args)
+    check_profile(parser, args)
+    use_pdb_index(parser, args)
+
+    from . import pipeline
+    run_profiled(pipeline, args)
+
+
+def add_serve_arguments(parser):
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8080, help='Port to listen on (default: 8080)')
+    parser.add_argument('--warm', help='File with target uniprots, one per line, to compute before serving')
+    parser.add_argument('--cache-size', type=int, default=1024,
+                        help='Maximum number of (source, target) results kept in memory, the least recently used '
+                             'ones are dropped first (default: 1024)')
+    add_source_arguments(parser)
+
+
+def serve_main(args, parser):
+    if args.extra is not None and args.af is None:
+        parser.error('Detected extra files but no AF_Huri_HuMAP folder path, use the -af parameter')
+    if args.cache_size < 1:
+        parser.error('--cache-size must be at least 1')
+
+    use_pdb_index(parser, args)
+
+    from . import service
+    service.main(args)
+
+
+def add_stand_in_arguments(parser):
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response (default: 0)')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='Maximum random seconds added on top of --latency (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of the requests answered with --error-status (default: 0)')
+    parser.add_argument('--seed', type=int, default=None, help='Seed of the random latency and errors')
+
+
+def add_replay_server_arguments(parser):
+    parser.add_argument('--cassettes', required=True, help='Directory with the recorded responses')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8081, help='Port to listen on (default: 8081)')
+    add_stand_in_arguments(parser)
+    parser.add_argument('--error-status', type=int, default=503, help='HTTP status of the injected errors (default: 503)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log every request')
+
+
+def replay_server_main(args, parser):
+    if not 0 <= args.error_rate <= 1:
+        parser.error('--error-rate must be between 0 and 1')
+
+    from . import replay
+    replay.main(args)
+
+
+def add_bench_arguments(parser):
+    parser.add_argument('--cassettes', required=True, help='Directory with the recorded responses')
+    parser.add_argument('--record', action='store_true',
+                        help='query the live services and record their responses to --cassettes')
+    parser.add_argument('--stand-in', action='store_true',
+                        help='replay through a local stand-in server instead of in-process')
+    add_stand_in_arguments(parser)
+    parser.add_argument('--examples', nargs='*',
+                        help='examples to run, e.g. mentha2pdb/example string2pdb/example2 (default: all)')
+    parser.add_argument('-o', default='bench_results', help='Output directory (default: bench_results)')
+    parser.add_argument('--json', help='also write the report to this json file')
+
+    mentha_group = parser.add_argument_group('mentha2pdb options')
+    mentha_group.add_argument('-i', default='/data/databases/mentha-20250428/2025-04-28', help='mentha database file')
+    mentha_group.add_argument('-s', type=Decimal, default=Decimal('0.2'), help='Cutoff score (default: 0.2)')
+    mentha_group.add_argument('-extra', '--extra-files', dest='extra', nargs='*', default=None,
+                              help='list of extra files to process')
+    mentha_group.add_argument('-ec', '--extra-cutoff', dest='extra_cutoff', default=0.2, type=float,
+                              help='Cutoff on extra files pair pDockQ scores (default: 0.2)')
+    mentha_group.add_argument('-af', '--af-folder', dest='af', help='AF_Huri_HuMAP folder location')
+    mentha_group.add_argument('--ensg-xref', help=ENSG_XREF_HELP)
+
+    string_group = parser.add_argument_group('string2pdb options')
+    string_group.add_argument('--aliases_file_path', default="/data/databases/STRING/STRING_primary_upac.csv",
+                              help="Path to the pre-processed alias file containing STRING ID and UniProt mappings.")
+
+
+def bench_main(args, parser):
+    if args.record and args.stand_in:
+        parser.error('--record and --stand-in cannot be used together')
+    if args.extra is not None and args.af is None:
+        parser.error('Detected extra files but no AF_Huri_HuMAP folder path, use the -af parameter')
+    if not 0 <= args.error_rate <= 1:
+        parser.error('--error-rate must be between 0 and 1')
+
+    from . import bench
+    bench.main(args)
+
+
+def add_merge_arguments(parser):
+    parser.add_argument('sidecars', nargs='+', help='the <output>.shard-i-of-N.json files of all the shards')
+    parser.add_argument('-o', help='Output name (default: the -o of the shard runs)')
+
+
+def merge_main(args, parser):
+    from . import shard
+    shard.main(args)
+
+
+def add_build_string_db_arguments(parser):
+    parser.add_argument('--physical', help='STRING protein.physical.links.detailed file (.txt or .txt.gz)')
+    parser.add_argument('--functional', help='STRING protein.links.detailed file (.txt or .txt.gz)')
+    parser.add_argument('--info', required=True, help='STRING protein.info file, for the preferred names')
+    parser.add_argument('--aliases_file_path', default="/data/databases/STRING/STRING_primary_upac.csv",
+                        help="Path to the pre-processed alias file containing STRING ID and UniProt mappings.")
+    parser.add_argument('-o', required=True, help='Output directory of the local STRING database')
+
+
+def build_string_db_main(args, parser):
+    if not args.physical and not args.functional:
+        parser.error('at least one of --physical and --functional is needed')
+
+    from . import string_db
+    string_db.main(args)
+
+
+def add_build_pdb_index_arguments(parser):
+    parser.add_argument('--sifts', required=True, help='SIFTS pdb_chain_uniprot.csv file (.csv or .csv.gz)')
+    parser.add_argument('--taxonomy',
+                        help='SIFTS pdb_chain_taxonomy.csv file, to keep only the entries with a human chain as the '
+                             'RCSB search does')
+    parser.add_argument('-i', help='mentha database, to precompute the shared entries of its interactions')
+    parser.add_argument('-s', type=Decimal, default=Decimal('0'), help='mentha cutoff score (default: 0)')
+    parser.add_argument('--string-db', help='local STRING database, to precompute the shared entries of its '
+                                            'interactions')
+    parser.add_argument('--aliases_file_path', default="/data/databases/STRING/STRING_primary_upac.csv",
+                        help="Path to the pre-processed alias file containing STRING ID and UniProt mappings.")
+    parser.add_argument('-o', required=True, help='Output directory of the PDB index')
+
+
+def build_pdb_index_main(args, parser):
+    if importlib.util.find_spec('scipy') is None:
+        parser.error('build-pdb-index requires scipy (pip install scipy)')
+
+    from . import pdb_index
+    pdb_index.main(args)
+
+
+def add_query_arguments(parser):
+    parser.add_argument('store', help='results store written with --store')
+    parser.add_argument('--source', choices=STORE_SOURCES, help='only the rows of this tool')
+    parser.add_argument('--target', help='only the rows of this target UniProt AC')
+    parser.add_argument('--interactor', help='only the rows of this interactor UniProt AC')
+    parser.add_argument('--pdb', help='only the rows with this structure (PDB ID)')
+    parser.add_argument('--with-structure', action='store_true', help='only the rows with at least one structure')
+    for score in STORE_SCORES:
+        name = score.replace('_', '-')
+        parser.add_argument(f'--min-{name}', type=float, help=f'only the rows with {score} greater than this')
+        parser.add_argument(f'--max-{name}', type=float, help=f'only the rows with {score} lower than this')
+    parser.add_argument('--targets-only', action='store_true', help='only list the matching targets')
+    parser.add_argument('--runs', action='store_true', help='list the runs recorded in the store instead')
+    parser.add_argument('-o', help='output csv file (default: standard output)')
+
+
+def query_main(args, parser):
+    from . import store
+    store.main(args)
+
+
+def ppi2pdb_parser():
+    parser = argparse.ArgumentParser(prog='ppi2pdb', description="MAVISp INTERACTOME module tools.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    pipeline_parser = subparsers.add_parser(
+        'pipeline', help="Run mentha2pdb, string2pdb and aggregate in a single process for a list of targets.")
+    add_pipeline_arguments(pipeline_parser)
+    pipeline_parser.set_defaults(func=pipeline_main, subparser=pipeline_parser)
+
+    serve_parser = subparsers.add_parser(
+        'serve', help="Serve mentha2pdb, string2pdb and aggregate results over HTTP, keeping the databases loaded.")
+    add_serve_arguments(serve_parser)
+    serve_parser.set_defaults(func=serve_main, subparser=serve_parser)
+
+    replay_parser = subparsers.add_parser(
+        'replay-server', help="Serve recorded RCSB, PDBe, UniProt and STRING responses as a local stand-in.")
+    add_replay_server_arguments(replay_parser)
+    replay_parser.set_defaults(func=replay_server_main, subparser=replay_parser)
+
+    bench_parser = subparsers.add_parser(
+        'bench', help="Benchmark the bundled examples against recorded responses.")
+    add_bench_arguments(bench_parser)
+    bench_parser.set_defaults(func=bench_main, subparser=bench_parser)
+
+    merge_parser = subparsers.add_parser(
+        'merge', help="Combine the outputs of mentha2pdb --shard runs into the outputs of a serial run.")
+    add_merge_arguments(merge_parser)
+    merge_parser.set_defaults(func=merge_main, subparser=merge_parser)
+
+    string_db_parser = subparsers.add_parser(
+        'build-string-db', help="Build the local STRING database used by --string-db from the STRING bulk files.")
+    add_build_string_db_arguments(string_db_parser)
+    string_db_parser.set_defaults(func=build_string_db_main, subparser=string_db_parser)
+
+    pdb_index_parser = subparsers.add_parser(
+        'build-pdb-index', help="Build the PDB index used by --pdb-index from the SIFTS mappings.")
+    add_build_pdb_index_arguments(pdb_index_parser)
+    pdb_index_parser.set_defaults(func=build_pdb_index_main, subparser=pdb_index_parser)
+
+    query_parser = subparsers.add_parser(
+        'query', help="Query the results store written by the tools with --store.")
+    add_query_arguments(query_parser)
+    query_parser.set_defaults(func=query_main, subparser=query_parser)
+
+    return parser
+
+
+def main(argv=None):
+    warnings.filterwarnings("ignore")
+    args = ppi2pdb_parser().parse_args(argv)
+    args.func(args, args.subparser)
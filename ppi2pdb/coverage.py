@@ -0,0 +1,176 @@
+"""
+Structural coverage columns of the mentha2pdb output (--coverage).
+
+The PDBe UniProt mappings of every PDB entry are kept as integer arrays (see
+mentha2pdb.mapping_arrays). The chain segments of all the (PDB entry, protein)
+pairs of an output are concatenated into flat arrays and merged into
+non-overlapping intervals with vectorized operations (sort, running maximum,
+reduceat), so that every row gets:
+- target/interactor covered residues: the merged UniProt intervals of the
+  protein in the PDB entry of the row, e.g. 1-120;131-345;
+- target/interactor coverage: the fraction of the UniProt sequence they cover;
+- best PDB id: the entry of the pair covering the most residues of the two
+  proteins together, the same for all the rows of the pair.
+
+The UniProt sequence lengths are looked up LENGTH_BATCH accessions per query
+and kept between runs in PPI2PDB_CACHE_DIR/uniprot_lengths.json.
+"""
+
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from . import metrics
+from .formats import NA_VALUES
+from .http_client import api_url, load_cache, make_request, save_cache
+from .metrics import timed
+
+LENGTH_CACHE = 'uniprot_lengths.json'
+
+LENGTH_BATCH = 100
+
+# Column types of the parquet/arrow outputs (see ppi2pdb.formats)
+COVERAGE_TYPES = {
+    'target covered residues': 'list<string>',
+    'target coverage': 'float',
+    'interactor covered residues': 'list<string>',
+    'interactor coverage': 'float',
+    'best PDB id': 'string',
+}
+
+
+@timed('uniprot_lengths')
+def uniprot_lengths(accessions):
+    """
+    Returns the sequence lengths of UniProt ACs, from length_cache (kept between runs) or
+    from UniProt, LENGTH_BATCH accessions per query.
+
+    Args:
+        accessions: UniProt ACs.
+    Returns:
+        dict of UniProt AC -> length, or None if UniProt has none or could not be reached
+    """
+    length_cache = load_cache(LENGTH_CACHE)
+    missing = []
+    for accession in dict.fromkeys(accessions):
+        metrics.count_cache('length_cache', accession in length_cache)
+        if accession not in length_cache:
+            missing.append(accession)
+
+    url = api_url('uniprot', '/uniprotkb/search?fields=accession,sec_acc,length&size=500&query=')
+    found = False
+    for start in range(0, len(missing), LENGTH_BATCH):
+        batch = missing[start:start + LENGTH_BATCH]
+        res = make_request(url, 'get', quote(' OR '.join(f'accession:{a}' for a in batch)))
+        if res is None:
+            # not cached, asked again by the next run
+            continue
+        found = True
+        lengths = {}
+        for entry in res.get('results', []):
+            length = entry.get('sequence', {}).get('length')
+            for accession in [entry['primaryAccession']] + entry.get('secondaryAccessions', []):
+                lengths.setdefault(accession, length)
+        for accession in batch:
+            length_cache[accession] = lengths.get(accession)
+    if found:
+        save_cache(LENGTH_CACHE)
+
+    return {a: length_cache.get(a) for a in accessions}
+
+
+def merge_intervals(groups, starts, ends):
+    """
+    Merges the overlapping or adjacent intervals of every group, all groups at once.
+
+    Args:
+        groups: int array, group of every interval.
+        starts, ends: int arrays, first and last residue of every interval.
+    Returns:
+        (groups, starts, ends) of the merged intervals, sorted by group and start
+    """
+    if len(groups) == 0:
+        return groups, starts, ends
+    order = np.lexsort((starts, groups))
+    groups, starts, ends = groups[order], starts[order].astype(np.int64), ends[order].astype(np.int64)
+
+    # running maximum of the ends within each group: the groups are offset so
+    # that the maximum never carries over from one group to the next
+    offset = groups.astype(np.int64) * (int(ends.max()) + 2)
+    reach = np.maximum.accumulate(ends + offset) - offset
+
+    new = np.ones(len(groups), dtype=bool)
+    new[1:] = (groups[1:] != groups[:-1]) | (starts[1:] > reach[:-1] + 1)
+    first = np.flatnonzero(new)
+    return groups[first], starts[first], np.maximum.reduceat(ends, first)
+
+
+def protein_segments(keys):
+    """
+    Returns the chain segments of proteins in PDB entries as flat arrays.
+
+    Args:
+        keys: list of (PDB id, UniProt AC).
+    Returns:
+        (groups, starts, ends): index in keys, first and last residue of every segment
+    """
+    from .mentha2pdb import mapping_arrays
+
+    groups, starts, ends = [], [], []
+    for n, (pdb, accession) in enumerate(keys):
+        mappings = mapping_arrays(pdb)
+        if mappings is not None and accession in mappings:
+            _, first, last, _ = mappings[accession]
+            groups.append(np.full(len(first), n, dtype=np.int64))
+            starts.append(first)
+            ends.append(last)
+    if not groups:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(groups), np.concatenate(starts), np.concatenate(ends)
+
+
+@timed('coverage')
+def add_coverage(df, target_column='target uniprot id', interactor_column='interactor uniprot id',
+                 pdb_column='PDB id'):
+    """
+    Adds the COVERAGE_TYPES columns to an output dataframe.
+
+    Args:
+        df: mentha2pdb output rows.
+        target_column, interactor_column, pdb_column: columns of the UniProt ACs and PDB id.
+    Returns:
+        DataFrame with the coverage columns added ('na' for the rows without PDB entry or mapping)
+    """
+    df = df.copy()
+    pdbs = df[pdb_column].astype(str).str.strip()
+    valid = ~pdbs.isin(NA_VALUES) & df[pdb_column].notna()
+
+    keys = pd.concat([pd.DataFrame({'pdb': pdbs[valid], 'accession': df.loc[valid, column].astype(str)})
+                      for column in (target_column, interactor_column)]).drop_duplicates(ignore_index=True)
+    groups, starts, ends = merge_intervals(*protein_segments(list(keys.itertuples(index=False, name=None))))
+
+    # covered residues, intervals and coverage of every (PDB, protein)
+    keys['residues'] = np.bincount(groups, weights=ends - starts + 1, minlength=len(keys))
+    keys['intervals'] = pd.Series(np.char.add(np.char.add(starts.astype(str), '-'), ends.astype(str)),
+                                  dtype=object).groupby(groups).agg(';'.join)
+    keys['length'] = keys['accession'].map(uniprot_lengths(keys['accession'].tolist())).astype(float)
+    keys['coverage'] = np.minimum(keys['residues'] / keys['length'], 1.0).round(3)
+    keys = keys.set_index(['pdb', 'accession'])
+
+    residues = 0
+    for side, column in (('target', target_column), ('interactor', interactor_column)):
+        rows = keys.reindex(pd.MultiIndex.from_arrays([pdbs, df[column].astype(str)]))
+        df[f'{side} covered residues'] = rows['intervals'].fillna('na').to_numpy()
+        df[f'{side} coverage'] = rows['coverage'].where(rows['intervals'].notna()).astype(object).fillna('na').to_numpy()
+        residues = residues + rows['residues'].fillna(0).to_numpy()
+
+    # best PDB of every pair: most residues of the two proteins covered, the first PDB id on ties
+    scored = pd.DataFrame({'target': df[target_column], 'interactor': df[interactor_column], 'pdb': pdbs,
+                           'residues': residues})[valid.to_numpy()]
+    best = (scored.sort_values(['residues', 'pdb'], ascending=[False, True], kind='stable')
+            .drop_duplicates(['target', 'interactor']).set_index(['target', 'interactor'])['pdb'])
+    df['best PDB id'] = best.reindex(pd.MultiIndex.from_arrays([df[target_column], df[interactor_column]])) \
+        .fillna('na').to_numpy()
+
+    return df
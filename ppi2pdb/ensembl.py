@@ -0,0 +1,186 @@
+"""
+Ensembl gene ID -> UniProt AC mapping of the HuRI/HuMAP extra files.
+
+The HuRI models are named by Ensembl gene pairs (Name column, ENSG...-ENSG...)
+and the extra files need their UniProt pair (NameUPAC column). When an extra
+file has no NameUPAC column it is added by with_name_upac(), so that new
+HuRI/HuMAP releases can be given to -extra without preprocessing them.
+
+The Ensembl IDs are looked up, in this order:
+- in ensg_cache, kept between runs in PPI2PDB_CACHE_DIR/ensg_uniprot.json (see
+  ppi2pdb.http_client.load_cache);
+- in a local cross-reference file given with --ensg-xref: the UniProt
+  HUMAN_9606_idmapping.dat(.gz) file, or an Ensembl BioMart export with the
+  'Gene stable ID' and 'UniProtKB/Swiss-Prot ID' columns;
+- otherwise in UniProt, ENSG_BATCH IDs per search, the searches running
+  concurrently. Swiss-Prot entries are preferred to TrEMBL ones.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+import time
+
+import pandas as pd
+
+from . import metrics
+from .http_client import THREAD_POOL, api_url, get_session, load_cache, save_cache
+from .metrics import timed
+
+ENSG_CACHE = 'ensg_uniprot.json'
+
+ENSG_BATCH = 50
+
+XREF_CHUNK_ROWS = 2_000_000
+
+
+def strip_version(ensg):
+    """
+    Returns an Ensembl ID without its version (ENSG00000121410.12 -> ENSG00000121410).
+    """
+    return ensg.split('.', 1)[0]
+
+
+def grab_result(url):
+    response = get_session().get(url)
+    if 500 <= response.status_code < 600:
+        # server is overloaded? give it a break
+        time.sleep(5)
+    return response
+
+
+@timed('read_ensg_xref')
+def read_xref(xref_file, ensg_ids):
+    """
+    Reads the UniProt ACs of Ensembl gene IDs from a local cross-reference file.
+
+    Args:
+        xref_file: UniProt idmapping.dat(.gz), or a tab separated BioMart export.
+        ensg_ids: Ensembl gene IDs, without version.
+    Returns:
+        dict of Ensembl gene ID -> UniProt AC, for the IDs found in the file
+    """
+    wanted = set(ensg_ids)
+    header = [c.lower() for c in pd.read_csv(xref_file, sep='\t', nrows=0).columns]
+    gene_column = next((c for c in header if 'gene stable id' in c), None)
+    uniprot_column = next((c for c in header if 'uniprot' in c), None)
+
+    if gene_column is not None and uniprot_column is not None:
+        # BioMart export: one row per gene - UniProt AC pair
+        chunks = pd.read_csv(xref_file, sep='\t', dtype=str, chunksize=XREF_CHUNK_ROWS)
+        pairs = (c.rename(columns=str.lower)[[gene_column, uniprot_column]] for c in chunks)
+    else:
+        # idmapping.dat: UniProt AC, ID type, ID; the 'Ensembl' IDs are the genes
+        chunks = pd.read_csv(xref_file, sep='\t', header=None, usecols=[0, 1, 2], dtype=str,
+                             chunksize=XREF_CHUNK_ROWS)
+        pairs = (c.loc[c[1] == 'Ensembl', [2, 0]] for c in chunks)
+
+    found = {}
+    for chunk in pairs:
+        chunk = chunk.dropna()
+        genes = chunk.iloc[:, 0].map(strip_version)
+        keep = genes.isin(wanted)
+        for ensg, accession in zip(genes[keep], chunk.iloc[:, 1][keep]):
+            found.setdefault(ensg, accession)
+    return found
+
+
+@timed('query_ensg_uniprot')
+def query_uniprot(ensg_ids):
+    """
+    Looks up Ensembl gene IDs in UniProt, in concurrent searches of ENSG_BATCH IDs.
+
+    Args:
+        ensg_ids: Ensembl gene IDs, without version.
+    Returns:
+        dict of Ensembl gene ID -> UniProt AC, or None when UniProt has no human entry
+        for it; the IDs of failed searches are left out
+    """
+    batches = [ensg_ids[start:start + ENSG_BATCH] for start in range(0, len(ensg_ids), ENSG_BATCH)]
+    url = api_url('uniprot', '/uniprotkb/search?fields=accession,xref_ensembl&size=500&query=')
+    urls = [url + quote(f"organism_id:9606 AND ({' OR '.join(batch)})") for batch in batches]
+
+    found = {}
+    with ThreadPoolExecutor(max_workers=THREAD_POOL) as executor:
+        for batch, response in zip(batches, executor.map(grab_result, urls)):
+            if response.status_code != 200:
+                print("NA from ", response.url, " for Ensembl genes ", ', '.join(batch))
+                continue
+            entries = response.json().get('results', [])
+            # Swiss-Prot entries first, keeping the relevance order of UniProt otherwise
+            entries = sorted(entries, key=lambda e: 'Swiss-Prot' not in e.get('entryType', ''))
+            genes = {}
+            for entry in entries:
+                for xref in entry.get('uniProtKBCrossReferences', []):
+                    for prop in xref.get('properties', []):
+                        if prop['key'] == 'GeneId':
+                            genes.setdefault(strip_version(prop['value']), entry['primaryAccession'])
+            for ensg in batch:
+                found[ensg] = genes.get(ensg)
+    return found
+
+
+@timed('map_ensg')
+def map_ensg(ensg_ids, xref_file=None):
+    """
+    Maps Ensembl gene IDs to UniProt ACs.
+
+    Args:
+        ensg_ids: Ensembl gene IDs, with or without version.
+        xref_file: local cross-reference file (see read_xref), or None to query UniProt.
+    Returns:
+        dict of Ensembl gene ID (as given) -> UniProt AC, or None if it could not be mapped
+    """
+    ensg_cache = load_cache(ENSG_CACHE)
+    missing = []
+    for ensg in dict.fromkeys(map(strip_version, ensg_ids)):
+        metrics.count_cache('ensg_cache', ensg in ensg_cache)
+        if ensg not in ensg_cache:
+            missing.append(ensg)
+
+    if missing:
+        if xref_file:
+            # IDs missing from the file are not cached, a newer file may have them
+            found = read_xref(xref_file, missing)
+        else:
+            found = query_uniprot(missing)
+        ensg_cache.update(found)
+        if found:
+            save_cache(ENSG_CACHE)
+
+    return {ensg: ensg_cache.get(strip_version(ensg)) for ensg in ensg_ids}
+
+
+def with_name_upac(extra_file_data, xref_file=None):
+    """
+    Adds the NameUPAC column (UniProt pair) to an extra file that only has the Name column,
+    mapping its Ensembl gene IDs with map_ensg(). Malformed names and pairs that cannot be
+    mapped are dropped.
+
+    Args:
+        extra_file_data: DataFrame of a HuRI/HuMAP extra file.
+        xref_file: local cross-reference file, or None to query UniProt.
+    Returns:
+        DataFrame with the NameUPAC column
+    """
+    if 'NameUPAC' in extra_file_data.columns:
+        return extra_file_data
+
+    names = (extra_file_data['Name'].astype(str).str.split('-', n=1, expand=True)
+             .reindex(columns=[0, 1]).fillna('').astype(str))
+    valid = (names[0] != '') & (names[1] != '')
+    if not valid.all():
+        print(f"{(~valid).sum()} of {len(valid)} pairs without a <gene>-<gene> Name, skipped")
+        extra_file_data, names = extra_file_data[valid], names[valid]
+
+    ids = pd.concat([names[0], names[1]])
+    mapping = map_ensg(sorted(set(ids[ids.str.startswith('ENSG')])), xref_file)
+
+    up1 = names[0].map(lambda i: mapping[i] if i.startswith('ENSG') else i)
+    up2 = names[1].map(lambda i: mapping[i] if i.startswith('ENSG') else i)
+    mapped = up1.notna() & up2.notna()
+    if not mapped.all():
+        print(f"{(~mapped).sum()} of {len(mapped)} pairs have Ensembl genes without UniProt AC, skipped")
+
+    extra_file_data = extra_file_data[mapped].copy()
+    extra_file_data['NameUPAC'] = up1[mapped] + '-' + up2[mapped]
+    return extra_file_data
@@ -0,0 +1,159 @@
+"""
+Output formats of mentha2pdb, string2pdb, aggregate and the pipeline.
+
+csv files are written exactly as before. The parquet and arrow (Arrow IPC
+file) formats are written through pyarrow, which is only imported when one of
+them is requested: each tool declares the type of its output columns, the
+'na'/'none'/'' sentinels become real nulls and the ';'-separated chain,
+residue and structure columns become list columns.
+"""
+
+import math
+import os
+from decimal import Decimal
+
+FORMATS = ('csv', 'parquet', 'arrow')
+
+EXTENSIONS = {
+    'csv': '.csv',
+    'parquet': '.parquet',
+    'arrow': '.arrow',
+}
+
+# Column types of the parquet/arrow outputs, columns not declared are stored as
+# float if all their values are numbers, as string otherwise
+COLUMN_TYPES = ('string', 'float', 'int', 'list<string>', 'list<int>')
+
+NA_VALUES = ('na', 'none', 'NA', 'None', '')
+
+
+def output_path(path, fmt):
+    """
+    Returns path with the extension of fmt, path is returned unchanged for csv.
+    """
+    if fmt == 'csv':
+        return path
+    return os.path.splitext(path)[0] + EXTENSIONS[fmt]
+
+
+def is_null(value):
+    if value is None:
+        return True
+    if isinstance(value, float) and math.isnan(value):
+        return True
+    if isinstance(value, str) and value.strip() in NA_VALUES:
+        return True
+    try:
+        # pandas.NA, NaT and numpy nan
+        return value != value
+    except (TypeError, ValueError):
+        return False
+
+
+def to_float(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    return float(value)
+
+
+def to_int(value):
+    number = float(value)
+    if not number.is_integer():
+        raise ValueError(f"{value} is not an integer")
+    return int(number)
+
+
+def split_list(value, cast):
+    return [cast(item.strip()) for item in str(value).split(';') if item.strip() not in NA_VALUES]
+
+
+CONVERTERS = {
+    'string': str,
+    'float': to_float,
+    'int': to_int,
+    'list<string>': lambda value: split_list(value, str),
+    'list<int>': lambda value: split_list(value, to_int),
+}
+
+
+def typed_column(values, column_type):
+    """
+    Converts the values of a column to column_type, nulls become None.
+
+    Args:
+        values: iterable of the column values.
+        column_type: one of COLUMN_TYPES, or None to infer float or string.
+    Returns:
+        (list of converted values, column type)
+    """
+    values = [None if is_null(v) else v for v in values]
+
+    if column_type is None:
+        try:
+            return [None if v is None else to_float(v) for v in values], 'float'
+        except (TypeError, ValueError):
+            column_type = 'string'
+
+    convert = CONVERTERS[column_type]
+    return [None if v is None else convert(v) for v in values], column_type
+
+
+def to_arrow_table(df, column_types=None):
+    """
+    Builds a pyarrow Table with typed columns from a tool output dataframe.
+
+    Args:
+        df: output dataframe, with the values as written to csv.
+        column_types: dict of column name -> one of COLUMN_TYPES.
+    Returns:
+        pyarrow.Table
+    """
+    import pyarrow as pa
+
+    arrow_types = {
+        'string': pa.string(),
+        'float': pa.float64(),
+        'int': pa.int64(),
+        'list<string>': pa.list_(pa.string()),
+        'list<int>': pa.list_(pa.int64()),
+    }
+    column_types = column_types or {}
+
+    arrays = []
+    for column in df.columns:
+        values, column_type = typed_column(df[column].tolist(), column_types.get(column))
+        arrays.append(pa.array(values, type=arrow_types[column_type]))
+
+    return pa.Table.from_arrays(arrays, names=[str(c) for c in df.columns])
+
+
+def write_table(df, path, fmt='csv', column_types=None, **csv_kwargs):
+    """
+    Writes a tool output dataframe in one of FORMATS.
+
+    Args:
+        df: output dataframe.
+        path: output file name, its extension is replaced for parquet and arrow.
+        fmt: one of FORMATS.
+        column_types: dict of column name -> type, used for parquet and arrow.
+        csv_kwargs: arguments of DataFrame.to_csv(), used for csv.
+    Returns:
+        The name of the written file.
+    """
+    path = output_path(path, fmt)
+
+    if fmt == 'csv':
+        df.to_csv(path, **csv_kwargs)
+        return path
+
+    table = to_arrow_table(df, column_types)
+    if fmt == 'parquet':
+        import pyarrow.parquet as pq
+        pq.write_table(table, path)
+    elif fmt == 'arrow':
+        import pyarrow.feather as feather
+        feather.write_feather(table, path)
+    else:
+        raise ValueError(f"unknown format {fmt}, expected one of {', '.join(FORMATS)}")
+
+    return path
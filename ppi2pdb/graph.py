@@ -0,0 +1,324 @@
+"""
+Second-shell expansion of the interactome (--depth 2).
+
+The filtered Mentha edge list (or the STRING network of a local STRING
+database) is stored as a symmetric CSR adjacency matrix over integer encoded
+UniProt ACs, with the rows sorted by descending score. The neighbourhood of
+the targets is expanded with vectorized operations on the CSR arrays: the
+first shell are the partners of a target, the second shell the partners of
+the first shell proteins. Hubs are capped to their max_fanout best scoring
+partners, so that a single highly connected protein does not blow up the
+expansion.
+
+The expanded pairs (first shell protein, its partner) are annotated with the
+PDB lookups of mentha2pdb, deduplicated: the PDB entries of every protein are
+searched once, the shared entries of every unordered pair are computed once
+over all the targets, and the PDBe summary, experiment and mappings responses
+are cached by ppi2pdb.http_client.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .http_client import THREAD_POOL
+from .metrics import timed
+
+# Default maximum number of partners followed from every first shell protein
+MAX_FANOUT = 50
+
+SHELL_COLUMNS = ['target uniprot id', 'partner uniprot id', 'partner uniprot gene', 'partner score',
+                 'interactor uniprot id', 'interactor uniprot gene', 'interactor score', 'shell', 'PDB id', 'fusion',
+                 'partner chain id', 'partner starting residue', 'partner ending residue',
+                 'interactor chain id', 'interactor starting residue', 'interactor ending residue',
+                 'other interactors', 'method', 'resolution', 'dna chains', 'num ligands']
+
+# Column types of the parquet/arrow outputs (see ppi2pdb.formats)
+SHELL_TYPES = {
+    'target uniprot id': 'string',
+    'partner uniprot id': 'string',
+    'partner uniprot gene': 'string',
+    'partner score': 'float',
+    'interactor uniprot id': 'string',
+    'interactor uniprot gene': 'string',
+    'interactor score': 'float',
+    'shell': 'int',
+    'PDB id': 'string',
+    'fusion': 'string',
+    'partner chain id': 'list<string>',
+    'partner starting residue': 'list<int>',
+    'partner ending residue': 'list<int>',
+    'interactor chain id': 'list<string>',
+    'interactor starting residue': 'list<int>',
+    'interactor ending residue': 'list<int>',
+    'other interactors': 'list<string>',
+    'method': 'string',
+    'resolution': 'float',
+    'dna chains': 'int',
+    'num ligands': 'int',
+}
+
+
+class InteractionGraph:
+    """
+    Undirected weighted interaction graph in CSR form.
+
+    Args:
+        proteins: array of UniProt ACs, the position of a protein is its node ID.
+        genes: array of the gene names of the proteins.
+        indptr, indices, scores: CSR adjacency, every row sorted by descending score.
+    """
+
+    def __init__(self, proteins, genes, indptr, indices, scores):
+        self.proteins = proteins
+        self.genes = genes
+        self.indptr = indptr
+        self.indices = indices
+        self.scores = scores
+        self.node_ids = pd.Index(proteins)
+
+    @classmethod
+    def from_edges(cls, a, b, scores, genes_a, genes_b):
+        """
+        Builds the graph from an edge list. Edges are made symmetric, self
+        interactions are dropped and repeated pairs keep their best score.
+
+        Args:
+            a, b: arrays of UniProt ACs of the interacting proteins.
+            scores: array of the scores of the interactions.
+            genes_a, genes_b: arrays of the gene names of a and b.
+        """
+        codes, proteins = pd.factorize(np.concatenate([a, b]))
+        n_edges = len(a)
+        genes = np.empty(len(proteins), dtype=object)
+        genes[codes[::-1]] = np.concatenate([genes_a, genes_b])[::-1]
+
+        source = np.concatenate([codes[:n_edges], codes[n_edges:]])
+        target = np.concatenate([codes[n_edges:], codes[:n_edges]])
+        weight = np.concatenate([scores, scores]).astype(np.float64)
+
+        keep = source != target
+        source, target, weight = source[keep], target[keep], weight[keep]
+
+        # best score per (source, target) pair, then rows by descending score
+        order = np.lexsort((-weight, target, source))
+        source, target, weight = source[order], target[order], weight[order]
+        first = np.ones(len(source), dtype=bool)
+        first[1:] = (source[1:] != source[:-1]) | (target[1:] != target[:-1])
+        source, target, weight = source[first], target[first], weight[first]
+
+        order = np.lexsort((target, -weight, source))
+        indptr = np.zeros(len(proteins) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(source, minlength=len(proteins)), out=indptr[1:])
+        return cls(np.asarray(proteins, dtype=object), genes, indptr, target[order].astype(np.int32), weight[order])
+
+    @classmethod
+    @timed('graph_from_mentha')
+    def from_mentha(cls, data):
+        """
+        Builds the graph of the mentha database filtered by load_mentha().
+        """
+        return cls.from_edges(data['Protein A'].to_numpy(), data['Protein B'].to_numpy(),
+                              data['Score'].astype(float).to_numpy(),
+                              data['Gene A'].to_numpy(), data['Gene B'].to_numpy())
+
+    @classmethod
+    @timed('graph_from_string_db')
+    def from_string_db(cls, string_db, alias_df, network='physical', threshold=0.15):
+        """
+        Builds the graph of a local STRING database network (see ppi2pdb.string_db),
+        with the filters of string2pdb (score >= threshold and experimental or database
+        score > 0), and the STRING proteins mapped to their primary UniProt ACs.
+
+        Args:
+            string_db: StringDB.
+            alias_df: dict of STRING ID -> UniProt ACs, see string2pdb.index_aliases().
+            network: 'physical' or 'functional'.
+            threshold: minimum STRING score.
+        """
+        indptr, indices, scores = (np.asarray(x) for x in string_db.networks[network])
+        source = np.repeat(np.arange(len(indptr) - 1, dtype=np.int32), np.diff(indptr))
+        scores = np.round(scores.astype(np.float64), 3)
+        keep = (scores[:, 0] >= threshold) & ((scores[:, 1] > 0) | (scores[:, 2] > 0))
+
+        edges = pd.DataFrame({'a': string_db.proteins[source[keep]].astype(object),
+                              'b': string_db.proteins[np.asarray(indices)[keep]].astype(object),
+                              'gene_a': string_db.names[source[keep]].astype(object),
+                              'gene_b': string_db.names[np.asarray(indices)[keep]].astype(object),
+                              'score': scores[keep, 0]})
+        edges['a'] = edges['a'].map(alias_df)
+        edges['b'] = edges['b'].map(alias_df)
+        edges = edges.dropna(subset=['a', 'b']).explode('a').explode('b')
+        return cls.from_edges(edges['a'].to_numpy(), edges['b'].to_numpy(), edges['score'].to_numpy(),
+                              edges['gene_a'].to_numpy(), edges['gene_b'].to_numpy())
+
+    def neighbours(self, nodes, max_fanout=None):
+        """
+        Returns the edges of nodes, at most max_fanout (best scoring) per node.
+
+        Returns:
+            (position in nodes, neighbour node IDs, scores) arrays
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        starts = self.indptr[nodes]
+        counts = self.indptr[nodes + 1] - starts
+        if max_fanout is not None:
+            counts = np.minimum(counts, max_fanout)
+
+        owner = np.repeat(np.arange(len(nodes)), counts)
+        # position of every edge in its row: 0, 1, ... counts[n] - 1
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        edges = np.repeat(starts, counts) + offsets
+        return owner, self.indices[edges], self.scores[edges]
+
+    @timed('second_shell')
+    def second_shell(self, targets, max_fanout=MAX_FANOUT):
+        """
+        Expands the neighbourhood of the targets to the partners of their partners.
+
+        Every row is an edge (partner, interactor) with partner in the first shell
+        of the target and interactor != target; shell is 1 if the interactor is
+        also a partner of the target (the edge is then listed once), 2 otherwise.
+
+        Args:
+            targets: list of UniProt ACs.
+            max_fanout: maximum number of partners followed from every first shell protein.
+        Returns:
+            DataFrame with the target, partner and interactor columns of SHELL_COLUMNS
+        """
+        target_ids = self.node_ids.get_indexer(targets)
+        known = target_ids >= 0
+        target_ids = target_ids[known]
+        target_names = np.asarray(targets, dtype=object)[known]
+
+        # first shell: all the partners of the targets
+        owner, partners, partner_scores = self.neighbours(target_ids)
+        # second shell: capped partners of the first shell, the target (always among
+        # them) not counting towards the cap
+        first, interactors, interactor_scores = self.neighbours(partners, max_fanout + 1)
+        target_of = owner[first]
+
+        edges = pd.DataFrame({'target': target_ids[target_of], 'partner': partners[first], 'first': first,
+                              'interactor': interactors, 'partner_score': partner_scores[first],
+                              'interactor_score': interactor_scores, 'target_name': target_names[target_of]})
+        edges = edges[edges['interactor'] != edges['target']]
+        edges = edges[edges.groupby('first').cumcount() < max_fanout]
+
+        # interactors that are first shell partners of the same target
+        first_shell = pd.MultiIndex.from_arrays([target_ids[owner], partners])
+        edges['shell'] = np.where(pd.MultiIndex.from_arrays([edges['target'], edges['interactor']])
+                                  .isin(first_shell), 1, 2)
+        low = np.minimum(edges['partner'], edges['interactor'])
+        high = np.maximum(edges['partner'], edges['interactor'])
+        duplicate = pd.DataFrame({'t': edges['target'], 'low': low, 'high': high}).duplicated()
+        edges = edges[~(duplicate & (edges['shell'] == 1))]
+
+        return pd.DataFrame({
+            'target uniprot id': edges['target_name'].to_numpy(),
+            'partner uniprot id': self.proteins[edges['partner'].to_numpy()],
+            'partner uniprot gene': self.genes[edges['partner'].to_numpy()],
+            'partner score': edges['partner_score'].to_numpy(),
+            'interactor uniprot id': self.proteins[edges['interactor'].to_numpy()],
+            'interactor uniprot gene': self.genes[edges['interactor'].to_numpy()],
+            'interactor score': edges['interactor_score'].to_numpy(),
+            'shell': edges['shell'].to_numpy(),
+        })
+
+
+def pdb_entries(proteins):
+    """
+    Searches the PDB entries of every protein once, in parallel.
+
+    Returns:
+        dict of UniProt AC -> set of PDB IDs
+    """
+    from .mentha2pdb import get_pdb_entries_for_uniprot
+
+    proteins = list(dict.fromkeys(proteins))
+    with ThreadPoolExecutor(max_workers=THREAD_POOL) as executor:
+        return {p: set(entries) for p, entries in zip(proteins, executor.map(get_pdb_entries_for_uniprot, proteins))}
+
+
+def pdb_details(pdb):
+    """
+    Returns the (fusion, method, resolution, dna chains, num ligands) annotations of a PDB entry.
+    """
+    from .mentha2pdb import get_experiment, get_summary
+
+    fused, dna, ligands, method = get_summary(pdb)
+    return fused, method, get_experiment(pdb), dna, ligands
+
+
+@timed('annotate_pairs')
+def annotate_pairs(edges):
+    """
+    Annotates the expanded pairs with their shared PDB entries, as mentha2pdb
+    does for the direct partners: one row per (edge, shared PDB), or one row
+    with 'na' annotations for the pairs without shared entries.
+
+    Args:
+        edges: DataFrame from InteractionGraph.second_shell().
+    Returns:
+        DataFrame with SHELL_COLUMNS
+    """
+    from .mentha2pdb import get_mappings_data
+    from .pdb_index import active_pdb_index
+
+    pdb_index = active_pdb_index()
+    entries = pdb_entries(np.concatenate([edges['partner uniprot id'].to_numpy(),
+                                          edges['interactor uniprot id'].to_numpy()]))
+
+    # shared entries of every unordered pair, once over all the targets
+    pairs = edges[['partner uniprot id', 'interactor uniprot id']].drop_duplicates()
+    shared = {}
+    for a, b in pairs.itertuples(index=False):
+        key = (a, b) if a <= b else (b, a)
+        if key not in shared:
+            shared[key] = sorted(pdb_index.shared(a, b) if pdb_index is not None else entries[a] & entries[b])
+
+    edges = edges.copy()
+    edges['PDB id'] = [shared[(a, b) if a <= b else (b, a)] or ['na'] for a, b in
+                       zip(edges['partner uniprot id'], edges['interactor uniprot id'])]
+    edges = edges.explode('PDB id', ignore_index=True)
+
+    with_pdb = edges[edges['PDB id'] != 'na']
+    pdbs = list(dict.fromkeys(with_pdb['PDB id']))
+    triples = list(dict.fromkeys(zip(with_pdb['PDB id'], with_pdb['partner uniprot id'],
+                                     with_pdb['interactor uniprot id'])))
+    with ThreadPoolExecutor(max_workers=THREAD_POOL) as executor:
+        details = dict(zip(pdbs, executor.map(pdb_details, pdbs)))
+        mappings = dict(zip(triples, executor.map(lambda t: get_mappings_data(*t), triples)))
+
+    na_details = ('na',) * 5
+    na_mappings = ('na',) * 7
+    detail_rows = [details.get(pdb, na_details) for pdb in edges['PDB id']]
+    mapping_rows = [mappings.get(t, na_mappings) for t in zip(edges['PDB id'], edges['partner uniprot id'],
+                                                               edges['interactor uniprot id'])]
+
+    for n, column in enumerate(['fusion', 'method', 'resolution', 'dna chains', 'num ligands']):
+        edges[column] = [row[n] for row in detail_rows]
+    for n, column in enumerate(['partner chain id', 'partner starting residue', 'partner ending residue',
+                                'interactor chain id', 'interactor starting residue', 'interactor ending residue',
+                                'other interactors']):
+        edges[column] = [row[n] for row in mapping_rows]
+
+    edges = edges[SHELL_COLUMNS]
+    return edges.sort_values(['target uniprot id', 'shell', 'partner score', 'partner uniprot id', 'interactor score',
+                              'interactor uniprot id', 'PDB id'],
+                             ascending=[True, True, False, True, False, True, True], kind='stable')
+
+
+def second_shell_interactors(graph, targets, max_fanout=MAX_FANOUT):
+    """
+    Expands and annotates the second shell of the targets.
+
+    Args:
+        graph: InteractionGraph.
+        targets: list of UniProt ACs.
+        max_fanout: maximum number of partners followed from every first shell protein.
+    Returns:
+        dict of target -> DataFrame with SHELL_COLUMNS (targets without partners are missing)
+    """
+    annotated = annotate_pairs(graph.second_shell([t.strip() for t in targets], max_fanout))
+    return {target: df.reset_index(drop=True) for target, df in annotated.groupby('target uniprot id', sort=False)}
@@ -0,0 +1,269 @@
+"""
+HTTP connection pool and response caches shared by mentha2pdb, string2pdb and
+the pipeline.
+
+The requests.Session is only created on first use, so that importing the
+package and parsing command line arguments stay fast.
+
+Setting PPI2PDB_CASSETTES to a directory records all the responses there
+(PPI2PDB_CASSETTE_MODE=record, the default) or answers all the requests from
+it without any network access (PPI2PDB_CASSETTE_MODE=replay), see
+ppi2pdb.replay.
+
+UniProt gene names and Ensembl -> UniProt mappings are also kept between runs
+in PPI2PDB_CACHE_DIR (~/.cache/ppi2pdb by default, an empty value disables
+it), see load_cache().
+"""
+
+import json
+import os
+import time
+import threading
+from collections import Counter
+from urllib.parse import urlsplit
+
+import requests
+
+from . import metrics
+
+THREAD_POOL = 16
+
+# Base URLs of the web services, each can be redirected (e.g. to a local
+# stand-in server) with the PPI2PDB_<NAME>_URL environment variable or set_api_url()
+API_URLS = {
+    'rcsb_search': 'https://search.rcsb.org',
+    'rcsb_data': 'https://data.rcsb.org',
+    'rcsb_files': 'https://files.rcsb.org',
+    'rcsb_models': 'https://models.rcsb.org',
+    'pdbe': 'https://www.ebi.ac.uk/pdbe',
+    'uniprot': 'https://rest.uniprot.org',
+    'string': 'https://string-db.org',
+}
+
+for _name in API_URLS:
+    API_URLS[_name] = os.environ.get(f'PPI2PDB_{_name.upper()}_URL', API_URLS[_name]).rstrip('/')
+
+_session = None
+# requests.adapters.BaseAdapter used instead of the network, see set_transport()
+_transport = None
+
+# RCSB search results (UniProt AC -> PDB ids), RCSB entries (PDB id -> details)
+# and PDBe/UniProt responses, shared by all the targets and tools of a run
+pdb_search_cache = {}
+entry_cache = {}
+request_cache = {}
+# mentha2pdb structural annotations of the shared PDB entries, per unordered
+# pair of UniProt ACs (see mentha2pdb.annotate_pair)
+pair_cache = {}
+# PDBe UniProt mappings of every PDB entry, as integer arrays (see
+# mentha2pdb.mapping_arrays)
+mapping_cache = {}
+# (PDB id, target, interactor) -> interface contact and residues (see
+# ppi2pdb.interfaces)
+interface_cache = {}
+# UniProt AC -> gene name ('' when UniProt has none), Ensembl gene ID ->
+# UniProt AC (None when there is none) and UniProt AC -> sequence length
+# (None when UniProt has none), saved in CACHE_DIR between runs
+gene_cache = {}
+ensg_cache = {}
+length_cache = {}
+
+CACHE_DIR = os.environ.get('PPI2PDB_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'ppi2pdb'))
+PERSISTENT_CACHES = {'uniprot_genes.json': gene_cache, 'ensg_uniprot.json': ensg_cache,
+                     'uniprot_lengths.json': length_cache}
+_loaded_caches = set()
+
+# Number of HTTP requests sent, per service name of API_URLS
+request_counts = Counter()
+
+
+def api_url(name, path):
+    """
+    Returns the full URL of path on one of the API_URLS services
+
+    :param name: String, key of API_URLS
+    :param path: String, starting with /
+    :return: String
+    """
+    return API_URLS[name] + path
+
+
+def split_api_url(url):
+    """
+    Splits a URL into the API_URLS service it belongs to and the rest of it
+
+    :param url: String
+    :return: (service name or '', path, query string)
+    """
+    for name, base in API_URLS.items():
+        if url == base or url.startswith(base + '/') or url.startswith(base + '?'):
+            url = url[len(base):]
+            break
+    else:
+        name = ''
+
+    parts = urlsplit(url)
+    path = parts.path if name else url.split('?', 1)[0]
+    return name, path, parts.query
+
+
+def clear_caches():
+    """
+    Empties the response caches and the request counts
+    """
+    pdb_search_cache.clear()
+    entry_cache.clear()
+    request_cache.clear()
+    pair_cache.clear()
+    mapping_cache.clear()
+    interface_cache.clear()
+    gene_cache.clear()
+    ensg_cache.clear()
+    length_cache.clear()
+    # reloaded from CACHE_DIR on next use, so that saving them does not drop the entries on disk
+    _loaded_caches.clear()
+    request_counts.clear()
+
+
+def load_cache(name):
+    """
+    Adds the entries saved by previous runs in CACHE_DIR to one of the
+    PERSISTENT_CACHES (once per process)
+
+    :param name: String, file name of the cache, key of PERSISTENT_CACHES
+    :return: dict, the cache
+    """
+    cache = PERSISTENT_CACHES[name]
+    if name not in _loaded_caches and CACHE_DIR:
+        _loaded_caches.add(name)
+        try:
+            with open(os.path.join(CACHE_DIR, name)) as fh:
+                for key, value in json.load(fh).items():
+                    cache.setdefault(key, value)
+        except (OSError, ValueError):
+            pass
+    return cache
+
+
+def save_cache(name):
+    """
+    Writes one of the PERSISTENT_CACHES to CACHE_DIR, atomically so that
+    concurrent runs never read a partial file
+
+    :param name: String, file name of the cache, key of PERSISTENT_CACHES
+    """
+    if not CACHE_DIR:
+        return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = os.path.join(CACHE_DIR, name)
+        tmp = f'{path}.tmp-{os.getpid()}-{threading.get_ident()}'
+        with open(tmp, 'w') as fh:
+            # a copy: other threads may add entries while it is written
+            json.dump(dict(PERSISTENT_CACHES[name]), fh, sort_keys=True)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"Could not save {name} in {CACHE_DIR}: {e}")
+
+
+def set_api_url(name, url):
+    """
+    Redirects one of the API_URLS services to another base URL
+
+    :param name: String, key of API_URLS
+    :param url: String
+    """
+    global _session
+
+    if name not in API_URLS:
+        raise KeyError(f"unknown service {name}, expected one of {', '.join(API_URLS)}")
+
+    API_URLS[name] = url.rstrip('/')
+    # the connection pool mounts depend on the URLs
+    _session = None
+
+
+def set_transport(adapter):
+    """
+    Sends all the requests through adapter instead of the network, e.g. a
+    ppi2pdb.replay.CassetteAdapter; None restores the network
+
+    :param adapter: requests.adapters.BaseAdapter or None
+    """
+    global _session, _transport
+
+    _transport = adapter
+    _session = None
+
+
+def _count_response(response, *args, **kwargs):
+    service, path, _ = split_api_url(response.request.url)
+    request_counts[service] += 1
+    metrics.record_response(service, path, response)
+
+
+def get_session():
+    """
+    Returns the shared requests.Session, creating it on first use
+
+    :return: requests.Session
+    """
+    global _session
+
+    if _session is None:
+        if _transport is None and os.environ.get('PPI2PDB_CASSETTES'):
+            from .replay import CassetteAdapter
+            set_transport(CassetteAdapter(os.environ['PPI2PDB_CASSETTES'],
+                                          os.environ.get('PPI2PDB_CASSETTE_MODE', 'record')))
+
+        session = requests.Session()
+        session.hooks['response'].append(_count_response)
+        if _transport is not None:
+            session.mount('http://', _transport)
+            session.mount('https://', _transport)
+        else:
+            # This is how to create a reusable connection pool with python requests.
+            # Mounted on the whole service: the UniProt lookups (gene names, sequence
+            # lengths, Ensembl mappings, UniRef sequences) run in THREAD_POOL threads
+            session.mount(
+                api_url('uniprot', '/'),
+                requests.adapters.HTTPAdapter(pool_maxsize=THREAD_POOL,
+                                              max_retries=3,
+                                              pool_block=True)
+            )
+        _session = session
+
+    return _session
+
+
+def make_request(url, mode, pdb_id):
+    """
+    This function can make GET and POST requests to
+    the PDBe API. Successful responses are cached in
+    request_cache, so the same PDB is only requested once
+
+    :param url: String,
+    :param mode: String,
+    :param pdb_id: String
+    :return: JSON or None
+    """
+    key = (mode, url, pdb_id)
+    metrics.count_cache('request_cache', key in request_cache)
+    if key in request_cache:
+        return request_cache[key]
+
+    session = get_session()
+    if mode == "get":
+        time.sleep(0.01)
+        response = session.get(url=url + pdb_id)
+    elif mode == "post":
+        time.sleep(0.01)
+        response = session.post(url, data=pdb_id)
+
+    if response.status_code == 200:
+        request_cache[key] = response.json()
+        return request_cache[key]
+    else:
+        print("NA from ", url, " for pdb ", pdb_id)
+
+    return None
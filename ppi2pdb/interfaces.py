@@ -0,0 +1,429 @@
+"""
+Interface contacts of the experimental complexes of the mentha2pdb output (--interfaces).
+
+The PDB entries of the rows only list the chains of the target and interactor
+(see mentha2pdb.get_mappings_data); in large assemblies many of them never
+touch. For every (target, interactor, PDB entry) this module reports:
+- interface contact: yes if a heavy atom of a target chain is within
+  --contact-distance (5 A by default) of a heavy atom of an interactor chain,
+  no otherwise, na if the structure or the chains are not available;
+- target/interactor interface residues: the residues in contact, in UniProt
+  numbering (through the PDBe mappings of the entry), e.g. 45;46;49.
+
+Structures are fetched once into a local compressed mirror (--structure-mirror,
+PPI2PDB_CACHE_DIR/structures by default), <mirror>/<middle two characters>/<id>.cif.gz
+or .bcif.gz, and reused by the next runs. With --structure-source (e.g. a copy
+of the wwPDB mmCIF rsync tree) the structures are only read from that folder
+and nothing is downloaded, so the stage also works offline.
+
+The entries are processed in a process pool: only the atom records of the
+target and interactor chains are parsed, into NumPy coordinate arrays, and
+the contacts are searched with a k-d tree per chain (requires scipy).
+BinaryCIF (--structure-format bcif) is decoded with NumPy and requires msgpack
+(the bcif extra).
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import gzip
+import os
+import threading
+
+import numpy as np
+
+from . import metrics
+from .formats import NA_VALUES
+from .http_client import CACHE_DIR, THREAD_POOL, api_url, get_session, interface_cache
+from .metrics import timed
+
+STRUCTURE_FORMATS = ('cif', 'bcif')
+
+MIRROR_DIR = os.path.join(CACHE_DIR, 'structures') if CACHE_DIR else 'structures'
+
+# Heavy atom distance cutoff of the contacts, in Angstrom
+CONTACT_DISTANCE = 5.0
+
+# Column types of the parquet/arrow outputs (see ppi2pdb.formats)
+INTERFACE_TYPES = {
+    'interface contact': 'string',
+    'target interface residues': 'list<int>',
+    'interactor interface residues': 'list<int>',
+}
+
+NO_INTERFACE = ('na', 'na', 'na')
+
+# atom_site items read from the structures
+ATOM_ITEMS = ('type_symbol', 'label_alt_id', 'label_seq_id', 'auth_asym_id', 'Cartn_x', 'Cartn_y', 'Cartn_z',
+              'pdbx_PDB_model_num')
+
+# BinaryCIF ByteArray types
+BCIF_TYPES = {1: '<i1', 2: '<i2', 3: '<i4', 4: '<u1', 5: '<u2', 6: '<u4', 32: '<f4', 33: '<f8'}
+
+_pool = None
+
+
+def local_structure(pdb, source):
+    """
+    Returns the file of a PDB entry in a local folder, flat or divided in
+    <middle two characters>/ subfolders, as <id>.cif(.gz) or <id>.bcif(.gz), or None.
+    """
+    for name in (pdb.lower(), pdb.upper()):
+        for folder in (source, os.path.join(source, name[1:3])):
+            for extension in ('.cif.gz', '.cif', '.bcif.gz', '.bcif'):
+                path = os.path.join(folder, name + extension)
+                if os.path.isfile(path):
+                    return path
+    return None
+
+
+def structure_file(pdb, mirror=MIRROR_DIR, source=None, fmt='cif'):
+    """
+    Returns the local file of a PDB entry, downloading it into the mirror if needed.
+
+    Args:
+        pdb: PDB id.
+        mirror: folder of the compressed mirror.
+        source: local folder to read the structures from instead, without downloading.
+        fmt: one of STRUCTURE_FORMATS, format of the downloaded structures.
+    Returns:
+        path, or None if the structure is not available
+    """
+    if source is not None:
+        return local_structure(pdb, source)
+
+    pdb = pdb.lower()
+    path = os.path.join(mirror, pdb[1:3], f'{pdb}.{fmt}.gz')
+    metrics.count_cache('structure_mirror', os.path.isfile(path))
+    if os.path.isfile(path):
+        return path
+
+    if fmt == 'cif':
+        url = api_url('rcsb_files', f'/download/{pdb}.cif')
+    else:
+        url = api_url('rcsb_models', f'/{pdb}.bcif')
+    try:
+        response = get_session().get(url, timeout=300)
+    except OSError as e:
+        print(f"Could not download {url}: {e}")
+        return None
+    if response.status_code != 200:
+        print("NA from ", url, " for pdb ", pdb)
+        return None
+
+    # compressed here, the transfer itself is compressed by the server; renamed
+    # into place so that concurrent runs never read a partial file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f'{path}.tmp-{os.getpid()}-{threading.get_ident()}'
+    with gzip.open(tmp, 'wb', compresslevel=6) as fh:
+        fh.write(response.content)
+    os.replace(tmp, path)
+    return path
+
+
+def read_structure(path):
+    """
+    Returns the content of a structure file: text for mmCIF, bytes for BinaryCIF.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as fh:
+        content = fh.read()
+    if '.bcif' in os.path.basename(path):
+        return content
+    return content.decode('utf-8', errors='replace')
+
+
+def cif_atoms(text, chains):
+    """
+    Parses the atom_site records of some chains of an mmCIF file (values
+    without whitespace, as in the PDB files).
+
+    Args:
+        text: mmCIF content.
+        chains: set of author chain ids.
+    Returns:
+        dict of chain -> (float32 array of coordinates (n, 3), int32 array of label_seq_id),
+        heavy polymer atoms of the first model, first alternate location (A)
+    """
+    lines = text.splitlines()
+    start = next((n for n, line in enumerate(lines) if line.startswith('_atom_site.')), None)
+    if start is None:
+        return {}
+    items = []
+    while start < len(lines) and lines[start].startswith('_atom_site.'):
+        items.append(lines[start].split()[0][len('_atom_site.'):])
+        start += 1
+    index = [items.index(item) for item in ATOM_ITEMS]
+    chain_index = index[ATOM_ITEMS.index('auth_asym_id')]
+
+    rows = []
+    for line in lines[start:]:
+        if line.startswith(('#', 'loop_', '_')):
+            break
+        values = line.split()
+        if len(values) > chain_index and values[chain_index] in chains:
+            rows.append([values[i] for i in index])
+    if not rows:
+        return {}
+    columns = dict(zip(ATOM_ITEMS, np.array(rows, dtype=object).T))
+    return select_atoms(columns, chains)
+
+
+def bcif_decode(data, encodings):
+    """
+    Decodes a BinaryCIF column, applying its encodings in reverse order.
+    """
+    for encoding in reversed(encodings):
+        kind = encoding['kind']
+        if kind == 'ByteArray':
+            data = np.frombuffer(data, dtype=BCIF_TYPES[encoding['type']])
+        elif kind == 'FixedPoint':
+            data = np.asarray(data, dtype=np.float64) / encoding['factor']
+        elif kind == 'IntervalQuantization':
+            step = (encoding['max'] - encoding['min']) / (encoding['numSteps'] - 1)
+            data = encoding['min'] + step * np.asarray(data, dtype=np.float64)
+        elif kind == 'RunLength':
+            data = np.repeat(data[0::2], data[1::2])
+        elif kind == 'Delta':
+            data = encoding['origin'] + np.cumsum(np.asarray(data, dtype=np.int64))
+        elif kind == 'IntegerPacking':
+            data = np.asarray(data, dtype=np.int64)
+            upper = (1 << (8 * encoding['byteCount'] - (0 if encoding['isUnsigned'] else 1))) - 1
+            carry = data == upper
+            if not encoding['isUnsigned']:
+                carry |= data == -upper - 1
+            # a value continues in the next element while it is at one of the limits
+            last = np.flatnonzero(~carry)
+            data = np.add.reduceat(data, np.concatenate(([0], last[:-1] + 1))) if len(last) else data[:0]
+        elif kind == 'StringArray':
+            offsets = bcif_decode(encoding['offsets'], encoding['offsetEncoding'])
+            strings = np.array([encoding['stringData'][offsets[n]:offsets[n + 1]]
+                                for n in range(len(offsets) - 1)] + [''], dtype=object)
+            # -1 (null) -> the '' appended last
+            data = strings[np.asarray(bcif_decode(data, encoding['dataEncoding']), dtype=np.int64)]
+        else:
+            raise ValueError(f'unknown BinaryCIF encoding {kind}')
+    return data
+
+
+def bcif_atoms(content, chains):
+    """
+    Same as cif_atoms() for a BinaryCIF file.
+    """
+    try:
+        import msgpack
+    except ImportError:
+        raise ImportError('reading BinaryCIF structures requires msgpack (pip install .[bcif])')
+
+    block = msgpack.unpackb(content, raw=False)['dataBlocks'][0]
+    category = next((c for c in block['categories'] if c['name'] in ('_atom_site', 'atom_site')), None)
+    if category is None:
+        return {}
+    columns = {column['name']: column for column in category['columns']}
+
+    def decoded(name):
+        column = columns[name]
+        values = bcif_decode(column['data']['data'], column['data']['encoding'])
+        if column.get('mask'):
+            # 1 and 2: '.' and '?' values
+            mask = bcif_decode(column['mask']['data'], column['mask']['encoding'])
+            values = np.where(mask == 0, values.astype(object), '.')
+        return values
+
+    chain_ids = decoded('auth_asym_id')
+    selected = np.isin(chain_ids, list(chains))
+    if not selected.any():
+        return {}
+    return select_atoms({name: decoded(name)[selected] for name in ATOM_ITEMS}, chains)
+
+
+def select_atoms(columns, chains):
+    """
+    Keeps the heavy polymer atoms of the first model and first alternate
+    location of atom_site columns, and splits them by chain (see cif_atoms()).
+    """
+    model = columns['pdbx_PDB_model_num'].astype(str)
+    seq = columns['label_seq_id'].astype(str)
+    alt = columns['label_alt_id'].astype(str)
+    alt_ids = sorted(set(alt) - {'.', '?'})
+    keep = ((model == model[0]) & ~np.isin(columns['type_symbol'].astype(str), ('H', 'D'))
+            & ~np.isin(seq, ('.', '?')) & np.isin(alt, ['.', '?'] + alt_ids[:1]))
+
+    xyz = np.column_stack([columns[f'Cartn_{axis}'][keep].astype(np.float32) for axis in 'xyz'])
+    seq = seq[keep].astype(np.int32)
+    chain_ids = columns['auth_asym_id'][keep].astype(str)
+    return {chain: (xyz[chain_ids == chain], seq[chain_ids == chain]) for chain in chains if (chain_ids == chain).any()}
+
+
+def contact_residues(atoms, target_chains, interactor_chains, distance):
+    """
+    Finds the residues of the target chains in contact with the interactor chains and conversely.
+
+    Args:
+        atoms: dict from cif_atoms().
+        target_chains, interactor_chains: author chain ids; a chain is never compared to itself,
+                                          so that homodimers get the contacts between their chains.
+        distance: contact distance cutoff.
+    Returns:
+        (target, interactor): dicts of chain -> int array of the label_seq_id in contact
+    """
+    from scipy.spatial import cKDTree
+
+    trees = {chain: cKDTree(atoms[chain][0]) for chain in set(target_chains) | set(interactor_chains)}
+    found = ({}, {})
+    for target_chain in target_chains:
+        for interactor_chain in interactor_chains:
+            if target_chain == interactor_chain:
+                continue
+            for side, (chain, other) in enumerate(((target_chain, interactor_chain),
+                                                   (interactor_chain, target_chain))):
+                near, _ = trees[other].query(atoms[chain][0], distance_upper_bound=distance)
+                residues = atoms[chain][1][near <= distance]
+                if len(residues):
+                    found[side][chain] = np.union1d(found[side].get(chain, residues[:0]), residues)
+    return found
+
+
+def uniprot_residues(residues, segments):
+    """
+    Maps label_seq_id residues to UniProt numbering.
+
+    Args:
+        residues: dict of chain -> int array of label_seq_id.
+        segments: (chain ids, unp_start, unp_end, start) arrays of the PDBe mappings of the protein,
+                  start being the label_seq_id of unp_start (-1 if unknown).
+    Returns:
+        sorted int array of UniProt residues
+    """
+    chain_ids, unp_start, unp_end, start = segments
+    chain_ids = np.asarray(chain_ids, dtype=object)
+    mapped = [np.zeros(0, dtype=np.int64)]
+    for chain, seq in residues.items():
+        on_chain = (chain_ids == chain) & (start >= 0)
+        first = start[on_chain]
+        last = first + unp_end[on_chain] - unp_start[on_chain]
+        offset = unp_start[on_chain] - first
+        inside = (seq[:, None] >= first[None, :]) & (seq[:, None] <= last[None, :])
+        rows, columns = np.nonzero(inside)
+        mapped.append(seq[rows].astype(np.int64) + offset[columns])
+    return np.unique(np.concatenate(mapped))
+
+
+def entry_interfaces(path, jobs, distance=CONTACT_DISTANCE):
+    """
+    Computes the interfaces of the protein pairs of one structure, in a worker process.
+
+    Args:
+        path: structure file.
+        jobs: list of (target segments, interactor segments), see uniprot_residues().
+        distance: contact distance cutoff.
+    Returns:
+        list of (interface contact, target interface residues, interactor interface residues) strings,
+        NO_INTERFACE for the pairs with chains missing from the structure
+    """
+    chains = {chain for job in jobs for segments in job for chain in segments[0]}
+    content = read_structure(path)
+    atoms = bcif_atoms(content, chains) if isinstance(content, bytes) else cif_atoms(content, chains)
+
+    results = []
+    for target_segments, interactor_segments in jobs:
+        target_chains = [c for c in dict.fromkeys(target_segments[0]) if c in atoms]
+        interactor_chains = [c for c in dict.fromkeys(interactor_segments[0]) if c in atoms]
+        if not target_chains or not interactor_chains:
+            results.append(NO_INTERFACE)
+            continue
+        target, interactor = contact_residues(atoms, target_chains, interactor_chains, distance)
+        contact = 'yes' if target else 'no'
+        target, interactor = (';'.join(map(str, uniprot_residues(r, s))) or 'na'
+                              for r, s in ((target, target_segments), (interactor, interactor_segments)))
+        results.append((contact, target, interactor))
+    return results
+
+
+def safe_entry_interfaces(path, jobs, distance=CONTACT_DISTANCE):
+    """
+    entry_interfaces(), with NO_INTERFACE for all the pairs and the error if the structure can not be read.
+    """
+    try:
+        return entry_interfaces(path, jobs, distance), None
+    except Exception as e:
+        return [NO_INTERFACE] * len(jobs), f'{type(e).__name__}: {e}'
+
+
+def process_pool(workers=None):
+    """
+    Returns the process pool of the interfaces, shared by all the targets of a run.
+    """
+    global _pool
+
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=workers)
+    return _pool
+
+
+@timed('interfaces')
+def compute_interfaces(keys, mirror=MIRROR_DIR, source=None, fmt='cif', distance=CONTACT_DISTANCE, workers=None):
+    """
+    Computes the interfaces of (PDB id, target, interactor) keys missing from interface_cache.
+
+    Args:
+        keys: list of (PDB id, target UniProt AC, interactor UniProt AC).
+        mirror, source, fmt: see structure_file().
+        distance: contact distance cutoff.
+        workers: number of worker processes (default: number of cores).
+    """
+    from .mentha2pdb import mapping_arrays
+
+    entries = {}
+    for key in dict.fromkeys(keys):
+        if key in interface_cache:
+            continue
+        pdb, target, interactor = key
+        mappings = mapping_arrays(pdb)
+        if mappings is None or target not in mappings or interactor not in mappings:
+            interface_cache[key] = NO_INTERFACE
+            continue
+        entries.setdefault(pdb, {})[key] = (mappings[target], mappings[interactor])
+    if not entries:
+        return
+
+    with ThreadPoolExecutor(max_workers=THREAD_POOL) as executor:
+        paths = dict(zip(entries, executor.map(lambda pdb: structure_file(pdb, mirror, source, fmt), entries)))
+    for pdb, path in paths.items():
+        if path is None:
+            interface_cache.update(dict.fromkeys(entries.pop(pdb), NO_INTERFACE))
+
+    pool = process_pool(workers)
+    futures = {pdb: pool.submit(safe_entry_interfaces, paths[pdb], list(jobs.values()), distance)
+               for pdb, jobs in entries.items()}
+    for pdb, future in futures.items():
+        results, error = future.result()
+        if error is not None:
+            print(f"Could not read the structure {paths[pdb]}: {error}")
+        for (_, target, interactor), result in zip(entries[pdb], results):
+            interface_cache[(pdb, target, interactor)] = result
+            # the same interface seen from the interactor
+            interface_cache.setdefault((pdb, interactor, target), (result[0], result[2], result[1]))
+
+
+def add_interfaces(df, mirror=MIRROR_DIR, source=None, fmt='cif', distance=CONTACT_DISTANCE, workers=None,
+                   target_column='target uniprot id', interactor_column='interactor uniprot id', pdb_column='PDB id'):
+    """
+    Adds the INTERFACE_TYPES columns to an output dataframe.
+
+    Args:
+        df: mentha2pdb output rows.
+        mirror, source, fmt, distance, workers: see compute_interfaces().
+        target_column, interactor_column, pdb_column: columns of the UniProt ACs and PDB id.
+    Returns:
+        DataFrame with the interface columns added ('na' for the rows without PDB entry, mappings
+        or structure)
+    """
+    df = df.copy()
+    pdbs = df[pdb_column].astype(str).str.strip()
+    valid = (~pdbs.isin(NA_VALUES) & df[pdb_column].notna()).to_numpy()
+    keys = list(zip(pdbs, df[target_column].astype(str), df[interactor_column].astype(str)))
+    compute_interfaces([key for key, v in zip(keys, valid) if v], mirror, source, fmt, distance, workers)
+
+    rows = [interface_cache[key] if v else NO_INTERFACE for key, v in zip(keys, valid)]
+    for n, column in enumerate(INTERFACE_TYPES):
+        df[column] = [row[n] for row in rows]
+    return df
@@ -0,0 +1,1490 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Thu May 12 09:14:52 2022
+updated December 2023 v 1.4
+
+@author: Matteo Lambrughi
+"""
+
+import os
+from os.path import isfile, join
+from pathlib import Path
+import shutil
+import argparse
+from decimal import Decimal
+import numpy as np
+import pandas as pd
+import re
+import requests
+import csv
+from urllib.parse import quote
+
+from .af_inputs import AF3_BATCH, target_pairs, write_af_inputs
+from .coverage import COVERAGE_TYPES, add_coverage
+from .ensembl import with_name_upac
+from .interfaces import CONTACT_DISTANCE, INTERFACE_TYPES, MIRROR_DIR, add_interfaces
+from .formats import output_path, write_table
+from . import metrics
+from .metrics import timed
+from .pdb_index import active_pdb_index
+from .store import open_run, store_results, upsert
+from .http_client import (api_url, get_session, load_cache, make_request, mapping_cache, pair_cache, pdb_search_cache,
+                          save_cache)
+
+
+@timed('get_pdb_entries_for_uniprot')
+def get_pdb_entries_for_uniprot(uniprot_id):
+    """
+    Queries PDB for entries based on UniProt Accession Code (AC) and human taxonomy ID (9606).
+    Successful queries are cached in pdb_search_cache. With a PDB index in use
+    (see ppi2pdb.pdb_index) the entries are taken from it instead.
+    Returns list of PDB IDs, or [] if none found.
+    """
+    pdb_index = active_pdb_index()
+    if pdb_index is not None:
+        return pdb_index.entries(uniprot_id)
+
+    url = api_url('rcsb_search', '/rcsbsearch/v2/query')
+    headers = {'Content-Type': 'application/json'}
+
+    payload = {
+        "query": {
+            "type": "group",
+            "logical_operator": "and",
+            "nodes": [
+                {
+                    "type": "group",
+                    "logical_operator": "and",
+                    "nodes": [
+                        {
+                            "type": "terminal",
+                            "service": "text",
+                            "parameters": {
+                                "attribute": "rcsb_polymer_entity_container_identifiers.reference_sequence_identifiers.database_accession",
+                                "operator": "in",
+                                "negation": False,
+                                "value": [uniprot_id]
+                            }
+                        },
+                        {
+                            "type": "terminal",
+                            "service": "text",
+                            "parameters": {
+                                "attribute": "rcsb_polymer_entity_container_identifiers.reference_sequence_identifiers.database_name",
+                                "operator": "exact_match",
+                                "value": "UniProt",
+                                "negation": False
+                            }
+                        }
+                    ]
+                },
+                {
+                    "type": "terminal",
+                    "service": "text",
+                    "parameters": {
+                        "attribute": "rcsb_entity_source_organism.taxonomy_lineage.id",
+                        "operator": "exact_match",
+                        "negation": False,
+                        "value": "9606"
+                    }
+                }
+            ]
+        },
+        "return_type": "entry",
+        "request_options": {
+            "return_all_hits": True
+        }
+    }
+
+    metrics.count_cache('pdb_search_cache', uniprot_id in pdb_search_cache)
+    if uniprot_id in pdb_search_cache:
+        return pdb_search_cache[uniprot_id]
+
+    try:
+        response = get_session().post(url, headers=headers, json=payload)
+        response.raise_for_status()
+        result_data = response.json()
+        pdb_ids = [entry["identifier"] for entry in result_data.get("result_set", [])]
+    except requests.exceptions.RequestException as e:
+        print(f"Error querying PDB for UniProt ID {uniprot_id}: {e}")
+        return []
+
+    pdb_search_cache[uniprot_id] = pdb_ids
+    return pdb_ids
+
+
+@timed('make_target_interactor_sequence_files')
+def make_target_interactor_sequence_files(dataframe_out, formats=('fasta',), prefix='inputs', batch_size=AF3_BATCH):
+    """
+    Writes the AlphaFold inputs of the target - interactor pairs of the output
+    in inputs_afmulti, see ppi2pdb.af_inputs
+
+    :param dataframe_out: DataFrame, output rows of one or several targets
+    :param formats: list of String, some of fasta, af3 and multifasta
+    :param prefix: String, name of the af3 batches, multifasta and manifest files
+    :param batch_size: int, number of AlphaFold3 jobs per json file
+    :return: list of String, the written files
+    """
+    pairs = target_pairs(dataframe_out, ('target uniprot id', 'target uniprot gene', 'interactor uniprot id', 'interactor uniprot gene'))
+    return write_af_inputs(pairs, formats, prefix, batch_size)
+
+
+@timed('pmid_adder')
+def pmid_adder(data, dataframe_out):
+    # if p option selected -> PMID search and add
+    # we have
+    # dataframe data -> mentha db
+    # dataframe dataframeOut
+    df_out = dataframe_out.copy(deep=True)
+    pmid_list = []
+    for index, row in dataframe_out.iterrows():
+        target_protein = row["target uniprot id"]
+        interactor_protein = row["interactor uniprot id"]
+
+        data_direct = data[(data['Protein A'] == target_protein) & (data['Protein B'] == interactor_protein)]
+        data_invers = data[(data['Protein A'] == interactor_protein) & (data['Protein B'] == target_protein)]
+        direct_pmid = ''
+        invers_pmid = ''
+
+        direct_pmid = data_direct['PMID']
+        invers_pmid = data_invers['PMID']
+
+        pmid = []
+        pmid += direct_pmid.to_list()
+        pmid += invers_pmid.to_list()
+        pmid = ' '.join(x for x in list(dict.fromkeys(pmid)))
+
+        pmid_list.append(pmid)
+
+    df_out['PMID'] = pmid_list
+    return df_out
+
+
+@timed('get_experiment')
+def get_experiment(pdb):
+    """
+    This function retrieves PDB > experiment
+
+    :param pdb: String,
+    :return: resolution: String
+    """
+
+    url = api_url('pdbe', '/api/pdb/entry/experiment/')
+    data = make_request(url, "get", pdb)
+    resolution = ''
+
+    if not data or data == {"message": "Requested endpoint does not contains any data"}:
+        resolution = 'none'
+        # print("########")
+        # print("EXPERIMENT CALL ERROR -> no data")
+        # print("########")
+    else:
+        if 'resolution' in data[pdb.lower()][0].keys():
+            resolution = Decimal(str(data[pdb.lower()][0]['resolution']))
+        else:
+            # print('resolution not in data')
+            resolution = 'na'
+
+    return resolution
+
+
+@timed('get_summary')
+def get_summary(pdb):
+    """
+    This function retrieves PDB > summary
+
+    :param pdb: String,
+    :return: fused: String ('yes'/'')
+             dna: String
+             ligands: String
+             method: String
+    """
+
+    url = api_url('pdbe', '/api/pdb/entry/summary/')
+    data = make_request(url, "get", pdb)
+
+    dna = ''
+    ligands = ''
+    method = ''
+    title = ''
+    fused = ''
+
+    # data None -> means that we have no data from the request
+    # no data -> no title
+    # no title -> fused = ''
+    if not data or data == {"message": "Requested endpoint does not contains any data"}:
+        title = 'NO TITLE'
+        dna = 'none'
+        ligands = 'none'
+        method = 'none'
+        fused = 'none'
+        # print("########")
+        # print("PDB ", pdb, " has no title :(")
+        # print("########")
+    else:
+        # get INFOs
+        title = data[pdb.lower()][0]['title']
+        dna = data[pdb.lower()][0]['number_of_entities']['dna']
+        ligands = data[pdb.lower()][0]['number_of_entities']['ligand']
+        method = data[pdb.lower()][0]['experimental_method'][0]
+
+        if 'fused' in title or 'fusion' in title:
+            fused = 'yes'
+        else:
+            fused = 'na'
+
+    return fused, dna, ligands, method
+
+
+def mapping_arrays(pdb):
+    """
+    Returns the PDBe UniProt mappings of a PDB entry, parsed once per entry
+    and kept in mapping_cache
+
+    :param pdb: String
+    :return: dict, UniProt AC -> (list of chain ids, int32 array of unp_start,
+             int32 array of unp_end, int32 array of the residue_number of unp_start,
+             -1 if PDBe does not give it), in the order of the PDBe response, or
+             None if the PDB id is invalid or PDBe has no mappings for it
+    """
+    key = pdb.lower()
+    if key not in mapping_cache:
+        # Check if the provided PDB id is valid
+        # There is no point in making an API call
+        # with bad PDB ids
+        if not re.match("[0-9][A-Za-z][A-Za-z0-9]{2}", pdb):
+            return None
+
+        # GET the mappings data
+        mappings_data = make_request(api_url('pdbe', '/api/mappings/uniprot/'), "get", pdb)
+
+        # Check if there is data
+        if not mappings_data or mappings_data == {"message": "Requested endpoint does not contains any data"}:
+            # not cached, failed requests are not cached by make_request either
+            return None
+
+        mapping_cache[key] = {
+            uID: ([m['chain_id'] for m in uniprot['mappings']],
+                  np.array([m['unp_start'] for m in uniprot['mappings']], dtype=np.int32),
+                  np.array([m['unp_end'] for m in uniprot['mappings']], dtype=np.int32),
+                  np.array([(m.get('start') or {}).get('residue_number') or -1 for m in uniprot['mappings']],
+                           dtype=np.int32))
+            for uID, uniprot in mappings_data[key]['UniProt'].items()}
+    return mapping_cache[key]
+
+
+@timed('get_mappings_data')
+def get_mappings_data(pdb, targetProtein, interactorProtein):
+    """
+    This function will GET the mappings data from
+    the PDBe API using the make_request() function
+
+    :param pdb: String
+    :return: targetChainIds: String
+             targetStart: String
+             targetEnd: String
+             interactorChainIds: String
+             interactorStart: String
+             interactorEnd: String
+             otherInteractors: String
+    """
+    mappings = mapping_arrays(pdb)
+    if mappings is None:
+        # print("NA")
+        return 'none', 'none', 'none', 'none', 'none', 'none', 'none'
+
+    # extract chains data
+    otherInteractors = [uID for uID in mappings if uID != targetProtein and uID != interactorProtein]
+    targetChainIds, targetStart, targetEnd = mappings.get(targetProtein, ([], [], [], []))[:3]
+    interactorChainIds, interactorStart, interactorEnd = mappings.get(interactorProtein, ([], [], [], []))[:3]
+
+    # convert lists to strings
+    targetChainIds = 'na' if len(targetChainIds) == 0 else ';'.join([str(x) for x in targetChainIds])
+    targetStart = 'na' if len(targetStart) == 0 else ';'.join([str(x) for x in targetStart])
+    targetEnd = 'na' if len(targetEnd) == 0 else ';'.join([str(x) for x in targetEnd])
+
+    interactorChainIds = 'na' if len(interactorChainIds) == 0 else ';'.join([str(x) for x in interactorChainIds])
+    interactorStart = 'na' if len(interactorStart) == 0 else ';'.join([str(x) for x in interactorStart])
+    interactorEnd = 'na' if len(interactorEnd) == 0 else ';'.join([str(x) for x in interactorEnd])
+
+    otherInteractors = 'na' if otherInteractors == [] else ';'.join([str(x) for x in otherInteractors])
+
+    return targetChainIds, targetStart, targetEnd, interactorChainIds, interactorStart, interactorEnd, otherInteractors
+
+
+def read_targets(args):
+    """
+    Returns the target uniprot ACs, from args.targets if given
+    otherwise from the lines of the args.t file
+
+    :param args: Namespace
+    :return: list of String
+    """
+    if getattr(args, 'targets', None) is not None:
+        return list(args.targets)
+
+    with open(args.t, 'r') as uniprotTargets:
+        return uniprotTargets.readlines()
+
+@timed('load_mentha')
+def load_mentha(mentha_file, cutoff):
+    """
+    Reads the mentha database and keeps only human-human interactions
+    with score >= cutoff
+
+    :param mentha_file: String, path of the mentha database
+    :param cutoff: Decimal (or str/float), mentha score cutoff
+    :return: DataFrame
+    """
+    cutoff = Decimal(str(cutoff))
+
+    # read data with pandas
+    data = pd.read_csv(mentha_file, sep=';', converters={'Score': Decimal})
+
+    # filtering for taxon.A = 9606 AND taxon.B = 9606 AND score >= cutoff (args.s)
+    return data[(data['Taxon A'] == 9606) & (data['Taxon B'] == 9606) & (data['Score'] >= cutoff)]
+
+@timed('annotate_pair')
+def annotate_pair(targetProtein, interactorProtein, targetQueryResult, interactorQueryResult, pdb_index=None):
+    """
+    Returns the PDB entries shared by a target and an interactor and the 13 structural
+    columns of every entry (pdb id ... num ligands), target columns first.
+    They are computed once per unordered pair and kept in pair_cache: when several
+    targets interact with each other the pair seen from the other side only swaps
+    the target and interactor chain columns.
+
+    :param targetQueryResult: PDB ids of the target
+    :param interactorQueryResult: PDB ids of the interactor
+    :param pdb_index: ppi2pdb.pdb_index.PdbIndex in use, or None
+    :return: (set of shared PDB ids, list of 13 item lists, one per shared PDB id)
+    """
+    key = (min(targetProtein, interactorProtein), max(targetProtein, interactorProtein))
+    metrics.count_cache('pair_cache', key in pair_cache)
+    if key not in pair_cache:
+        low, high = key
+        if pdb_index is not None:
+            commonPdbs = pdb_index.shared(low, high)
+        else:
+            commonPdbs = set(targetQueryResult).intersection(set(interactorQueryResult))
+
+        annotations = []
+        for pdb in commonPdbs:
+            # request summary -> from summary we get fusion, method,dna chains, num ligands
+            fused, dna, ligands, method = get_summary(pdb)
+            # request mappings -> from mappings we get chain infos (id, start, stop) and other interactors
+            mappings = get_mappings_data(pdb, low, high)
+            lowChains, highChains, otherInteractors = mappings[0:3], mappings[3:6], mappings[6]
+            # request experiment -> from experiment we get resolution
+            resolution = get_experiment(pdb)
+            annotations.append((pdb, fused, lowChains, highChains, otherInteractors, method, resolution, dna,
+                                ligands))
+        pair_cache[key] = (commonPdbs, annotations)
+
+    commonPdbs, annotations = pair_cache[key]
+    rows = []
+    for pdb, fused, lowChains, highChains, otherInteractors, method, resolution, dna, ligands in annotations:
+        targetChains, interactorChains = (lowChains, highChains) if targetProtein == key[0] else (highChains, lowChains)
+        rows.append([pdb, fused, *targetChains, *interactorChains, otherInteractors, method, resolution, dna,
+                     ligands])
+    return commonPdbs, rows
+
+
+@timed('normal_run')
+def normal_run(args, data=None):
+    datasets = []
+    pdb_index = active_pdb_index()
+    filterSameProteinInteraction = False
+
+    if args.filter:
+        filterSameProteinInteraction = True
+
+    if data is None:
+        data = load_mentha(args.i, args.s)
+
+    dataframeOut = pd.DataFrame(columns=['target uniprot id', 'target uniprot gene',  # 2 -> from csv
+                                         'interactor uniprot id', 'interactor uniprot gene',  # 2 -> from csv
+                                         'mentha score',  # 1 -> from csv
+                                         'PDB id',  # 1 -> from RCSB API
+                                         'fusion',  # 1 -> from summary request
+                                         'target chain id', 'target starting residue', 'target ending residue',
+                                         # 3 -> from mappings request
+                                         'interactor chain id', 'interactor starting residue',
+                                         'interactor ending residue',  # 3 -> from mappings request
+                                         'other interactors',  # 1 -> from mappings request
+                                         'method',  # 1 -> from summary request
+                                         'resolution',  # 1 -> from experiment request
+                                         'dna chains', 'num ligands'])  # 2 -> from summary request
+    # -----------------------------
+    # 18 columns total
+
+    # get target uniprots
+    targets = []
+    for uniprot in read_targets(args):
+        targets.append(uniprot)
+        if args.x:
+            dataframeOut = dataframeOut[0:0]
+        uniprot = uniprot.rstrip()
+
+        # get data where protein A or protein b matches uniprot selected
+        uniprotData = data[(data['Protein A'] == uniprot) | (data['Protein B'] == uniprot)]
+
+        uniprotData = uniprotData.reset_index()  # make sure indexes pair with number of rows
+
+        targetQueryResult = get_pdb_entries_for_uniprot(uniprot)
+        print('Target {}                                          '.format(uniprot))
+        for index, row in uniprotData.iterrows():
+            targetProtein = ''
+            interactorProtein = ''
+            targetGene = ''
+            interactorGene = ''
+            score = Decimal('0')
+            # list that will later added to dataframe out
+            outRow = []
+
+            if row['Protein A'] == uniprot:
+                targetProtein = row['Protein A']
+                interactorProtein = row['Protein B']
+                targetGene = row['Gene A']
+                interactorGene = row['Gene B']
+            else:
+                targetProtein = row['Protein B']
+                interactorProtein = row['Protein A']
+                targetGene = row['Gene B']
+                interactorGene = row['Gene A']
+
+            # filter protein interaction with self
+            if filterSameProteinInteraction and row['Protein A'] == row['Protein B']:
+                print('skipped protein interaction with self \n \t target {} interactor'.format(targetProtein,
+                                                                                                interactorProtein))
+                continue
+
+            score = row['Score']
+
+            # setup first 5 of outRow
+            outRow.extend([targetProtein, targetGene, interactorProtein, interactorGene, score])
+
+            # sending RCSB API requests
+            interactorQueryResult = get_pdb_entries_for_uniprot(interactorProtein)
+
+            # check if something went wrong in RCSB API -> set na and go next
+            if not interactorQueryResult or not targetQueryResult:
+                # set output row to na (13 cause we had 5 set and 13 missing positions)
+                outRow.extend(['na'] * 13)
+                print(f'\t No PDB entries found via RCSB API for interactor {interactorProtein}         ', end='\r')
+                # append row to dataframe Out
+                dataframeOut.loc[len(dataframeOut)] = outRow
+            else:
+                # get common pdbs to both proteins and their annotations, once per unordered pair
+                commonPdbs, annotations = annotate_pair(targetProtein, interactorProtein,
+                                                        targetQueryResult, interactorQueryResult, pdb_index)
+
+                # if intersection is not empty
+                if commonPdbs != set():
+                    print('\t protein interactor {} share pdbs -> {}'.format(interactorProtein, commonPdbs))
+                    # !! can be multiple pdbs !!
+                    for annotation in annotations:
+                        # add data to output row
+                        outRow.extend(annotation)
+                        dataframeOut.loc[len(dataframeOut)] = outRow
+
+                        # reset outrow to first five values -> first five are fixed until we don't change target - interactor pair
+                        # other values change basing on the pdb selected
+                        outRow = outRow[:5]
+                else:
+                    print('\t interactor {} ->  NO COMMON PDBS'.format(interactorProtein), end='\r')
+                    # intersection empty -> set na and go on
+                    # empty  pdb list, no requests set na
+                    outRow.extend(['na'] * 13)
+                    dataframeOut.loc[len(dataframeOut)] = outRow
+
+
+        # args.x -> 1 csv per target
+        if args.x:
+            if args.p:
+                dataframeOutx = pmid_adder(data, dataframeOut)
+                # replace chars that will break to_csv
+                dataframeOutx.replace({',': '_'}, regex=True, inplace=True)
+
+                dataframeOutx.sort_values(['target uniprot id', 'mentha score'], ascending=False, inplace=True)
+
+                dataframeOutx['normal_or_cfg'] = 0
+
+                datasets.append(dataframeOutx)
+                print('>> Out for uniprot {} -> {}'.format(uniprot, 'dataframe_' + uniprot + '.csv'))
+            else:
+                # replace chars that will break to_csv
+                dataframeOut.replace({',': '_'}, regex=True, inplace=True)
+
+                dataframeOut.sort_values(['target uniprot id', 'mentha score'], ascending=False, inplace=True)
+
+                dataframeOutx = dataframeOut.copy(deep=True)
+                dataframeOutx['normal_or_cfg'] = 0
+
+                datasets.append(dataframeOutx)
+        else:
+            continue
+
+
+    if not args.x:
+        if args.p:
+            dataframeOut = pmid_adder(data, dataframeOut)
+        # replace chars that will break to_csv
+        dataframeOut.replace({',': '_'}, regex=True, inplace=True)
+
+        dataframeOut.sort_values(['target uniprot id', 'mentha score'], ascending=False, inplace=True)
+
+        dataframeOut['normal_or_cfg'] = 0
+
+        datasets.append(dataframeOut)
+
+    return datasets, targets
+
+@timed('cfg_run')
+def cfg_run(args, data=None):
+    print('CFG')
+    datasets = []
+
+    config_file = args.c
+
+    # if have config, read config
+    if config_file != '':
+        config_dict = {}
+        import configparser
+
+        config = configparser.ConfigParser()
+        with open(config_file, 'r') as cfg_file:
+            config.read_file(cfg_file)
+
+        for each_section in config.sections():
+            l = []
+            for (each_key, each_val) in config.items(each_section):
+                l.append(each_val.strip().split(','))
+            config_dict[each_section] = l
+    else:
+        return None
+
+    filterSameProteinInteraction = False
+
+    if args.filter:
+        filterSameProteinInteraction = True
+
+    if data is None:
+        data = load_mentha(args.i, args.s)
+
+    dataframeOut = pd.DataFrame(columns=['target uniprot id', 'target uniprot gene',  # 2 -> from csv
+                                         'interactor uniprot id', 'interactor uniprot gene',  # 2 -> from csv
+                                         'mentha score',  # 1 -> from csv
+                                         'PDB id',  # 1 -> from RCSB API
+                                         'fusion',  # 1 -> from summary request
+                                         'target chain id', 'target starting residue', 'target ending residue',
+                                         # 3 -> from mappings request
+                                         'interactor chain id', 'interactor starting residue',
+                                         'interactor ending residue',  # 3 -> from mappings request
+                                         'other interactors',  # 1 -> from mappings request
+                                         'method',  # 1 -> from summary request
+                                         'resolution',  # 1 -> from experiment request
+                                         'dna chains', 'num ligands'])  # 2 -> from summary request
+    # -----------------------------
+    # 18 columns total
+
+    # get target uniprots
+    pmids = []
+    for uniprot in read_targets(args):
+
+
+        if args.x:
+            dataframeOut = dataframeOut[0:0]
+            pmids = []
+
+        uniprot = uniprot.rstrip()
+
+        # get data where protein A or protein b matches uniprot selected
+        uniprotData = data[(data['Protein A'] == uniprot) | (data['Protein B'] == uniprot)]
+
+        uniprotData = uniprotData.reset_index()  # make sure indexes pair with number of rows
+
+        # cfg_data = config_dict[uniprot]
+        cfg_data = config_dict.get(uniprot, [])
+        if cfg_data == []:
+            print(f'no config for target {uniprot} ')
+
+        for cfg in cfg_data:
+            int_id = cfg[0]
+            int_gene = cfg[1]
+            int_pdb = cfg[2]
+            int_pmid = cfg[3]
+
+            pmids.append(int_pmid)
+
+            targetProtein = ''
+            interactorProtein = ''
+            targetGene = ''
+            interactorGene = ''
+            score = 'na'
+
+            outRow = []
+
+            for index, row in uniprotData.iterrows():
+                if row['Protein A'] == uniprot:
+                    targetProtein = row['Protein A']
+                    interactorProtein = int_id
+                    targetGene = row['Gene A']
+                    interactorGene = int_gene
+                    break
+                else:
+                    targetProtein = row['Protein B']
+                    interactorProtein = int_id
+                    targetGene = row['Gene B']
+                    interactorGene = int_gene
+                    break
+
+            #try to get score from db for config lines
+            for index, row in uniprotData.iterrows():
+                if row['Protein A'] == uniprot and row['Protein B'] == int_id:
+                    score = row['Score']
+                elif row['Protein A'] == int_id and row['Protein B'] == uniprot:
+                    score = row['Score']
+
+            # setup first 5 of outRow
+            outRow.extend([targetProtein, targetGene, interactorProtein, interactorGene, score])
+
+            if int_pdb == '':
+                print(f'>>PDB is not present \n\t {cfg} \n row is na')
+                #setting score to na -> we have no score coming from mentha db -> target interactor not in db
+                outRow[4] = 'na'
+                #setting all columns to na -> no pdb to use for requests
+                ext = ['na' for x in range(13)]
+                outRow.extend(ext)
+                #save row
+                dataframeOut.loc[len(dataframeOut)] = outRow
+                #reset row for next config row
+                outRow = outRow[:5]
+                continue
+
+            #we reach this part only if we have a pdb to use
+            fused = ''
+            dna = ''
+            ligands = ''
+            method = ''
+            targetChainIds = ''
+            targetStart = ''
+            targetEnd = ''
+            interactorChainIds = ''
+            interactorStart = ''
+            interactorEnd = ''
+            otherInteractors = ''
+            resolution = ''
+
+            # do requests on pdb chosen
+            # request summary -> from summary we get fusion, method,dna chains, num ligands
+            fused, dna, ligands, method = get_summary(int_pdb)
+            # request mappings -> from mappings we get chain infos (id, start, stop) and other interactors
+            targetChainIds, targetStart, targetEnd, interactorChainIds, interactorStart, interactorEnd, otherInteractors = get_mappings_data(
+                int_pdb, targetProtein, interactorProtein)
+            # request experiment -> from experiment we get resolution
+            resolution = get_experiment(int_pdb)
+
+            # add data to output row
+            outRow.extend([int_pdb, fused, targetChainIds, targetStart, targetEnd, interactorChainIds,
+                           interactorStart, interactorEnd, otherInteractors, method, resolution, dna,
+                           ligands])
+
+            # add out row to dataframe
+            dataframeOut.loc[len(dataframeOut)] = outRow
+            outRow = outRow[:5]
+
+        if args.x:
+            if args.p:
+                #add pmid col
+                df_out = dataframeOut.copy(deep=True)
+                df_out['PMID'] = pmids
+                df_out.replace({',': '_'}, regex=True, inplace=True)
+                df_out.sort_values(['target uniprot id', 'mentha score'], ascending=False, inplace=True)
+                df_out['normal_or_cfg'] = 1
+                datasets.append(df_out)
+            else:
+                df_out = dataframeOut.copy(deep=True)
+                df_out.replace({',': '_'}, regex=True, inplace=True)
+                df_out.sort_values(['target uniprot id', 'mentha score'], ascending=False, inplace=True)
+                df_out['normal_or_cfg'] = 1
+                datasets.append(df_out)
+
+    if not args.x:
+        if args.p:
+
+            dataframeOut['PMID'] = pmids
+        dataframeOut.replace({',': '_'}, regex=True, inplace=True)
+        dataframeOut.sort_values(['target uniprot id', 'mentha score'], ascending=False, inplace=True)
+        dataframeOut['normal_or_cfg'] = 1
+        datasets.append(dataframeOut)
+
+    return datasets
+
+UNIPROT_BATCH = 100
+
+
+@timed('extract_genes')
+def extract_genes(data, edf_list, target_list, genes=None):
+    """
+    Fills the target and interactor gene columns of the extra files rows: genes are taken
+    from the mentha database, and the accessions it does not know are looked up in UniProt
+    all at once (see uniprot_genes). Genes UniProt does not know are left empty.
+
+    :param data: DataFrame, mentha database
+    :param edf_list: list of DataFrames, extra files rows of every target
+    :param target_list: list of UniProt ACs, in the order of edf_list
+    :param genes: dict, gene_index() of data, computed if None
+    :return: list of DataFrames
+    """
+    if genes is None:
+        genes = gene_index(data)
+    accessions = set(target_list)
+    for edf in edf_list:
+        accessions.update(edf['interactor uniprot id'])
+    # the index is shared by the targets of a streamed run, the genes of the run are looked up in a copy
+    genes = {**uniprot_genes(sorted(accessions.difference(genes))),
+             **{accession: genes[accession] for accession in accessions if accession in genes}}
+
+    ol = []
+    for target, edf in zip(target_list, edf_list):
+        edf['target uniprot gene'] = genes[target]
+        edf['interactor uniprot gene'] = [genes[interactor] for interactor in edf['interactor uniprot id']]
+        ol.append(edf)
+
+    return ol
+
+
+@timed('gene_index')
+def gene_index(data):
+    """
+    Returns the UniProt AC -> gene dictionary of the mentha database, the gene of the
+    first row where the AC is Protein A, or Protein B if it is never Protein A
+
+    :param data: DataFrame, mentha database
+    :return: dict
+    """
+    genes = dict(zip(data['Protein B'].to_numpy()[::-1], data['Gene B'].to_numpy()[::-1]))
+    genes.update(zip(data['Protein A'].to_numpy()[::-1], data['Gene A'].to_numpy()[::-1]))
+    return genes
+
+
+def extract_helper(data, id):
+    gene = gene_index(data).get(id)
+    if gene is None:
+        #last chance make request to uniprot.org
+        gene = extract_gene_fromrequest(id)
+
+    return gene
+
+
+@timed('uniprot_genes')
+def uniprot_genes(accessions):
+    """
+    Returns the gene names of UniProt ACs, from gene_cache (kept between runs) or from
+    UniProt, UNIPROT_BATCH accessions per query
+
+    :param accessions: list of UniProt ACs
+    :return: dict, UniProt AC -> gene name ('' if UniProt has none or could not be reached)
+    """
+    gene_cache = load_cache('uniprot_genes.json')
+    missing = []
+    for accession in dict.fromkeys(accessions):
+        metrics.count_cache('gene_cache', accession in gene_cache)
+        if accession not in gene_cache:
+            missing.append(accession)
+
+    url = api_url('uniprot', '/uniprotkb/search?fields=accession,sec_acc,gene_primary&size=500&query=')
+    found = False
+    for start in range(0, len(missing), UNIPROT_BATCH):
+        batch = missing[start:start + UNIPROT_BATCH]
+        res = make_request(url, 'get', quote(' OR '.join(f'accession:{a}' for a in batch)))
+        if res is None:
+            # not cached, asked again by the next run
+            continue
+        found = True
+        genes = {}
+        for entry in res.get('results', []):
+            gene = (entry.get('genes') or [{}])[0].get('geneName', {}).get('value', '')
+            for accession in [entry['primaryAccession']] + entry.get('secondaryAccessions', []):
+                genes.setdefault(accession, gene)
+        for accession in batch:
+            gene_cache[accession] = genes.get(accession, '')
+    if found:
+        save_cache('uniprot_genes.json')
+
+    return {a: gene_cache.get(a, '') for a in accessions}
+
+
+def extract_gene_fromrequest(id):
+    return uniprot_genes([id])[id]
+
+
+@timed('copy_folder')
+def copy_folder(ex, id1, id2, af_folder_path):
+    #ex -> extra file name
+    #id1 id2 -> pair components
+
+    #clean path before extra file name and get only the name no extension
+    ex = os.path.basename(ex)
+    ex = ex.split('.')[0]
+
+    folder = id1 + '-' + id2
+
+    from_path = af_folder_path
+    to_path = 'AF_Huri_HuMAP'
+    if 'huri' in ex.lower():
+        from_path = Path(from_path).joinpath('Huri_dimers').joinpath('HuRI').joinpath(folder)
+        to_path = Path(to_path).joinpath('Huri_dimers').joinpath(folder)
+    elif 'humap' in ex.lower():
+        from_path = Path(from_path).joinpath('HuMAP_dimers').joinpath('pdb').joinpath(folder)
+        to_path = Path(to_path).joinpath('HuMAP_dimers').joinpath(folder)
+
+    if from_path.exists() and not to_path.exists():
+        ignore_func = lambda d, files: [f for f in files if isfile(join(d, f)) and not f.endswith('.pdb')]
+        shutil.copytree(from_path, to_path, ignore=ignore_func)
+        print(f'>>>copy from path \n {from_path} \n to \n {to_path}')
+    else:
+        s = f'destination path already exists \n {to_path}' \
+            if to_path.exists() else\
+            f'source folder does not exist \n {from_path}'
+        print(s)
+
+class ModelFolderError(Exception):
+    """
+    Raised when an AF_Huri_HuMAP model folder can not be renamed, the mentha2pdb
+    command line exits with the message
+    """
+
+
+def rename_pair_folder_direct(ensg1, ensg2, up1, up2, base_path='AF_Huri_HuMAP'):
+    
+    huri_path = Path(base_path, 'Huri_dimers')
+    old_folder = huri_path / f"{ensg1}-{ensg2}"
+    new_folder = huri_path / f"{up1}-{up2}"
+    
+    try:
+        if not old_folder.exists():
+            raise FileNotFoundError(f"Expected old folder missing: {old_folder}")
+        if new_folder.exists():
+            raise FileExistsError(f"Target already exists: {new_folder}")
+        
+        old_folder.rename(new_folder)
+        print(f"Renamed {old_folder} → {new_folder}")
+
+    except FileNotFoundError as e:
+        raise ModelFolderError(f"required folder not found.\n{e}")
+    except FileExistsError as e:
+        raise ModelFolderError(f"output file(s) already exist — please remove them and try again.\n{e}")
+
+def extra_pairs(args, extra_files, extra_data=None):
+    """
+    Reads the extra files and returns their pairs above the pDockQ cutoff
+
+    :param args: Namespace, parsed command line arguments
+    :param extra_files: list of String, extra files
+    :param extra_data: dict, extra file name -> DataFrame already read (read from disk if None)
+    :return: list of [extra file, list of [ensg1, ensg2, up1, up2, pDockQ]], the Ensembl genes are None
+             for HuMAP files
+    """
+    pairs_scores = []
+    for extra_file in extra_files:
+        filename = os.path.basename(extra_file).lower()
+        pair_score=[]
+        if extra_data is not None and extra_file in extra_data:
+            extra_file_data = extra_data[extra_file]
+        else:
+            extra_file_data = pd.read_csv(extra_file, sep=',')
+        #cut all scores under cutoff
+        extra_file_data = extra_file_data[extra_file_data.pDockQ >= args.extra_cutoff]
+        # new HuRI releases only name the pairs by Ensembl gene
+        extra_file_data = with_name_upac(extra_file_data, getattr(args, 'ensg_xref', None))
+
+        for _, r in extra_file_data.iterrows():
+            up1, up2 = r['NameUPAC'].split('-', 1)
+            score = r['pDockQ']
+            if "huri" in filename:
+                ensg1, ensg2 = r['Name'].split('-', 1)
+                pair_score.append([ensg1, ensg2, up1, up2, score])
+            else:
+                pair_score.append([None, None, up1, up2, score])
+        pairs_scores.append([extra_file, pair_score])
+    return pairs_scores
+
+@timed('process_extra_files')
+def process_extra_files(args, extra_files, data=None, extra_data=None, pairs_scores=None, genes=None):
+    """
+    Returns the rows of the extra files pairs of the targets, with their pDockQ in
+    the extra file column, and copies their AF_Huri_HuMAP models
+
+    :param args: Namespace, parsed command line arguments
+    :param extra_files: list of String, extra files
+    :param data: DataFrame, filtered mentha database (read from args.i if None)
+    :param extra_data: dict, extra file name -> DataFrame already read (read from disk if None)
+    :param pairs_scores: list, extra_pairs() of the files, computed if None
+    :param genes: dict, gene_index() of data, computed if None
+    :return: list of DataFrames, one per target with -x, otherwise one in total
+    """
+
+    datasets = []
+    extra_df = pd.DataFrame(columns=['target uniprot id', 'target uniprot gene',  # 2 -> from csv
+                                         'interactor uniprot id', 'interactor uniprot gene',  # 2 -> from csv
+                                         'mentha score',  # 1 -> from csv
+                                         'PDB id',  # 1 -> from RCSB API
+                                         'fusion',  # 1 -> from summary request
+                                         'target chain id', 'target starting residue', 'target ending residue',
+                                         # 3 -> from mappings request
+                                         'interactor chain id', 'interactor starting residue',
+                                         'interactor ending residue',  # 3 -> from mappings request
+                                         'other interactors',  # 1 -> from mappings request
+                                         'method',  # 1 -> from summary request
+                                         'resolution',  # 1 -> from experiment request
+                                         'dna chains', 'num ligands','PMID'])  # 2 ->
+
+
+
+    if data is None:
+        data = load_mentha(args.i, args.s)
+
+    targets = [t.strip() for t in read_targets(args)]
+    # AF_Huri_HuMAP models are only copied once in a cutoff sweep
+    copy_models = getattr(args, 'copy_models', True)
+
+    if args.extra == [] or args.extra == None:
+        print('No extra files given, skipping extra files processing')
+    else:
+
+        for e in extra_files:
+            extra_df[e] = []
+
+        if pairs_scores is None:
+            pairs_scores = extra_pairs(args, extra_files, extra_data)
+
+        edf = []
+        for target in targets:
+            df_t = []
+            for i, e_ps in enumerate(pairs_scores):
+                ex = e_ps[0]
+                ex_name = os.path.basename(ex).lower()
+                ps = e_ps[1]
+                for p in ps:
+                    ensg1, ensg2, up1, up2, score = p
+                    g1 = 'extra gene'
+                    g2 = 'extra gene'
+                    if up1 == target:
+                        row = [up1, g1, up2, g2, 'na'] + ['na']*14
+
+                        row = row + ['na']*i +[score]+['na']*(len(args.extra) -i -1)
+
+                        extra_df.loc[len(extra_df)] = row
+                        if copy_models and "huri" in ex_name:
+                            copy_folder(ex, ensg1, ensg2, args.af)
+                            rename_pair_folder_direct(ensg1, ensg2, up1, up2)
+                        elif copy_models and "humap" in ex_name:
+                            copy_folder(ex, up1, up2, args.af)
+
+                    elif up2 == target:
+                        row = [up2, g2, up1, g1, 'na'] + ['na']*14
+
+                        row = row + ['na']*i +[score]+['na']*(len(args.extra) -i -1)
+
+                        extra_df.loc[len(extra_df)] = row
+                        if copy_models and "huri" in ex_name:
+                            copy_folder(ex, ensg1, ensg2, args.af)
+                            rename_pair_folder_direct(ensg1, ensg2, up1, up2)
+                        elif copy_models and "humap" in ex_name:
+                            copy_folder(ex, up1, up2, args.af)
+                df_t.append(extra_df)
+                extra_df = extra_df[0:0]
+
+            df = pd.concat([d for d in df_t])
+            edf.append(df)
+
+        # grab gene from bs for extra files
+        datasets = extract_genes(data, edf, targets, genes)
+
+        if not args.x:
+            datasets = [pd.concat([d for d in datasets])]
+
+    return datasets
+
+
+@timed('merge')
+def merge_target(args, ds, ds_cfg, ds_extra):
+    """
+    Merges the mentha, config and extra files rows of a target (of all the targets without -x)
+
+    :param args: Namespace, parsed command line arguments
+    :param ds: DataFrame, normal_run() rows
+    :param ds_cfg: DataFrame, cfg_run() rows
+    :param ds_extra: DataFrame, process_extra_files() rows
+    :return: DataFrame with the columns of the csv output
+    """
+    result = pd.merge(ds, ds_cfg, how='outer',
+                      left_on=['target uniprot id', 'target uniprot gene', 'interactor uniprot id', 'interactor uniprot gene', 'PDB id'],
+                      right_on=['target uniprot id', 'target uniprot gene', 'interactor uniprot id', 'interactor uniprot gene', 'PDB id'])
+
+    result.replace('na', np.nan, inplace=True)
+
+    l = []
+    dfxF = pd.DataFrame(columns=ds.columns)
+    for i, row in result.iterrows():
+        if row['normal_or_cfg_x'] == 0.0 and pd.isna(row['normal_or_cfg_y']):
+            # row in normal run but not in config
+            lfix = row.iloc[0:20].tolist()
+            l.append(lfix)
+            dfxF.loc[len(dfxF)] = lfix
+        elif row['normal_or_cfg_x'] == 0.0 and row['normal_or_cfg_y'] == 1.0:
+            # row in normal and in config
+            row['pmid'] = str(row['PMID_x']) + ' ' + str(row['PMID_y'])
+            lfix = row.iloc[0:18].tolist() + [row['pmid'], 2]
+            l.append(lfix)
+            dfxF.loc[len(dfxF)] = lfix
+        elif pd.isna(row['normal_or_cfg_x']) and row['normal_or_cfg_y'] == 1.0:
+            # row in cfg but not in normal
+            lfix = row.iloc[0:6].tolist() + row.iloc[21:].tolist()
+            l.append(lfix)
+            dfxF.loc[len(dfxF)] = lfix
+
+
+    dfxF.drop(['normal_or_cfg'], axis=1, inplace=True)
+
+    if args.extra != [] and args.extra != None:
+        for e in args.extra:
+            dfxF[e] = 'na'
+
+    for i,r in ds_extra.iterrows():
+        index_list = []
+        index_list = dfxF[(dfxF['target uniprot id'] == r['target uniprot id']) &
+                          (dfxF['target uniprot gene'] == r['target uniprot gene']) &
+                          (dfxF['interactor uniprot id'] == r['interactor uniprot id']) &
+                          (dfxF['interactor uniprot gene'] == r['interactor uniprot gene'])
+                        ].index.tolist()
+        if index_list  != []:
+            #ds extra row already in dataframe
+            for e in args.extra:
+                dfxF.loc[index_list, e] = r[e]
+
+        else:
+            dfxF.loc[len(dfxF)] = r
+
+    if args.extra == None:
+        # for e in args.extra:
+        #     dfxF.drop([e], axis=1, inplace=True)
+        pass
+    else:
+        # fix col names
+        columns = list(dfxF.columns)
+        columns_to_fix = columns[-len(args.extra):]
+        col_fix = [os.path.basename(c).split('.', 1)[0] for c in columns_to_fix]
+        columns = columns[:-len(args.extra)] + col_fix
+        dfxF.columns = columns
+    # Define new column names
+    new_last_column_name = "pDockQ HuRI"
+    new_second_last_column_name = "pDockQ HuMap"
+
+    # Rename the last two columns
+    dfxF.columns.values[-1] = new_last_column_name
+    dfxF.columns.values[-2] = new_second_last_column_name
+
+    dfxF.sort_values(['target uniprot id', 'mentha score', 'interactor uniprot id', 'PDB id'], ascending=False, inplace=True)
+    dfxF.replace(np.nan, 'na', inplace=True)
+
+    if getattr(args, 'coverage', False):
+        dfxF = add_coverage(dfxF)
+    if getattr(args, 'interfaces', False):
+        dfxF = add_interfaces(dfxF, args.structure_mirror, args.structure_source, args.structure_format,
+                              args.contact_distance, args.interface_jobs)
+
+    return dfxF
+
+def run(args, data=None, extra_data=None):
+    """
+    Runs the mentha, config and extra files annotation and merges them
+
+    :param args: Namespace, parsed command line arguments
+    :param data: DataFrame, filtered mentha database (read from args.i if None)
+    :param extra_data: dict, extra file name -> DataFrame already read (read from disk if None)
+    :return: list of (target, DataFrame), one per target with -x, otherwise one in total
+    """
+    if data is None:
+        data = load_mentha(args.i, args.s)
+
+    datasets, targets = normal_run(args, data)
+    config_datasets = cfg_run(args, data)
+    extra_datasets = process_extra_files(args, args.extra, data, extra_data)
+
+    # if option -a is selected we have to create the AlphaFold inputs of all the pairs of the run
+    if args.a and datasets + (config_datasets or []):
+        make_target_interactor_sequence_files(pd.concat(datasets + (config_datasets or [])),
+                                              getattr(args, 'af_format', None) or ['fasta'], af_prefix(args),
+                                              getattr(args, 'af3_batch_size', AF3_BATCH))
+
+    if config_datasets == [] or config_datasets == None:
+        config_datasets = []
+        for d in datasets:
+            config_datasets.append(pd.DataFrame(columns=d.columns))
+
+    if extra_datasets == [] or extra_datasets == None:
+        extra_datasets = []
+        for d in datasets:
+            extra_datasets.append(pd.DataFrame(columns=d.columns))
+
+    results = []
+    for ds, ds_cfg, ds_extra, target in zip(datasets, config_datasets, extra_datasets, targets):
+        results.append((target.strip(), merge_target(args, ds, ds_cfg, ds_extra)))
+
+    return results
+
+AF_COLUMNS = ['target uniprot id', 'target uniprot gene', 'interactor uniprot id', 'interactor uniprot gene']
+
+def iter_run(args, data=None, extra_data=None):
+    """
+    Runs the targets of a -x run one at a time: every target goes through the mentha,
+    config and extra files annotation and merge, and is yielded as soon as it is done,
+    so that a caller writing it out only keeps one target in memory (see write_streamed()).
+    The extra files pairs and the gene index of the mentha database are computed once
+    for all the targets, and the -a inputs written at the end, from the pairs of all the targets.
+
+    :param args: Namespace, parsed command line arguments, with args.x
+    :param data: DataFrame, filtered mentha database (read from args.i if None)
+    :param extra_data: dict, extra file name -> DataFrame already read (read from disk if None)
+    :return: generator of (target, DataFrame), the results of run() one at a time
+    """
+    if data is None:
+        data = load_mentha(args.i, args.s)
+
+    pairs_scores = genes = None
+    if args.extra:
+        pairs_scores = extra_pairs(args, args.extra, extra_data)
+        genes = gene_index(data)
+
+    af_pairs = []
+    for target in read_targets(args):
+        target_args = argparse.Namespace(**vars(args))
+        target_args.targets = [target]
+
+        datasets, _ = normal_run(target_args, data)
+        config_datasets = cfg_run(target_args, data) or []
+        extra_datasets = process_extra_files(target_args, args.extra, data, extra_data, pairs_scores, genes) or []
+        if args.a:
+            af_pairs.extend(d[AF_COLUMNS].drop_duplicates() for d in datasets + config_datasets)
+
+        empty = pd.DataFrame(columns=datasets[0].columns)
+        yield target.strip(), merge_target(args, datasets[0], (config_datasets or [empty])[0],
+                                           (extra_datasets or [empty])[0])
+
+    if args.a and af_pairs:
+        make_target_interactor_sequence_files(pd.concat(af_pairs), getattr(args, 'af_format', None) or ['fasta'],
+                                              af_prefix(args), getattr(args, 'af3_batch_size', AF3_BATCH))
+
+def af_prefix(args):
+    """
+    Returns the name of the af3 batches, multifasta and manifest files of a run:
+    the -o output name without extension, with the shard of a --shard run
+
+    :param args: Namespace, parsed command line arguments
+    :return: String
+    """
+    prefix = os.path.splitext(os.path.basename(args.o))[0]
+    if getattr(args, 'shard', None):
+        prefix += '.shard-{}-of-{}'.format(*args.shard)
+    return prefix
+
+def mentha_interactors(targets, mentha_file=None, cutoff='0.2', data=None, pmid=True, config='',
+                       extra_files=None, extra_cutoff=0.5, af_folder=None, filter_self=False, extra_data=None,
+                       ensg_xref=None, coverage=False, interfaces=False, structure_mirror=MIRROR_DIR,
+                       structure_source=None, contact_distance=CONTACT_DISTANCE, copy_models=True):
+    """
+    Annotates the mentha interactors of the targets, without writing any file
+    (except the AF_Huri_HuMAP models copied when extra files are given, unless
+    copy_models is False)
+
+    :param targets: list of String, target uniprot ACs
+    :param mentha_file: String, mentha database, not needed if data is given
+    :param cutoff: mentha score cutoff
+    :param data: DataFrame, mentha database already loaded with load_mentha()
+    :param pmid: bool, add the PMID column
+    :param config: String, config file with extra rows (see -c)
+    :param extra_files: list of String, HuRI/HuMAP summary files (see -extra)
+    :param extra_cutoff: float, pDockQ cutoff on extra files
+    :param af_folder: String, AF_Huri_HuMAP folder location
+    :param filter_self: bool, skip interactions of a protein with itself
+    :param extra_data: dict, extra file name -> DataFrame, extra files already read
+    :param ensg_xref: String, Ensembl -> UniProt cross-reference file (see ppi2pdb.ensembl)
+    :param coverage: bool, add the structural coverage columns (see ppi2pdb.coverage)
+    :param interfaces: bool, add the interface contact columns (see ppi2pdb.interfaces)
+    :param structure_mirror: String, folder the structures are downloaded to
+    :param structure_source: String, local folder to read the structures from instead, without downloading
+    :param contact_distance: float, heavy atom distance cutoff of the interface contacts
+    :param copy_models: bool, copy (and rename) the AF_Huri_HuMAP models of the extra files pairs
+    :return: dict, target -> DataFrame with the columns of the csv output
+    """
+    args = argparse.Namespace(i=mentha_file, t=None, targets=list(targets), s=Decimal(str(cutoff)),
+                              filter=filter_self, p=pmid, x=True, a=False, c=config, extra=extra_files,
+                              extra_cutoff=extra_cutoff, af=af_folder, ensg_xref=ensg_xref,
+                              coverage=coverage, interfaces=interfaces, structure_mirror=structure_mirror,
+                              structure_source=structure_source, structure_format='cif',
+                              contact_distance=contact_distance, interface_jobs=None, copy_models=copy_models)
+
+    return dict(run(args, data, extra_data))
+
+# Column types of the parquet/arrow outputs (see ppi2pdb.formats), the pDockQ
+# columns of the extra files are stored as float
+OUTPUT_TYPES = {
+    'target uniprot id': 'string',
+    'target uniprot gene': 'string',
+    'interactor uniprot id': 'string',
+    'interactor uniprot gene': 'string',
+    'mentha score': 'float',
+    'PDB id': 'string',
+    'fusion': 'string',
+    'target chain id': 'list<string>',
+    'target starting residue': 'list<int>',
+    'target ending residue': 'list<int>',
+    'interactor chain id': 'list<string>',
+    'interactor starting residue': 'list<int>',
+    'interactor ending residue': 'list<int>',
+    'other interactors': 'list<string>',
+    'method': 'string',
+    'resolution': 'float',
+    'dna chains': 'int',
+    'num ligands': 'int',
+    'PMID': 'string',
+}
+
+# with --coverage and --interfaces, their columns follow the extra files columns, in that order
+OUTPUT_EXTENDED_TYPES = {**OUTPUT_TYPES, **COVERAGE_TYPES, **INTERFACE_TYPES}
+
+def store_columns(args, df):
+    """
+    Returns df with the names of the columns its values belong to, for the results
+    store: run() always names the last two columns pDockQ HuMap and pDockQ HuRI,
+    which are the num ligands and PMID columns without extra files
+
+    :param args: Namespace, parsed command line arguments
+    :param df: DataFrame, output of run()
+    :return: DataFrame
+    """
+    extra_columns = []
+    for extra in args.extra or []:
+        name = os.path.basename(extra).split('.', 1)[0]
+        if 'huri' in name.lower():
+            name = 'pDockQ HuRI'
+        elif 'humap' in name.lower():
+            name = 'pDockQ HuMap'
+        extra_columns.append(name)
+
+    columns = list(OUTPUT_TYPES) + extra_columns
+    if getattr(args, 'coverage', False):
+        columns += list(COVERAGE_TYPES)
+    if getattr(args, 'interfaces', False):
+        columns += list(INTERFACE_TYPES)
+    if len(columns) != len(df.columns):
+        return df
+    return df.set_axis(columns, axis=1)
+
+
+def main(args):
+    """
+    Runs mentha2pdb with the command line arguments parsed by ppi2pdb.cli
+
+    :param args: Namespace
+    """
+    if getattr(args, 'shard', None):
+        run_shard(args)
+        return
+
+    if len(getattr(args, 'cutoffs', [])) > 1 or len(getattr(args, 'extra_cutoffs', [])) > 1:
+        run_sweep(args)
+        return
+
+    data = load_mentha(args.i, args.s)
+    if args.x:
+        write_streamed(args, data)
+    else:
+        results = run(args, data)
+        write_results(args, results)
+        if getattr(args, 'store', None):
+            store_results(args, 'mentha2pdb', [('mentha', [store_columns(args, df) for _, df in results],
+                                                OUTPUT_EXTENDED_TYPES, [t.strip() for t in read_targets(args)])])
+
+    if getattr(args, 'depth', 1) == 2:
+        write_second_shell(args, data)
+
+def run_shard(args):
+    """
+    Runs the targets of shard args.shard = (i, N) only, and writes them as a
+    shard to be combined by ppi2pdb merge (see ppi2pdb.shard)
+
+    :param args: Namespace, parsed command line arguments
+    """
+    from .shard import shard_targets, write_shard
+
+    index, count = args.shard
+    data = load_mentha(args.i, args.s)
+    all_targets = read_targets(args)
+    args.targets = shard_targets(all_targets, data, index, count)
+
+    if args.targets:
+        results = run(args, data)
+    else:
+        results = []
+    write_shard(results, args.o, index, count, [t.strip() for t in args.targets], len(all_targets), args.x)
+    if getattr(args, 'store', None):
+        store_results(args, 'mentha2pdb', [('mentha', [store_columns(args, df) for _, df in results],
+                                            OUTPUT_EXTENDED_TYPES, [t.strip() for t in args.targets])])
+
+def sweep_output(output, cutoff, extra_cutoff, args):
+    """
+    Returns the output name of a cutoff sweep run: <output up to the first .>
+    followed by _s<cutoff> and/or _ec<extra_cutoff> for the swept cutoffs, with
+    the dots of the cutoffs replaced by p (e.g. out_s0p4_ec0p5.csv), so that the
+    -x names keep working
+
+    :param output: String, -o argument
+    :param cutoff: Decimal, mentha cutoff of the run
+    :param extra_cutoff: float, pDockQ cutoff of the run
+    :param args: Namespace, with the swept cutoffs and extra_cutoffs lists
+    :return: String
+    """
+    tags = ''
+    if len(args.cutoffs) > 1:
+        tags += '_s' + str(cutoff).replace('.', 'p')
+    if len(args.extra_cutoffs) > 1:
+        tags += '_ec' + str(extra_cutoff).replace('.', 'p')
+    return f'{output.split(".")[0]}{tags}.csv'
+
+def run_sweep(args):
+    """
+    Runs every combination of the mentha cutoffs (args.cutoffs) and pDockQ cutoffs
+    (args.extra_cutoffs) and writes one output per combination (see sweep_output()).
+    The mentha database and extra files are read once, and the combinations run
+    from the lowest cutoffs, so that every RCSB, PDBe and UniProt response of the
+    higher cutoffs is already cached: the sweep costs the network calls of one run.
+
+    :param args: Namespace, parsed command line arguments
+    """
+    data = load_mentha(args.i, min(args.cutoffs))
+    extra_data = {e: pd.read_csv(e, sep=',') for e in args.extra or []}
+
+    combinations = [(s, ec) for s in sorted(set(args.cutoffs)) for ec in sorted(set(args.extra_cutoffs))]
+    for n, (cutoff, extra_cutoff) in enumerate(combinations):
+        print(f'>>cutoff sweep: mentha score >= {cutoff}, pDockQ >= {extra_cutoff}')
+        sweep_args = argparse.Namespace(**vars(args))
+        sweep_args.s = cutoff
+        sweep_args.extra_cutoff = extra_cutoff
+        sweep_args.o = sweep_output(args.o, cutoff, extra_cutoff, args)
+        # the models and AF-multimer inputs of the lowest cutoffs include all the others
+        sweep_args.copy_models = n == 0
+        sweep_args.a = args.a and n == 0
+
+        if args.x:
+            write_streamed(sweep_args, data[data['Score'] >= cutoff], extra_data)
+        else:
+            results = run(sweep_args, data[data['Score'] >= cutoff], extra_data)
+            write_results(sweep_args, results)
+
+def output_name(output, target, n_results):
+    """
+    Returns the output file name of target: output itself if the run has a
+    single result, otherwise <output up to the first .>_<target>.csv
+
+    :param output: String, -o argument
+    :param target: String
+    :param n_results: int, number of results of the run
+    :return: String
+    """
+    if n_results == 1:
+        return output
+    splitted_o = output.split('.')
+    #example
+    #args.o = out.csv
+    #csv_outname = out_<target>.csv
+    return f'{splitted_o[0]}_{target}.csv'
+
+def second_shell_name(output, target=None):
+    """
+    Returns the --depth 2 output file name: <output without extension>_second_shell.csv,
+    or <output up to the first .>_<target>_second_shell.csv with -x
+
+    :param output: String, -o argument
+    :param target: String, target of the file with -x, None otherwise
+    :return: String
+    """
+    if target is None:
+        return f'{os.path.splitext(output)[0]}_second_shell.csv'
+    return f'{output.split(".")[0]}_{target}_second_shell.csv'
+
+@timed('write_second_shell')
+def write_second_shell(args, data):
+    """
+    Expands the targets to the partners of their partners (see ppi2pdb.graph)
+    and writes the annotated pairs, one file per target with -x
+
+    :param args: Namespace, parsed command line arguments
+    :param data: DataFrame, filtered mentha database
+    """
+    from .graph import SHELL_COLUMNS, SHELL_TYPES, InteractionGraph, second_shell_interactors
+
+    targets = [t.strip() for t in read_targets(args)]
+    graph = InteractionGraph.from_mentha(data)
+    shells = second_shell_interactors(graph, targets, args.max_fanout)
+    empty = pd.DataFrame(columns=SHELL_COLUMNS)
+
+    if args.x:
+        for target in targets:
+            outname = output_path(second_shell_name(args.o, target), args.format)
+            print(f'>>writing second shell for target {target} -> {outname}')
+            write_table(shells.get(target, empty), outname, args.format, SHELL_TYPES, index=False)
+    else:
+        outname = output_path(second_shell_name(args.o), args.format)
+        print(f'>>writing second shell -> {outname}')
+        write_table(pd.concat([shells.get(t, empty) for t in targets], ignore_index=True) if targets else empty,
+                    outname, args.format, SHELL_TYPES, index=False)
+
+@timed('write_results')
+def write_results(args, results, n_results=None):
+    """
+    Writes the output of run() to csv (or args.format), one file per target with -x
+
+    :param args: Namespace, parsed command line arguments
+    :param results: list of (target, DataFrame)
+    :param n_results: int, number of results of the whole run, len(results) if None
+    """
+    if n_results is None:
+        n_results = len(results)
+    for target, dfxF in results:
+        csv_outname = output_path(output_name(args.o, target, n_results), args.format)
+        if not args.x:
+            print(f'>>writing full dataframe (no splitted option selected -x) -> {csv_outname}')
+        else:
+            print(f'>>writing dataframe for target {target} -> {csv_outname}')
+        write_table(dfxF, csv_outname, args.format, OUTPUT_EXTENDED_TYPES, index=False, quoting=csv.QUOTE_NONE, sep=',')
+
+def write_streamed(args, data, extra_data=None):
+    """
+    Writes a -x run target by target (see iter_run()): the output of every target,
+    and its rows in the results store with --store, are written as soon as the
+    target is done and then released
+
+    :param args: Namespace, parsed command line arguments, with args.x
+    :param data: DataFrame, filtered mentha database
+    :param extra_data: dict, extra file name -> DataFrame already read (read from disk if None)
+    """
+    n_targets = len(read_targets(args))
+    connection = None
+    if getattr(args, 'store', None):
+        connection, run_id = open_run(args, 'mentha2pdb')
+
+    try:
+        n_stored = 0
+        for target, df in iter_run(args, data, extra_data):
+            write_results(args, [(target, df)], n_targets)
+            if connection is not None:
+                n_stored += upsert(connection, 'mentha', run_id, [store_columns(args, df)], OUTPUT_EXTENDED_TYPES,
+                                   [target])
+        if connection is not None:
+            print(f">>stored {n_stored} mentha target(s) in {args.store} (run {run_id})")
+    finally:
+        if connection is not None:
+            connection.close()
@@ -0,0 +1,197 @@
+"""
+Stage timers, HTTP and cache metrics, and the --profile report.
+
+The metrics are always collected, at the cost of a clock read per timed call
+and per request; they are only written when --profile is given. Times of
+functions running in several threads are summed over the threads, and
+nested stages include the time of the stages they call.
+
+Only the standard library is used, so that the command line entry points
+can import this module without slowing down --help.
+"""
+
+import json
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+# Upper bounds of the request latency histogram buckets, in milliseconds
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, float('inf'))
+
+# Path segments looking like identifiers (PDB ids, UniProt ACs, ...) are grouped in the endpoint names
+ID_SEGMENT = re.compile(r'^(?=.*\d)[A-Za-z0-9_.-]{4,}$')
+
+_lock = threading.Lock()
+_start = time.perf_counter()
+stages = defaultdict(lambda: {'calls': 0, 'total_seconds': 0.0, 'min_seconds': float('inf'), 'max_seconds': 0.0})
+endpoints = defaultdict(lambda: {'requests': 0, 'status': Counter(), 'retries': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                 'latency_ms': Counter()})
+caches = defaultdict(lambda: {'hits': 0, 'misses': 0})
+
+
+def reset():
+    global _start
+
+    with _lock:
+        stages.clear()
+        endpoints.clear()
+        caches.clear()
+        _start = time.perf_counter()
+
+
+def add_stage_time(name, seconds):
+    with _lock:
+        stage = stages[name]
+        stage['calls'] += 1
+        stage['total_seconds'] += seconds
+        stage['min_seconds'] = min(stage['min_seconds'], seconds)
+        stage['max_seconds'] = max(stage['max_seconds'], seconds)
+
+
+@contextmanager
+def timer(name):
+    """
+    Times the enclosed block as stage name.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_stage_time(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """
+    Decorator timing every call of the function as stage name.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count_cache(name, hit):
+    """
+    Counts a lookup in the response cache name.
+    """
+    with _lock:
+        caches[name]['hits' if hit else 'misses'] += 1
+
+
+def endpoint_name(service, path):
+    """
+    Returns the name requests to path are grouped under, e.g. 'pdbe /api/pdb/entry/summary/{id}'.
+    """
+    segments = ['{id}' if ID_SEGMENT.match(s) else s for s in path.split('/')]
+    return f"{service or 'other'} {'/'.join(segments)}"
+
+
+def record_response(service, path, response):
+    """
+    Records a response of the shared session: status, latency and urllib3 retries.
+    """
+    latency_ms = response.elapsed.total_seconds() * 1000
+    retries = getattr(response.raw, 'retries', None)
+    retried = len(retries.history) if retries is not None and getattr(retries, 'history', None) else 0
+    bucket = next(b for b in LATENCY_BUCKETS_MS if latency_ms <= b)
+
+    with _lock:
+        endpoint = endpoints[endpoint_name(service, path)]
+        endpoint['requests'] += 1
+        endpoint['status'][str(response.status_code)] += 1
+        endpoint['retries'] += retried
+        endpoint['total_ms'] += latency_ms
+        endpoint['max_ms'] = max(endpoint['max_ms'], latency_ms)
+        endpoint['latency_ms'][bucket] += 1
+
+
+def report():
+    """
+    Returns the collected metrics as a json serializable dict.
+    """
+    with _lock:
+        stage_report = {}
+        for name, stage in sorted(stages.items(), key=lambda s: -s[1]['total_seconds']):
+            stage_report[name] = dict(stage, mean_seconds=stage['total_seconds'] / stage['calls'])
+
+        http_report = {}
+        for name, endpoint in sorted(endpoints.items()):
+            http_report[name] = {
+                'requests': endpoint['requests'],
+                'status': dict(endpoint['status']),
+                'retries': endpoint['retries'],
+                'mean_ms': endpoint['total_ms'] / endpoint['requests'],
+                'max_ms': endpoint['max_ms'],
+                'latency_ms': {('<=%g' % b if b != float('inf') else f'>{LATENCY_BUCKETS_MS[-2]}'):
+                               endpoint['latency_ms'][b] for b in LATENCY_BUCKETS_MS},
+            }
+
+        return {
+            'command': sys.argv,
+            'wall_seconds': time.perf_counter() - _start,
+            'stages': stage_report,
+            'http': {
+                'requests': sum(e['requests'] for e in endpoints.values()),
+                'retries': sum(e['retries'] for e in endpoints.values()),
+                'endpoints': http_report,
+            },
+            'caches': {name: dict(cache) for name, cache in sorted(caches.items())},
+        }
+
+
+def write_report(filename):
+    with open(filename, 'w') as fh:
+        json.dump(report(), fh, indent=2)
+    print(f"Profile written to {filename}")
+
+
+def start_profiler(profiler):
+    if profiler == 'cprofile':
+        import cProfile
+        prof = cProfile.Profile()
+        prof.enable()
+        return prof
+    from pyinstrument import Profiler
+    prof = Profiler()
+    prof.start()
+    return prof
+
+
+def stop_profiler(profiler, prof, profile_file):
+    base = profile_file[:-len('.json')] if profile_file.endswith('.json') else profile_file
+    if profiler == 'cprofile':
+        prof.disable()
+        filename = base + '.prof'
+        prof.dump_stats(filename)
+    else:
+        prof.stop()
+        filename = base + '.html'
+        with open(filename, 'w') as fh:
+            fh.write(prof.output_html())
+    print(f"{profiler} profile written to {filename}")
+
+
+def run_profiled(func, args):
+    """
+    Calls func(args), then writes the metrics to args.profile if given. With
+    args.profiler, the run is also profiled with cProfile (written next to the
+    report as .prof, for pstats or snakeviz) or pyinstrument (.html).
+    """
+    if not args.profile:
+        return func(args)
+
+    reset()
+    prof = start_profiler(args.profiler) if args.profiler else None
+    try:
+        return func(args)
+    finally:
+        if prof is not None:
+            stop_profiler(args.profiler, prof, args.profile)
+        write_report(args.profile)
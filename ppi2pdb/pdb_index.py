@@ -0,0 +1,262 @@
+"""
+Whole-proteome PDB index: the PDB entries of every UniProt AC and the
+entries shared by every interacting pair, precomputed once.
+
+`ppi2pdb build-pdb-index` reads the SIFTS pdb_chain_uniprot.csv(.gz) mapping
+(optionally restricted with pdb_chain_taxonomy.csv(.gz) to the entries with a
+human chain, as the RCSB search of the tools is) into a sparse
+accession x PDB entry incidence matrix. The entries shared by all the mentha
+(and local STRING database) interactions are then computed at once, in
+chunks of edges, as the element-wise product of the incidence rows of the two
+interactors; its non-zeros are the (pair, shared entry) table.
+
+The index directory holds .npy arrays, memory mapped when loaded:
+- accessions.npy, pdbs.npy: sorted UniProt ACs and PDB IDs;
+- incidence.indptr.npy, incidence.indices.npy: the incidence matrix (CSR);
+- pair_keys.npy, pair_indptr.npy, pair_pdbs.npy: the pairs with shared
+  entries, as sorted keys low * n + high of the accession positions, and
+  their shared entries (CSR);
+and shared_pdbs.csv, the pair -> shared PDB entries table, and meta.json.
+
+With --pdb-index, mentha2pdb, string2pdb, the pipeline and the service take
+the PDB entries of the proteins from the index instead of searching RCSB, and
+mentha2pdb looks up the shared entries of the pairs. Building the index
+requires scipy; using it only requires numpy.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .metrics import timed
+
+HUMAN_TAXON_ID = 9606
+
+EDGE_CHUNK = 200_000
+
+_active = None
+
+
+@timed('read_sifts')
+def read_sifts(sifts_file, taxonomy_file=None):
+    """
+    Reads the UniProt AC - PDB entry pairs of the SIFTS pdb_chain_uniprot file.
+
+    Args:
+        sifts_file: pdb_chain_uniprot.csv(.gz).
+        taxonomy_file: pdb_chain_taxonomy.csv(.gz), to keep the entries with a human chain only.
+    Returns:
+        DataFrame with the 'accession' and 'pdb' columns, PDB IDs upper case as returned by RCSB
+    """
+    sifts = pd.read_csv(sifts_file, comment='#', usecols=['PDB', 'SP_PRIMARY'], dtype=str).dropna()
+    sifts = pd.DataFrame({'accession': sifts['SP_PRIMARY'], 'pdb': sifts['PDB'].str.upper()})
+
+    if taxonomy_file:
+        taxonomy = pd.read_csv(taxonomy_file, comment='#', usecols=['PDB', 'TAX_ID'], dtype=str)
+        human = set(taxonomy.loc[taxonomy['TAX_ID'] == str(HUMAN_TAXON_ID), 'PDB'].str.upper())
+        sifts = sifts[sifts['pdb'].isin(human)]
+
+    return sifts.drop_duplicates()
+
+
+def incidence_matrix(sifts):
+    """
+    Returns:
+        (sorted accessions, sorted PDB IDs, boolean CSR incidence matrix accessions x PDB IDs)
+    """
+    from scipy import sparse
+
+    accessions, rows = np.unique(sifts['accession'].to_numpy(dtype=str), return_inverse=True)
+    pdbs, columns = np.unique(sifts['pdb'].to_numpy(dtype=str), return_inverse=True)
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.int8), (rows, columns)),
+                               shape=(len(accessions), len(pdbs)))
+    matrix.sort_indices()
+    return accessions, pdbs, matrix
+
+
+def interaction_pairs(graphs, accessions):
+    """
+    Returns the interacting pairs of the graphs with both proteins in accessions.
+
+    Args:
+        graphs: list of ppi2pdb.graph.InteractionGraph.
+        accessions: sorted array of UniProt ACs.
+    Returns:
+        sorted unique array of pair keys low * len(accessions) + high
+    """
+    n = len(accessions)
+    keys = []
+    for graph in graphs:
+        source = np.repeat(np.arange(len(graph.proteins)), np.diff(graph.indptr))
+        position = pd.Index(accessions).get_indexer(graph.proteins)
+        a, b = position[source], position[graph.indices]
+        known = (a >= 0) & (b >= 0) & (a < b)
+        keys.append(a[known].astype(np.int64) * n + b[known])
+    return np.unique(np.concatenate(keys)) if keys else np.empty(0, np.int64)
+
+
+@timed('shared_pdbs')
+def shared_pdbs(matrix, keys):
+    """
+    Computes the entries shared by the pairs, in chunks of EDGE_CHUNK pairs.
+
+    Returns:
+        (keys of the pairs with shared entries, CSR indptr and PDB columns of their entries)
+    """
+    n = matrix.shape[0]
+    pair_keys, counts, columns = [], [], []
+    for start in range(0, len(keys), EDGE_CHUNK):
+        chunk = keys[start:start + EDGE_CHUNK]
+        shared = matrix[chunk // n].multiply(matrix[chunk % n]).tocsr()
+        shared.eliminate_zeros()
+        shared.sort_indices()
+        chunk_counts = np.diff(shared.indptr)
+        pair_keys.append(chunk[chunk_counts > 0])
+        counts.append(chunk_counts[chunk_counts > 0])
+        columns.append(shared.indices)
+
+    if not pair_keys:
+        return np.empty(0, np.int64), np.zeros(1, np.int64), np.empty(0, np.int32)
+    counts = np.concatenate(counts)
+    indptr = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return np.concatenate(pair_keys), indptr, np.concatenate(columns).astype(np.int32)
+
+
+@timed('build_pdb_index')
+def build_pdb_index(output, sifts_file, taxonomy_file=None, graphs=()):
+    """
+    Builds the PDB index in the output directory.
+
+    Args:
+        output: output directory, created if needed.
+        sifts_file: SIFTS pdb_chain_uniprot file.
+        taxonomy_file: SIFTS pdb_chain_taxonomy file, or None to keep all the entries.
+        graphs: ppi2pdb.graph.InteractionGraph of the networks whose pairs are precomputed.
+    Returns:
+        the meta.json dict
+    """
+    os.makedirs(output, exist_ok=True)
+    accessions, pdbs, matrix = incidence_matrix(read_sifts(sifts_file, taxonomy_file))
+    keys = interaction_pairs(graphs, accessions)
+    pair_keys, pair_indptr, pair_pdbs = shared_pdbs(matrix, keys)
+
+    arrays = {'accessions': accessions, 'pdbs': pdbs,
+              'incidence.indptr': matrix.indptr.astype(np.int64), 'incidence.indices': matrix.indices.astype(np.int32),
+              'pair_keys': pair_keys, 'pair_indptr': pair_indptr, 'pair_pdbs': pair_pdbs}
+    for name, array in arrays.items():
+        np.save(os.path.join(output, name + '.npy'), array)
+
+    n = len(accessions)
+    table = pd.DataFrame({
+        'uniprot a': accessions[pair_keys // n],
+        'uniprot b': accessions[pair_keys % n],
+        'shared PDBs': np.diff(pair_indptr),
+        'PDB ids': [';'.join(pdbs[pair_pdbs[s:e]]) for s, e in zip(pair_indptr[:-1], pair_indptr[1:])],
+    })
+    table.to_csv(os.path.join(output, 'shared_pdbs.csv'), index=False)
+
+    meta = {'accessions': n, 'pdbs': len(pdbs), 'incidences': int(matrix.nnz), 'pairs': len(keys),
+            'pairs_with_shared_pdbs': len(pair_keys),
+            'sources': {'sifts': os.path.abspath(sifts_file),
+                        'taxonomy': os.path.abspath(taxonomy_file) if taxonomy_file else None}}
+    with open(os.path.join(output, 'meta.json'), 'w') as fh:
+        json.dump(meta, fh, indent=2)
+    return meta
+
+
+class PdbIndex:
+    """
+    PDB index written by build_pdb_index().
+
+    Args:
+        path: directory of the index.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as fh:
+            self.meta = json.load(fh)
+        for name in ('accessions', 'pdbs', 'pair_keys', 'pair_indptr', 'pair_pdbs'):
+            setattr(self, name, np.load(os.path.join(path, name + '.npy'), mmap_mode='r'))
+        self.indptr = np.load(os.path.join(path, 'incidence.indptr.npy'), mmap_mode='r')
+        self.indices = np.load(os.path.join(path, 'incidence.indices.npy'), mmap_mode='r')
+
+    def position(self, accession):
+        position = int(np.searchsorted(self.accessions, accession))
+        if position < len(self.accessions) and self.accessions[position] == accession:
+            return position
+        return None
+
+    def entries(self, accession):
+        """
+        Returns the PDB IDs of a UniProt AC ([] if it has none).
+        """
+        position = self.position(accession)
+        if position is None:
+            return []
+        return self.pdbs[self.indices[self.indptr[position]:self.indptr[position + 1]]].tolist()
+
+    def shared(self, a, b):
+        """
+        Returns the set of PDB IDs shared by two UniProt ACs, from the pair table, or
+        from the incidence matrix for pairs that were not precomputed.
+        """
+        position_a, position_b = self.position(a), self.position(b)
+        if position_a is None or position_b is None:
+            return set()
+        low, high = min(position_a, position_b), max(position_a, position_b)
+        key = low * len(self.accessions) + high
+
+        n = int(np.searchsorted(self.pair_keys, key))
+        if n < len(self.pair_keys) and self.pair_keys[n] == key:
+            return set(self.pdbs[self.pair_pdbs[self.pair_indptr[n]:self.pair_indptr[n + 1]]].tolist())
+        return set(self.entries(a)) & set(self.entries(b))
+
+
+def use_pdb_index(path):
+    """
+    Loads the PDB index in path and makes the tools use it instead of the RCSB search.
+    """
+    global _active
+    _active = PdbIndex(path)
+    return _active
+
+
+def active_pdb_index():
+    """
+    Returns the PDB index in use, or None.
+    """
+    return _active
+
+
+def main(args):
+    """
+    Runs build-pdb-index with the command line arguments parsed by ppi2pdb.cli.
+    """
+    from .graph import InteractionGraph
+
+    graphs = []
+    if args.i:
+        from .mentha2pdb import load_mentha
+        print(f"Reading mentha database {args.i}")
+        graphs.append(InteractionGraph.from_mentha(load_mentha(args.i, args.s)))
+    if args.string_db:
+        from .string2pdb import index_aliases, load_aliases
+        from .string_db import load_string_db
+        string_db = load_string_db(args.string_db)
+        aliases = index_aliases(load_aliases(args.aliases_file_path))
+        for network in string_db.networks:
+            print(f"Reading {network} network of {args.string_db}")
+            graphs.append(InteractionGraph.from_string_db(string_db, aliases, network, threshold=0))
+
+    try:
+        meta = build_pdb_index(args.o, args.sifts, args.taxonomy, graphs)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+        exit(1)
+
+    print(f"PDB index written to {args.o} ({meta['accessions']} UniProt ACs, {meta['pdbs']} PDB entries, "
+          f"{meta['pairs_with_shared_pdbs']} of {meta['pairs']} interacting pairs with shared entries)")
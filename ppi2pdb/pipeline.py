@@ -0,0 +1,203 @@
+# PIPELINE
+# Copyright (C) 2024  Eleni Kiachaki and Matteo Tiberti, Cancer Structural Biology, Danish Cancer Institute
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import argparse
+import csv
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from . import aggregate, mentha2pdb, string2pdb
+from .formats import write_table
+from .metrics import timed
+from .shard import shard_targets
+from .store import store_results
+
+
+def read_targets(targets_file):
+    """
+    Reads the target UniProt ACs, one per line, skipping empty lines.
+    """
+    with open(targets_file) as fh:
+        return [line.strip() for line in fh if line.strip()]
+
+
+@timed('run_mentha_stage')
+def run_mentha_stage(args, targets, data=None):
+    """
+    Runs mentha2pdb on all the targets, with one dataframe per target.
+    data is the mentha database, if already loaded.
+
+    Returns:
+        dict of target -> mentha2pdb output dataframe, or the exception raised for that target
+    """
+    mentha_args = argparse.Namespace(i=args.i, t=args.t, targets=targets, s=args.s, filter=args.filter, p=True, x=True, a=False,
+                                     c=args.c, extra=args.extra, extra_cutoff=args.extra_cutoff, af=args.af,
+                                     ensg_xref=args.ensg_xref)
+
+    try:
+        return dict(mentha2pdb.run(mentha_args, data))
+    except Exception as e:
+        print(f"Error: mentha2pdb failed ({e}), retrying the targets one by one")
+
+    # the responses of the targets done before the failure are cached, only the failing ones are lost
+    results = {}
+    for target in targets:
+        try:
+            results.update(mentha2pdb.run(argparse.Namespace(**{**vars(mentha_args), 'targets': [target]}), data))
+        except Exception as e:
+            results[target] = e
+    return results
+
+
+@timed('run_string_stage')
+def run_string_stage(args, targets):
+    """
+    Runs string2pdb on all the targets, one after the other.
+
+    Returns:
+        dict of target -> string2pdb output dataframe, or the exception raised for that target
+    """
+    # indexed once for all the targets: string2uniprot() then looks every STRING ID up in constant time
+    aliases = string2pdb.index_aliases(string2pdb.load_aliases(args.aliases_file_path))
+    string_db = string2pdb.load_string_db(args.string_db) if args.string_db else None
+
+    results = {}
+    for target in targets:
+        print(f"STRING: target {target}")
+        try:
+            results[target] = string2pdb.string2pdb(target, aliases, threshold=args.threshold, network=args.network,
+                                                     string_db=string_db)
+        except Exception as e:
+            results[target] = e
+    return results
+
+
+def load_pdbminer(pdbminer_dir, target):
+    """
+    Reads the pdbminer (<AC>_all.csv) and pdbminer_complexes (<AC>_filtered.csv) outputs of a target.
+    Missing files are replaced by empty dataframes.
+
+    Returns:
+        (pdbminer_complexes dataframe, pdbminer dataframe)
+    """
+    frames = []
+    for key, columns in (("pdbminer_complexes", ["structure_id", "complex_type"]),
+                         ("pdbminer", ["structure_id", "complex_protein"])):
+        path = None
+        if pdbminer_dir is not None:
+            path = os.path.join(pdbminer_dir, target + aggregate.BATCH_SUFFIXES[key])
+        if path is not None and os.path.isfile(path):
+            frames.append(pd.read_csv(path))
+        else:
+            print(f"Warning: no {key} output for target {target}, proceeding without it.")
+            frames.append(pd.DataFrame(columns=columns))
+    return frames
+
+
+def run(args):
+    """
+    Runs the Mentha and STRING stages side by side and aggregates their results per target.
+    All the stages share the connection pool and caches of ppi2pdb.http_client.
+
+    Args:
+        args: Namespace with the options of the pipeline command, see ppi2pdb.cli.
+    Returns:
+        (dict of target -> aggregated dataframe, list of failed targets)
+    """
+    targets = read_targets(args.t)
+
+    mentha_data = None
+    if args.shard:
+        mentha_data = mentha2pdb.load_mentha(args.i, args.s)
+        targets = shard_targets(targets, mentha_data, *args.shard)
+        print(f"Shard {args.shard[0]}/{args.shard[1]}: {len(targets)} targets")
+
+    if args.write_intermediate:
+        os.makedirs(args.o, exist_ok=True)
+
+    # Mentha and STRING stages are mostly waiting on the network, run them side by side:
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        mentha_future = executor.submit(run_mentha_stage, args, targets, mentha_data)
+        string_future = executor.submit(run_string_stage, args, targets)
+        # a stage failing as a whole (e.g. unreadable input) fails all the targets, not the run
+        try:
+            mentha_results = mentha_future.result()
+        except Exception as e:
+            mentha_results = dict.fromkeys(targets, e)
+        try:
+            string_results = string_future.result()
+        except Exception as e:
+            string_results = dict.fromkeys(targets, e)
+
+    results = {}
+    failed = []
+    for target in targets:
+        mentha_df = mentha_results.get(target)
+        string_df = string_results.get(target)
+
+        if isinstance(mentha_df, Exception):
+            print(f"Error: mentha2pdb failed for target {target} ({mentha_df})")
+            failed.append(target)
+            continue
+        if isinstance(string_df, Exception):
+            print(f"Error: string2pdb failed for target {target} ({string_df})")
+            failed.append(target)
+            continue
+
+        if args.write_intermediate:
+            write_table(mentha_df, os.path.join(args.o, f"{target}.csv"), args.format, mentha2pdb.OUTPUT_TYPES,
+                        index=False, quoting=csv.QUOTE_NONE, sep=',')
+            write_table(string_df, os.path.join(args.o, f"{target}_string_interactors.csv"), args.format,
+                        string2pdb.OUTPUT_TYPES, index=False)
+
+        pdbminer_c_df, pdbminer_df = load_pdbminer(args.pdbminer_dir, target)
+
+        try:
+            results[target] = aggregate.aggregate_target(mentha_df, string_df, pdbminer_c_df, pdbminer_df)
+        except ValueError as e:
+            print(f"Error: aggregation failed for target {target} ({e})")
+            failed.append(target)
+
+    if args.store:
+        stored = [t for t in targets if t not in failed]
+        store_results(args, 'pipeline', [
+            ('mentha', [mentha2pdb.store_columns(args, mentha_results[t]) for t in stored if t in mentha_results],
+             mentha2pdb.OUTPUT_TYPES, stored),
+            ('string', [string_results[t] for t in stored if t in string_results], string2pdb.OUTPUT_TYPES, stored),
+            ('aggregate', [results[t] for t in results], aggregate.OUTPUT_TYPES, list(results)),
+        ])
+
+    return results, failed
+
+
+def main(args):
+    """
+    Runs the pipeline with the command line arguments parsed by ppi2pdb.cli.
+    """
+    results, failed = run(args)
+
+    os.makedirs(args.o, exist_ok=True)
+    for target, final_df in results.items():
+        filename = write_table(final_df, os.path.join(args.o, f"{target}_aggregated.csv"), args.format,
+                               aggregate.OUTPUT_TYPES, index=False, na_rep="")
+        print(f"Aggregation complete for {target}. Saved as {filename}.")
+
+    if failed:
+        print(f"Failed targets: {', '.join(failed)}")
+        sys.exit(1)
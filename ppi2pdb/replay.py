@@ -0,0 +1,285 @@
+"""
+Record/replay of the RCSB, PDBe, UniProt and STRING responses.
+
+A cassette directory holds one json file per distinct request, under
+<cassettes>/<service>/<key>.json, where service is a name of
+ppi2pdb.http_client.API_URLS and key a hash of the method, path, query and
+body of the request. The host is not part of the key, so the same cassettes
+are served by:
+
+- CassetteAdapter, a requests transport adapter mounted on the shared session
+  with ppi2pdb.http_client.set_transport() (or PPI2PDB_CASSETTES), which
+  records the responses or replays them in-process;
+- the stand-in server (ppi2pdb replay-server), which serves the cassettes over
+  HTTP with configurable latency and error injection, to be used by pointing
+  the PPI2PDB_<NAME>_URL variables to http://<host>:<port>/<name>.
+
+Text responses are stored as text, the others (e.g. the bcif structure files)
+base64 encoded, and both are replayed byte for byte.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from http.client import responses as http_reasons
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from .http_client import API_URLS, THREAD_POOL, set_api_url, split_api_url
+
+MODES = ('record', 'replay')
+# content types stored as text in the cassettes, besides text/*
+TEXT_TYPES = ('json', 'xml', 'javascript', 'x-www-form-urlencoded')
+
+
+class CassetteMiss(requests.exceptions.ConnectionError):
+    """
+    Raised in replay mode for a request that was not recorded.
+    """
+
+
+def request_key(method, path, query, body):
+    """
+    Returns the cassette key of a request, independent of the host and of the
+    order of the query parameters.
+    """
+    query = urlencode(sorted(parse_qsl(query, keep_blank_values=True)))
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    key = json.dumps([method.upper(), path, query, body or ''])
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def cassette_path(cassettes, service, key):
+    return os.path.join(cassettes, service or '_other', key + '.json')
+
+
+def is_text(content_type):
+    media_type = content_type.split(';')[0].strip().lower()
+    return media_type.startswith('text/') or any(t in media_type for t in TEXT_TYPES)
+
+
+def record_content(record):
+    """
+    Returns the body of a recorded response as bytes.
+    """
+    if 'base64' in record:
+        return base64.b64decode(record['base64'])
+    return record['text'].encode('utf-8')
+
+
+def load_cassette(cassettes, service, method, path, query, body):
+    """
+    Returns the recorded response of a request, or None if it was not recorded.
+    """
+    filename = cassette_path(cassettes, service, request_key(method, path, query, body))
+    if not os.path.isfile(filename):
+        return None
+    with open(filename) as fh:
+        return json.load(fh)
+
+
+def save_cassette(cassettes, service, method, path, query, body, url, response):
+    """
+    Records a response, atomically so that concurrent recorders never leave partial files.
+    """
+    filename = cassette_path(cassettes, service, request_key(method, path, query, body))
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+    record = {
+        'service': service,
+        'method': method.upper(),
+        'url': url,
+        'path': path,
+        'query': query,
+        'body': body,
+        'status': response.status_code,
+        'content_type': response.headers.get('Content-Type', ''),
+    }
+    if is_text(record['content_type']):
+        record['text'] = response.text
+    else:
+        record['base64'] = base64.b64encode(response.content).decode('ascii')
+
+    fd, tmp_name = tempfile.mkstemp(dir=os.path.dirname(filename), suffix='.tmp')
+    with os.fdopen(fd, 'w') as fh:
+        json.dump(record, fh)
+    os.replace(tmp_name, filename)
+
+
+class CassetteAdapter(BaseAdapter):
+    """
+    requests transport adapter recording the responses to a cassette
+    directory, or replaying them from it.
+
+    Args:
+        cassettes: cassette directory.
+        mode: 'record' to send the requests and save the responses, 'replay' to
+            answer from the cassettes only (unrecorded requests raise CassetteMiss).
+    """
+
+    def __init__(self, cassettes, mode='replay'):
+        super().__init__()
+        if mode not in MODES:
+            raise ValueError(f"unknown cassette mode {mode}, expected one of {', '.join(MODES)}")
+        self.cassettes = cassettes
+        self.mode = mode
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._network = HTTPAdapter(pool_maxsize=THREAD_POOL, max_retries=3, pool_block=True) \
+            if mode == 'record' else None
+
+    def send(self, request, **kwargs):
+        service, path, query = split_api_url(request.url)
+
+        if self.mode == 'record':
+            response = self._network.send(request, **kwargs)
+            save_cassette(self.cassettes, service, request.method, path, query, request.body, request.url, response)
+            return response
+
+        record = load_cassette(self.cassettes, service, request.method, path, query, request.body)
+        if record is None:
+            with self._lock:
+                self.misses += 1
+            raise CassetteMiss(f"{request.method} {request.url} is not recorded in {self.cassettes}", request=request)
+
+        return build_response(request, record)
+
+    def close(self):
+        if self._network is not None:
+            self._network.close()
+
+
+def build_response(request, record):
+    response = requests.Response()
+    response.status_code = record['status']
+    response.reason = http_reasons.get(record['status'], '')
+    response.headers = CaseInsensitiveDict({'Content-Type': record['content_type']})
+    response._content = record_content(record)
+    response.encoding = 'utf-8' if 'text' in record else None
+    response.url = request.url
+    response.request = request
+    return response
+
+
+def use_stand_in(url):
+    """
+    Redirects all the API_URLS services to a stand-in server started at url.
+    """
+    for name in list(API_URLS):
+        set_api_url(name, f"{url.rstrip('/')}/{name}")
+
+
+class StandInRequestHandler(BaseHTTPRequestHandler):
+
+    def answer(self):
+        server = self.server
+        service, _, rest = self.path.lstrip('/').partition('/')
+        path, _, query = ('/' + rest).partition('?')
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else None
+
+        if service == '_stats':
+            with server.lock:
+                self.send_text(200, json.dumps(server.stats), 'application/json')
+            return
+
+        with server.lock:
+            server.stats['requests'] += 1
+            delay = server.latency + server.rng.uniform(0, server.jitter)
+            inject_error = server.rng.random() < server.error_rate
+
+        if delay:
+            time.sleep(delay)
+
+        if inject_error:
+            with server.lock:
+                server.stats['injected_errors'] += 1
+            self.send_text(server.error_status, 'stand-in injected error', 'text/plain')
+            return
+
+        record = load_cassette(server.cassettes, service, self.command, path, query, body)
+        if record is None:
+            with server.lock:
+                server.stats['misses'] += 1
+            self.log_message("not recorded: %s %s", self.command, self.path)
+            self.send_text(404, 'not recorded', 'text/plain', {'X-Cassette-Miss': '1'})
+            return
+
+        self.send_text(record['status'], record_content(record), record['content_type'])
+
+    def send_text(self, status, text, content_type, headers=None):
+        body = text if isinstance(text, bytes) else text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = answer
+    do_POST = answer
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+def make_stand_in_server(cassettes, host='127.0.0.1', port=0, latency=0.0, jitter=0.0,
+                         error_rate=0.0, error_status=503, seed=None, quiet=True):
+    """
+    Creates the stand-in server serving cassettes, call serve_forever() on it to start answering.
+
+    Args:
+        cassettes: cassette directory.
+        host, port: address to listen on, port 0 picks a free port (see server.server_address).
+        latency: seconds added to every response.
+        jitter: maximum random seconds added on top of latency.
+        error_rate: fraction of the requests answered with error_status instead of the recording.
+        error_status: HTTP status of the injected errors.
+        seed: seed of the latency and error random generator, for reproducible runs.
+        quiet: do not log every request.
+    """
+    server = ThreadingHTTPServer((host, port), StandInRequestHandler)
+    server.daemon_threads = True
+    server.cassettes = cassettes
+    server.latency = latency
+    server.jitter = jitter
+    server.error_rate = error_rate
+    server.error_status = error_status
+    server.rng = random.Random(seed)
+    server.quiet = quiet
+    server.lock = threading.Lock()
+    server.stats = {'requests': 0, 'misses': 0, 'injected_errors': 0}
+    return server
+
+
+def main(args):
+    """
+    Runs the stand-in server with the command line arguments parsed by ppi2pdb.cli.
+    """
+    server = make_stand_in_server(args.cassettes, args.host, args.port, args.latency, args.jitter,
+                                  args.error_rate, args.error_status, args.seed, quiet=not args.verbose)
+    url = f"http://{args.host}:{server.server_address[1]}"
+    print(f"Serving cassettes from {args.cassettes} on {url}")
+    print("Point the tools to it with:")
+    for name in API_URLS:
+        print(f"  export PPI2PDB_{name.upper()}_URL={url}/{name}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,305 @@
+"""
+Long-running HTTP service answering "interactors + structures for target X" requests.
+
+The Mentha database, the STRING alias table and the HuRI/HuMAP summaries are
+read once at start-up and indexed by UniProt AC, and the RCSB/PDBe caches of
+ppi2pdb.http_client stay warm for the lifetime of the process. Every answer is
+computed with the same functions as mentha2pdb, string2pdb and aggregate, and
+the last --cache-size ones are kept in memory, so a target requested recently
+is answered without any work. The service never writes to its working folder:
+the AF_Huri_HuMAP models of the extra files pairs are not copied.
+
+Endpoints (GET):
+    /mentha/<AC>       mentha2pdb rows
+    /string/<AC>       string2pdb rows
+    /aggregate/<AC>    aggregate rows
+    /health            service status
+
+Rows are returned as a JSON list of records, or as csv with ?format=csv.
+"""
+
+import csv
+import io
+import json
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+import requests
+
+from . import aggregate, mentha2pdb, string2pdb
+from .ensembl import with_name_upac
+from .pipeline import load_pdbminer, read_targets
+
+SOURCES = ('mentha', 'string', 'aggregate')
+
+
+class UnknownTarget(Exception):
+    """
+    Raised when a target cannot be answered from the loaded datasets.
+    """
+
+
+class InteractomeService:
+    """
+    Loaded datasets and computed results shared by all the requests.
+
+    Args:
+        args: Namespace with the options of the serve command, see ppi2pdb.cli.
+    """
+
+    def __init__(self, args):
+        self.args = args
+
+        self.mentha = None
+        self.mentha_rows = {}
+        if args.i:
+            print(f"Loading mentha database {args.i}")
+            self.mentha = mentha2pdb.load_mentha(args.i, args.s)
+            self.mentha_rows = self._index_mentha(self.mentha)
+
+        self.extra_data = {}
+        self.extra_partners = defaultdict(set)
+        for extra_file in args.extra or []:
+            print(f"Loading extra file {extra_file}")
+            self.extra_data[extra_file] = with_name_upac(pd.read_csv(extra_file, sep=','), args.ensg_xref)
+            for pair in self.extra_data[extra_file]['NameUPAC']:
+                up1, up2 = pair.split('-', 1)
+                self.extra_partners[up1].add(up2)
+                self.extra_partners[up2].add(up1)
+
+        self.aliases = None
+        if args.aliases_file_path:
+            print(f"Loading STRING aliases {args.aliases_file_path}")
+            self.aliases = string2pdb.index_aliases(string2pdb.load_aliases(args.aliases_file_path))
+
+        self.string_db = None
+        if args.string_db:
+            print(f"Loading local STRING database {args.string_db}")
+            self.string_db = string2pdb.load_string_db(args.string_db)
+
+        # least recently used first, at most cache_size results
+        self.cache_size = getattr(args, 'cache_size', 1024)
+        self._results = OrderedDict()
+        self._results_lock = threading.Lock()
+        # locks of the computations in progress only
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    @staticmethod
+    def _index_mentha(data):
+        """
+        Indexes the rows of the mentha database by protein.
+
+        Returns:
+            dict of UniProt AC -> positions in the Protein A and Protein B columns, concatenated
+        """
+        proteins = np.concatenate([data['Protein A'].to_numpy(), data['Protein B'].to_numpy()])
+        return pd.Series(proteins).groupby(proteins, sort=False).indices
+
+    def mentha_subset(self, target):
+        """
+        Returns the rows of the mentha database needed to annotate target: the ones involving the
+        target, or any of its extra files partners (used to look up their gene names), in file order.
+        """
+        n = len(self.mentha)
+        positions = [self.mentha_rows[ac] % n for ac in {target} | self.extra_partners[target]
+                     if ac in self.mentha_rows]
+        if not positions:
+            return self.mentha.iloc[0:0]
+        return self.mentha.iloc[np.unique(np.concatenate(positions))]
+
+    def compute(self, source, target):
+        """
+        Computes the rows of source for target, as the corresponding tool would.
+
+        Returns:
+            DataFrame
+        """
+        args = self.args
+
+        if source == 'mentha':
+            if self.mentha is None:
+                raise UnknownTarget("the service was started without a mentha database (-i)")
+            return mentha2pdb.mentha_interactors(
+                [target], data=self.mentha_subset(target), pmid=True, config=args.c,
+                extra_files=args.extra, extra_cutoff=args.extra_cutoff, af_folder=args.af,
+                filter_self=args.filter, extra_data=self.extra_data, ensg_xref=args.ensg_xref,
+                copy_models=False)[target]
+
+        if source == 'string':
+            if self.aliases is None:
+                raise UnknownTarget("the service was started without a STRING alias file")
+            try:
+                return string2pdb.string2pdb(target, self.aliases, threshold=args.threshold, network=args.network,
+                                             string_db=self.string_db)
+            except ValueError as e:
+                raise UnknownTarget(str(e))
+
+        pdbminer_c_df, pdbminer_df = load_pdbminer(args.pdbminer_dir, target)
+        return aggregate.aggregate_target(self.get('mentha', target), self.get('string', target),
+                                          pdbminer_c_df, pdbminer_df)
+
+    def _cached(self, key):
+        """
+        Returns the cached result of key, marking it as recently used, or None.
+        """
+        with self._results_lock:
+            if key not in self._results:
+                return None
+            self._results.move_to_end(key)
+            return self._results[key]
+
+    def get(self, source, target):
+        """
+        Returns the rows of source for target, computing them only if they are not cached.
+        Concurrent requests for the same (source, target) wait for a single computation.
+        """
+        key = (source, target)
+        result = self._cached(key)
+        if result is not None:
+            return result
+
+        with self._locks_lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        try:
+            with lock:
+                result = self._cached(key)
+                if result is None:
+                    result = self.compute(source, target)
+                    with self._results_lock:
+                        self._results[key] = result
+                        while len(self._results) > self.cache_size:
+                            self._results.popitem(last=False)
+        finally:
+            # the threads already waiting on the lock find the result in the cache
+            with self._locks_lock:
+                if self._locks.get(key) is lock:
+                    del self._locks[key]
+        return result
+
+    def status(self):
+        return {
+            'status': 'ok',
+            'mentha_rows': 0 if self.mentha is None else len(self.mentha),
+            'string_aliases': 0 if self.aliases is None else len(self.aliases),
+            'extra_files': list(self.extra_data),
+            'cached_results': len(self._results),
+        }
+
+
+def json_default(value):
+    """
+    json.dumps() fallback for the Decimal and numpy values found in the dataframes.
+    """
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def to_json(df):
+    records = df.astype(object).where(df.notna(), None).to_dict(orient='records')
+    return json.dumps(records, default=json_default)
+
+
+def to_csv(source, df):
+    buffer = io.StringIO()
+    if source == 'mentha':
+        df.to_csv(buffer, index=False, quoting=csv.QUOTE_NONE, sep=',')
+    else:
+        df.to_csv(buffer, index=False, na_rep="")
+    return buffer.getvalue()
+
+
+class InteractomeRequestHandler(BaseHTTPRequestHandler):
+
+    def send_body(self, status, body, content_type, start):
+        body = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('X-Elapsed-ms', f"{(time.perf_counter() - start) * 1000:.3f}")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message, start):
+        self.send_body(status, json.dumps({'error': message}), 'application/json', start)
+
+    def do_GET(self):
+        start = time.perf_counter()
+        service = self.server.service
+        url = urlparse(self.path)
+        parts = [p for p in url.path.split('/') if p]
+        output_format = parse_qs(url.query).get('format', ['json'])[0]
+
+        if parts == ['health']:
+            self.send_body(200, json.dumps(service.status()), 'application/json', start)
+            return
+
+        if len(parts) != 2 or parts[0] not in SOURCES:
+            self.send_error_json(404, f"expected /<source>/<UniProt AC> with source one of {', '.join(SOURCES)}", start)
+            return
+        if output_format not in ('json', 'csv'):
+            self.send_error_json(400, "format must be json or csv", start)
+            return
+
+        source, target = parts[0], parts[1].strip().upper()
+        try:
+            df = service.get(source, target)
+        except UnknownTarget as e:
+            self.send_error_json(404, str(e), start)
+            return
+        except requests.exceptions.RequestException as e:
+            self.send_error_json(502, f"upstream API error: {e}", start)
+            return
+        except (Exception, SystemExit) as e:
+            # SystemExit: a library function exiting must not kill the handler without an answer
+            self.send_error_json(500, f"{type(e).__name__}: {e}", start)
+            return
+
+        if output_format == 'csv':
+            self.send_body(200, to_csv(source, df), 'text/csv', start)
+        else:
+            self.send_body(200, to_json(df), 'application/json', start)
+
+
+def make_server(service, host='127.0.0.1', port=8080):
+    """
+    Creates the threaded HTTP server for service, call serve_forever() on it to start answering.
+    """
+    server = ThreadingHTTPServer((host, port), InteractomeRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main(args):
+    """
+    Runs the service with the command line arguments parsed by ppi2pdb.cli.
+    """
+    service = InteractomeService(args)
+
+    if args.warm:
+        for target in read_targets(args.warm):
+            print(f"Warming up target {target}")
+            for source in SOURCES:
+                try:
+                    service.get(source, target)
+                except Exception as e:
+                    print(f"Warning: could not compute {source} for {target} ({e})")
+
+    server = make_server(service, args.host, args.port)
+    print(f"Serving on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,258 @@
+"""
+Sharded runs of mentha2pdb and the pipeline over large target lists.
+
+--shard i/N keeps the i-th (1-based) of N parts of the target list. The
+parts are computed from the target list and the Mentha database only, so N
+processes or nodes given the same inputs agree on them without coordination,
+and they are balanced by the number of Mentha interactions of the targets
+(the work done for a target is proportional to it) rather than by line.
+
+mentha2pdb shards write <output>.shard-<i>-of-<N>.csv with the rows of their
+targets and a .json sidecar describing the shard; `ppi2pdb merge` combines
+the shards into the single file (or the -x per-target files) that a serial
+run writes.
+"""
+
+import heapq
+import json
+import os
+
+
+def parse_shard(text):
+    """
+    Parses the i/N argument of --shard.
+
+    Returns:
+        (i, N) with 1 <= i <= N
+    Raises:
+        ValueError if text is not a valid shard.
+    """
+    try:
+        index, count = (int(x) for x in text.split('/'))
+    except ValueError:
+        raise ValueError(f"invalid shard {text}, expected i/N, e.g. 1/4")
+    if not 1 <= index <= count:
+        raise ValueError(f"invalid shard {text}, i must be between 1 and N")
+    return index, count
+
+
+def interactor_counts(data, targets):
+    """
+    Returns the number of Mentha interactions of each target.
+
+    Args:
+        data: mentha database loaded with mentha2pdb.load_mentha().
+        targets: list of UniProt ACs.
+    """
+    counts = data['Protein A'].value_counts().add(data['Protein B'].value_counts(), fill_value=0)
+    return [int(counts.get(t.strip(), 0)) for t in targets]
+
+
+def partition_targets(targets, weights, count):
+    """
+    Splits targets into count parts of balanced total weight: targets are assigned heaviest first
+    to the lightest part (longest processing time first). Ties are broken by position, so the
+    result only depends on the inputs.
+
+    Returns:
+        list of count lists of targets, each in the order of targets
+    """
+    order = sorted(range(len(targets)), key=lambda n: (-weights[n], n))
+    loads = [(0, part) for part in range(count)]
+    heapq.heapify(loads)
+    assigned = [[] for _ in range(count)]
+    for n in order:
+        load, part = heapq.heappop(loads)
+        assigned[part].append(n)
+        # every target also costs its own RCSB queries
+        heapq.heappush(loads, (load + weights[n] + 1, part))
+    return [[targets[n] for n in sorted(part)] for part in assigned]
+
+
+def shard_targets(targets, data, index, count):
+    """
+    Returns the targets of shard index (1-based) out of count.
+    """
+    return partition_targets(targets, interactor_counts(data, targets), count)[index - 1]
+
+
+def shard_name(output, index, count, extension):
+    return f"{os.path.splitext(output)[0]}.shard-{index}-of-{count}{extension}"
+
+
+def count_columns():
+    """
+    Returns the positions of the dna chains and num ligands columns, by position:
+    without extra files the num ligands column is named pDockQ HuMap.
+    """
+    from .mentha2pdb import OUTPUT_TYPES
+
+    return [list(OUTPUT_TYPES).index(column) for column in ('dna chains', 'num ligands')]
+
+
+def float_columns(results):
+    """
+    Returns the positions of the count columns that pandas made float in results:
+    a column is float when one of the rows merged with it has a missing value.
+    """
+    return [n for n in count_columns()
+            if any(isinstance(v, float) for _, df in results for v in df.iloc[:, n])]
+
+
+def as_float(line, columns):
+    """
+    Returns line with the integers of the fields at columns written as floats (2 -> 2.0).
+    """
+    fields = line.split(',')
+    for n in columns:
+        if fields[n].lstrip('-').isdigit():
+            fields[n] += '.0'
+    return ','.join(fields)
+
+
+def write_shard(results, output, index, count, targets, all_targets, split):
+    """
+    Writes the mentha2pdb results of a shard and its json sidecar.
+
+    Args:
+        results: list of (target, DataFrame) from mentha2pdb.run().
+        output: the -o output name of the run.
+        index, count: the shard.
+        targets: the targets of the shard.
+        all_targets: number of targets of the whole run.
+        split: whether the run uses -x.
+    Returns:
+        name of the sidecar
+    """
+    import csv
+
+    csv_name = shard_name(output, index, count, '.csv')
+    with open(csv_name, 'w', newline='') as fh:
+        for n, (_, df) in enumerate(results):
+            df.to_csv(fh, index=False, header=(n == 0), quoting=csv.QUOTE_NONE, sep=',')
+
+    sidecar = shard_name(output, index, count, '.json')
+    with open(sidecar, 'w') as fh:
+        json.dump({'shard': index, 'shards': count, 'output': output, 'x': split, 'targets': targets,
+                   'all_targets': all_targets, 'csv': os.path.basename(csv_name),
+                   'float_columns': float_columns(results)}, fh, indent=2)
+
+    print(f">>writing shard {index}/{count} ({len(targets)} targets) -> {csv_name}")
+    return sidecar
+
+
+def read_shards(sidecars):
+    """
+    Reads and checks the sidecars of all the shards of a run.
+
+    Returns:
+        list of (sidecar dict, path of the shard csv), in shard order
+    Raises:
+        ValueError if shards are missing, duplicated or from different runs.
+    """
+    shards = {}
+    for sidecar in sidecars:
+        with open(sidecar) as fh:
+            info = json.load(fh)
+        if info['shard'] in shards:
+            raise ValueError(f"shard {info['shard']} given twice")
+        shards[info['shard']] = (info, os.path.join(os.path.dirname(sidecar), info['csv']))
+
+    first = next(iter(shards.values()))[0]
+    for info, _ in shards.values():
+        for key in ('shards', 'output', 'x', 'all_targets'):
+            if info[key] != first[key]:
+                raise ValueError(f"shards are from different runs ({key}: {first[key]} != {info[key]})")
+
+    missing = sorted(set(range(1, first['shards'] + 1)) - set(shards))
+    if missing:
+        raise ValueError(f"missing shard(s) {', '.join(map(str, missing))} of {first['shards']}")
+
+    return [shards[n] for n in sorted(shards)]
+
+
+def read_shard_rows(csv_name):
+    """
+    Returns the header line and the data lines of a shard csv, grouped by target
+    (the first field), keeping their order.
+    """
+    with open(csv_name, newline='') as fh:
+        lines = fh.readlines()
+    if not lines:
+        return None, {}
+
+    rows = {}
+    for line in lines[1:]:
+        rows.setdefault(line.split(',', 1)[0], []).append(line)
+    return lines[0], rows
+
+
+def merge_shards(sidecars, output=None):
+    """
+    Combines the shards of a mentha2pdb run into the files a serial run writes.
+    Lines are copied verbatim: without -x the targets are ordered as in a serial
+    run (descending target uniprot id), with -x every target gets its own file.
+    Without -x a serial run writes the count columns as floats if any row has a
+    missing value in them, so the shards that wrote them as integers are converted.
+
+    Args:
+        sidecars: json sidecars of all the shards.
+        output: output name, the -o of the shard runs if None.
+    Returns:
+        list of written files
+    """
+    from .mentha2pdb import output_name
+
+    shards = read_shards(sidecars)
+    info = shards[0][0]
+    output = output or info['output']
+
+    header = None
+    rows = {}
+    targets = []
+    floats = set()
+    for shard_info, _ in shards:
+        floats.update(shard_info.get('float_columns', []))
+    for shard_info, csv_name in shards:
+        shard_header, shard_rows = read_shard_rows(csv_name)
+        convert = sorted(floats - set(shard_info.get('float_columns', [])))
+        if convert and not info['x']:
+            shard_rows = {target: [as_float(line, convert) for line in lines]
+                          for target, lines in shard_rows.items()}
+        if shard_header is not None:
+            if header is not None and shard_header != header:
+                raise ValueError(f"{csv_name} does not have the columns of the other shards")
+            header = shard_header
+        rows.update(shard_rows)
+        targets.extend(shard_info['targets'])
+
+    written = []
+    if info['x']:
+        for target in targets:
+            name = output_name(output, target, info['all_targets'])
+            with open(name, 'w', newline='') as fh:
+                fh.write(header or '')
+                fh.writelines(rows.get(target, []))
+            written.append(name)
+    else:
+        with open(output, 'w', newline='') as fh:
+            fh.write(header or '')
+            for target in sorted(rows, reverse=True):
+                fh.writelines(rows[target])
+        written.append(output)
+
+    return written
+
+
+def main(args):
+    """
+    Runs the merge command with the command line arguments parsed by ppi2pdb.cli.
+    """
+    try:
+        written = merge_shards(args.sidecars, args.o)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+        exit(1)
+
+    for name in written:
+        print(f">>merged -> {name}")
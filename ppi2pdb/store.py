@@ -0,0 +1,312 @@
+"""
+Results store: the rows of mentha2pdb, string2pdb and aggregate runs in a
+single SQLite database, queried across runs with `ppi2pdb query`.
+
+With --store results.db the tools upsert their rows per target: the rows of
+a target replace the ones stored for it by a previous run of the same tool,
+so the store always holds the latest answer for every target, and rerunning
+a target never duplicates it. Several runs (e.g. shards) can write to the same
+store, SQLite serializes them.
+
+Tables:
+- runs: one row per run, with the tool, time, package version, --release
+  label and all the options of the run (inputs, cutoffs, ...) as json;
+- targets: (source, target) -> run and number of rows, including the targets
+  without any interactor;
+- rows: one row per output row, with the target and interactor UniProt ACs,
+  the scores used in queries as typed columns, the ';'-separated structures
+  and the whole row as json (nulls for 'na', lists for the list columns);
+- structures: (row, PDB ID) for every structure of the rows.
+
+rows is indexed on the target and interactor ACs and the pDockQ scores, and
+structures on the PDB ID, so that "which targets have a structure with interactor X" or "all pairs
+with pDockQ HuRI > 0.5 and resolution < 3" do not scan the store.
+"""
+
+import csv
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from .formats import typed_column
+
+# Columns of the tool outputs: target, interactor, structure columns, and the
+# output column of each typed column of rows
+SOURCES = {
+    'mentha': {
+        'target': 'target uniprot id',
+        'interactor': 'interactor uniprot id',
+        'structures': ['PDB id'],
+        'scores': {'mentha_score': 'mentha score', 'resolution': 'resolution',
+                   'pdockq_huri': 'pDockQ HuRI', 'pdockq_humap': 'pDockQ HuMap'},
+    },
+    'string': {
+        'target': 'Target_Uniprot_AC',
+        'interactor': 'Interactor_UniProt_AC',
+        'structures': ['PDB_ID'],
+        'scores': {'string_score': 'String_score', 'resolution': 'Resolution'},
+    },
+    'aggregate': {
+        'target': 'Target_Uniprot_AC',
+        'interactor': 'Interactor_UniProt_AC',
+        'structures': ['PPI_Structure', 'PDBminer_complexes_structure', 'PDBminer_structure'],
+        'scores': {'mentha_score': 'Mentha_score', 'string_score': 'String_score'},
+    },
+}
+
+SCORES = ('mentha_score', 'string_score', 'resolution', 'pdockq_huri', 'pdockq_humap')
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    tool TEXT NOT NULL,
+    started TEXT NOT NULL,
+    version TEXT,
+    release TEXT,
+    options TEXT
+);
+CREATE TABLE IF NOT EXISTS targets (
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    run_id INTEGER NOT NULL REFERENCES runs(run_id),
+    n_rows INTEGER NOT NULL,
+    PRIMARY KEY (source, target)
+);
+CREATE TABLE IF NOT EXISTS rows (
+    row_id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    interactor TEXT,
+    {', '.join(f'{score} REAL' for score in SCORES)},
+    structures TEXT,
+    data TEXT NOT NULL,
+    run_id INTEGER NOT NULL REFERENCES runs(run_id)
+);
+CREATE TABLE IF NOT EXISTS structures (
+    row_id INTEGER NOT NULL REFERENCES rows(row_id),
+    pdb TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rows_source_target ON rows (source, target);
+CREATE INDEX IF NOT EXISTS rows_target ON rows (target);
+CREATE INDEX IF NOT EXISTS rows_interactor ON rows (interactor);
+CREATE INDEX IF NOT EXISTS rows_pdockq_huri ON rows (pdockq_huri);
+CREATE INDEX IF NOT EXISTS rows_pdockq_humap ON rows (pdockq_humap);
+CREATE INDEX IF NOT EXISTS structures_pdb ON structures (pdb);
+CREATE INDEX IF NOT EXISTS structures_row ON structures (row_id);
+"""
+
+QUERY_COLUMNS = ['source', 'target', 'interactor', *SCORES, 'structures', 'run_id']
+
+
+def connect(path):
+    """
+    Opens (and creates if needed) the store in path.
+
+    Returns:
+        sqlite3.Connection
+    """
+    connection = sqlite3.connect(path, timeout=600)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def start_run(connection, tool, options, release=None):
+    """
+    Records a run in the runs table.
+
+    Args:
+        connection: store connection.
+        tool: 'mentha2pdb', 'string2pdb', 'aggregate' or 'pipeline'.
+        options: dict of the options of the run.
+        release: free text label of the database releases used, or None.
+    Returns:
+        the run_id
+    """
+    from . import __version__
+
+    with connection:
+        cursor = connection.execute(
+            'INSERT INTO runs (tool, started, version, release, options) VALUES (?, ?, ?, ?, ?)',
+            (tool, time.strftime('%Y-%m-%dT%H:%M:%S'), __version__, release, json.dumps(options, default=str)))
+    return cursor.lastrowid
+
+
+def typed_records(df, column_types):
+    """
+    Returns the rows of a tool output dataframe as dicts of typed values (see ppi2pdb.formats).
+    """
+    columns = {}
+    for column in df.columns:
+        columns[str(column)], _ = typed_column(df[column].tolist(), column_types.get(column))
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+def structure_ids(record, spec):
+    """
+    Returns the structures of a typed row, in column order and without duplicates.
+    """
+    pdbs = []
+    for column in spec['structures']:
+        value = record.get(column)
+        for pdb in value if isinstance(value, list) else [value]:
+            if pdb is not None and pdb not in pdbs:
+                pdbs.append(pdb)
+    return pdbs
+
+
+def upsert(connection, source, run_id, frames, column_types, targets=()):
+    """
+    Replaces the rows of the targets of a run in the store.
+
+    Args:
+        connection: store connection.
+        source: one of SOURCES.
+        run_id: run from start_run().
+        frames: tool output dataframes, with the rows of one or several targets.
+        column_types: output column types of the tool (its OUTPUT_TYPES).
+        targets: targets of the run, stored with 0 rows if they have none.
+    Returns:
+        number of stored targets
+    """
+    spec = SOURCES[source]
+    by_target = {target: [] for target in targets}
+    for df in frames:
+        for record in typed_records(df, column_types):
+            by_target.setdefault(record[spec['target']], []).append(record)
+
+    with connection:
+        for target, records in by_target.items():
+            connection.execute('DELETE FROM structures WHERE row_id IN '
+                               '(SELECT row_id FROM rows WHERE source = ? AND target = ?)', (source, target))
+            connection.execute('DELETE FROM rows WHERE source = ? AND target = ?', (source, target))
+            connection.execute('INSERT OR REPLACE INTO targets (source, target, run_id, n_rows) VALUES (?, ?, ?, ?)',
+                               (source, target, run_id, len(records)))
+            for record in records:
+                pdbs = structure_ids(record, spec)
+                scores = [record.get(spec['scores'][score]) if score in spec['scores'] else None
+                          for score in SCORES]
+                cursor = connection.execute(
+                    f"INSERT INTO rows (source, target, interactor, {', '.join(SCORES)}, structures, data, run_id) "
+                    f"VALUES (?, ?, ?, {', '.join('?' * len(SCORES))}, ?, ?, ?)",
+                    (source, target, record.get(spec['interactor']), *scores, ';'.join(pdbs) or None,
+                     json.dumps(record), run_id))
+                connection.executemany('INSERT INTO structures (row_id, pdb) VALUES (?, ?)',
+                                       [(cursor.lastrowid, pdb) for pdb in pdbs])
+    return len(by_target)
+
+
+def open_run(args, tool):
+    """
+    Opens the store given with --store and records a run in it.
+
+    Args:
+        args: Namespace of the run, with the store and release options; all its options
+              are recorded as provenance.
+        tool: name of the tool recorded in the runs table.
+    Returns:
+        (connection, run_id)
+    """
+    options = {k: v for k, v in vars(args).items() if k not in ('func', 'subparser')}
+    connection = connect(args.store)
+    try:
+        return connection, start_run(connection, tool, options, getattr(args, 'release', None))
+    except BaseException:
+        connection.close()
+        raise
+
+
+def store_results(args, tool, results):
+    """
+    Records a run and upserts its results in the store given with --store.
+
+    Args:
+        args: Namespace of the run, see open_run().
+        tool: name of the tool recorded in the runs table.
+        results: list of (source, frames, column_types, targets), see upsert().
+    """
+    connection, run_id = open_run(args, tool)
+    try:
+        for source, frames, column_types, targets in results:
+            n_targets = upsert(connection, source, run_id, frames, column_types, targets)
+            print(f">>stored {n_targets} {source} target(s) in {args.store} (run {run_id})")
+    finally:
+        connection.close()
+
+
+def query(connection, source=None, target=None, interactor=None, pdb=None, structure=False, minimum=None,
+          maximum=None):
+    """
+    Selects rows of the store.
+
+    Args:
+        connection: store connection.
+        source, target, interactor, pdb: keep the rows with these values (None: any).
+        structure: keep only the rows with at least one structure.
+        minimum, maximum: dicts of score (one of SCORES) -> bound, strict.
+    Returns:
+        list of tuples with the QUERY_COLUMNS
+    """
+    conditions, parameters = [], []
+    for column, value in (('source', source), ('target', target), ('interactor', interactor)):
+        if value is not None:
+            conditions.append(f'{column} = ?')
+            parameters.append(value)
+    if pdb is not None:
+        conditions.append('row_id IN (SELECT row_id FROM structures WHERE pdb = ?)')
+        parameters.append(pdb)
+    if structure:
+        conditions.append('structures IS NOT NULL')
+    for bounds, operator in ((minimum or {}, '>'), (maximum or {}, '<')):
+        for score, bound in bounds.items():
+            if score not in SCORES:
+                raise ValueError(f"unknown score {score}, expected one of {', '.join(SCORES)}")
+            conditions.append(f'{score} {operator} ?')
+            parameters.append(bound)
+
+    sql = f"SELECT {', '.join(QUERY_COLUMNS)} FROM rows"
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    # sorted here: an ORDER BY makes SQLite walk the (source, target) index instead of the selective ones
+    rows = connection.execute(sql, parameters).fetchall()
+    return sorted(rows, key=lambda row: tuple('' if value is None else str(value) for value in row[:3] + row[-2:]))
+
+
+def main(args):
+    """
+    Runs the query command with the command line arguments parsed by ppi2pdb.cli.
+    """
+    if not os.path.isfile(args.store):
+        print(f"Error: {args.store} does not exist")
+        exit(1)
+    connection = connect(args.store)
+
+    if args.runs:
+        cursor = connection.execute('SELECT run_id, tool, started, version, release, '
+                                    '(SELECT COUNT(*) FROM targets WHERE targets.run_id = runs.run_id) '
+                                    'FROM runs ORDER BY run_id')
+        header = ['run_id', 'tool', 'started', 'version', 'release', 'current_targets']
+        rows = cursor.fetchall()
+    else:
+        minimum = {score: getattr(args, f'min_{score}') for score in SCORES
+                   if getattr(args, f'min_{score}', None) is not None}
+        maximum = {score: getattr(args, f'max_{score}') for score in SCORES
+                   if getattr(args, f'max_{score}', None) is not None}
+        start = time.perf_counter()
+        rows = query(connection, args.source, args.target, args.interactor, args.pdb, args.with_structure,
+                     minimum, maximum)
+        header = QUERY_COLUMNS
+        if args.targets_only:
+            header = ['target']
+            rows = sorted({(row[1],) for row in rows})
+        print(f"{len(rows)} row(s) in {(time.perf_counter() - start) * 1000:.1f} ms", file=sys.stderr)
+    connection.close()
+
+    fh = open(args.o, 'w', newline='') if args.o else sys.stdout
+    writer = csv.writer(fh)
+    writer.writerow(header)
+    writer.writerows(rows)
+    if args.o:
+        fh.close()
@@ -0,0 +1,556 @@
+# STRING2PDB
+# Copyright (C) 2024  Eleni Kiachaki and Matteo Tiberti, Cancer Structural Biology, Danish Cancer Institute
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+import requests
+import pandas as pd
+from io import StringIO
+import sys
+
+from .af_inputs import AF3_BATCH, target_pairs, write_af_inputs
+from .formats import write_table
+from . import metrics
+from .metrics import timed
+from .pdb_index import active_pdb_index
+from .store import store_results
+from .string_db import load_string_db
+from .http_client import api_url, entry_cache, get_session, pdb_search_cache
+
+def string2uniprot(stringid, alias_df):
+    """ 
+    Gets all primary UniProt accessions for a given STRING identifier from the preprocessed STRING human protein alias file.
+    Parameter:
+        stringid (str): STRING id to query.   
+        alias_df (DataFrame or dict): alias file from load_aliases(), or its index_aliases() dict.
+    Returns:
+        list of primary UniProt accessions or 'None' if none found.
+    """
+    if isinstance(alias_df, dict):
+        return alias_df.get(stringid)
+
+    # Filter rows where the STRING ID matches the input string ID:
+    matches = alias_df[alias_df['string_protein_id'] == stringid]
+    
+    if matches.empty:
+        return None
+
+    # Return all primary UniProt ACs as a list:
+    return matches['primary_uniprot_ac'].tolist()
+
+
+@timed('query_pdb')
+def query_pdb(protein_identifier):
+    """
+    Queries PDB for entries based on UniProt Accession Code (AC) and human taxonomy ID (9606).
+    Successful queries are cached in pdb_search_cache.
+    Parameter: 
+        protein_identifier (str): Uniprot AC to query.
+    Returns:
+        list of PDB IDs or 'None' if none found.
+    """
+    pdb_index = active_pdb_index()
+    if pdb_index is not None:
+        return pdb_index.entries(protein_identifier)
+
+    metrics.count_cache('pdb_search_cache', protein_identifier in pdb_search_cache)
+    if protein_identifier in pdb_search_cache:
+        return pdb_search_cache[protein_identifier]
+
+    url = api_url('rcsb_search', '/rcsbsearch/v2/query')
+
+    # Construct payload to use UniProt AC and human taxonomy filter
+    payload = {
+        "query": {
+            "type": "group",
+            "logical_operator": "and",
+            "nodes": [
+                {
+                    "type": "group",
+                    "logical_operator": "and",
+                    "nodes": [
+                        {
+                            "type": "terminal",
+                            "service": "text",
+                            "parameters": {
+                                "attribute": "rcsb_polymer_entity_container_identifiers.reference_sequence_identifiers.database_accession",
+                                "operator": "in",
+                                "negation": False,
+                                "value": [protein_identifier] 
+                            }
+                        },
+                        {
+                            "type": "terminal",
+                            "service": "text",
+                            "parameters": {
+                                "attribute": "rcsb_polymer_entity_container_identifiers.reference_sequence_identifiers.database_name",
+                                "operator": "exact_match",
+                                "value": "UniProt",
+                                "negation": False
+                            }
+                        }
+                    ],
+                    "label": "nested-attribute"
+                },
+                {
+                    "type": "terminal",
+                    "service": "text",
+                    "parameters": {
+                        "attribute": "rcsb_entity_source_organism.taxonomy_lineage.id",
+                        "operator": "exact_match",
+                        "negation": False,
+                        "value": "9606"
+                    }
+                }
+            ],
+            "label": "text"
+        },
+        "return_type": "entry",
+        "request_options": {
+            "paginate": {
+                "start": 0,
+                "rows": 10000
+            },
+            "results_content_type": [
+                "experimental"
+            ],
+            "sort": [
+                {
+                    "sort_by": "score",
+                    "direction": "desc"
+                }
+            ],
+            "scoring_strategy": "combined"
+        }
+    }
+
+    headers = {'Content-Type': 'application/json'}
+    
+    try:
+        response = get_session().post(url, headers=headers, json=payload)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        print(f"Error querying PDB for UniProt AC {protein_identifier}: {e}")
+        return None
+
+    # Check if the response is empty:
+    if not response.text.strip():
+        print(f"Empty response for UniProt AC {protein_identifier}: No PDB entries found")
+        return None
+
+    # Get results:
+    results = [entry['identifier'] for entry in response.json().get("result_set", [])]
+    pdb_search_cache[protein_identifier] = results
+    return results  
+
+
+def find_common_pdbs(target_entries, interactor_name):
+    """
+    Finds common PDB entries between target and interactor.
+    Parameters:
+        1. target_entries (list): PDB IDs of the target's Uniprot AC
+        2. interactor_name (str): Uniprot AC of interactor
+    Returns:
+        set of common PDB IDS or 'None' if none is found.
+    """
+    interactor_pdbs = query_pdb(interactor_name)
+
+    if not interactor_pdbs:  # Check if no PDB entries were found
+        print(f"No PDB entries found for interactor: {interactor_name}.")
+        return None  
+
+    # Find common PDB IDs
+    target_ids = set(target_entries)
+    interactor_ids = set(interactor_pdbs)
+
+    common_ids = target_ids & interactor_ids
+    
+    if common_ids:
+        return common_ids  # set of common PDBs
+    else:
+        return None
+
+
+@timed('get_experiment_details')
+def get_experiment_details(common_pdb_ids):
+    """
+    Retrieves experiment details (method and resolution) for the given PDB IDs using the RCSB PDB API.
+    Details are cached per PDB ID in entry_cache.
+    Parameter:
+        PDB ID (str)
+    Returns:
+        Dict with experiment details.
+    """
+    experiment_details = []
+    
+    for pdb in common_pdb_ids:
+        pdb = pdb.strip()
+        metrics.count_cache('entry_cache', pdb in entry_cache)
+        if pdb in entry_cache:
+            experiment_details.append(entry_cache[pdb])
+            continue
+
+        url = api_url('rcsb_data', f'/rest/v1/core/entry/{pdb}')
+        
+        try:
+            response = get_session().get(url)
+            response.raise_for_status()
+            data = response.json()
+        except requests.exceptions.RequestException as e:
+            # raised to the caller: main() exits, the pipeline and the service fail this target only
+            print(f"Error fetching data for PDB ID {pdb}: {e}")
+            raise
+
+        # Get experimental method:
+        experimental_method = data.get('exptl', [{}])[0].get('method', None)
+        if experimental_method in ['NA', None]:  
+            experimental_method = None
+            
+        # Get resolution:
+        resolution = data.get('rcsb_entry_info', {}).get('resolution_combined', [None])[0]
+        if resolution in ['NA', None]:
+            resolution = None
+        else:
+            resolution = str(resolution)  
+
+        # Append to experiment_details:
+        entry_cache[pdb] = {
+            'PDB_ID': pdb,
+            'Experiment_Type': experimental_method,
+            'Resolution': resolution
+        }
+        experiment_details.append(entry_cache[pdb])
+
+    return experiment_details
+
+@timed('make_target_interactor_sequence_files')
+def make_target_interactor_sequence_files(dataframe_out, formats=('fasta',), prefix='inputs', batch_size=AF3_BATCH):
+    """
+    Writes the AlphaFold inputs of the target - interactor pairs of the output
+    in inputs_afmulti, see ppi2pdb.af_inputs
+
+    :param dataframe_out: DataFrame, output rows of one or several targets
+    :param formats: list of String, some of fasta, af3 and multifasta
+    :param prefix: String, name of the af3 batches, multifasta and manifest files
+    :param batch_size: int, number of AlphaFold3 jobs per json file
+    :return: list of String, the written files
+    """
+    pairs = target_pairs(dataframe_out, ('Target_Uniprot_AC', 'Target_protein', 'Interactor_UniProt_AC', 'Interactor'))
+    return write_af_inputs(pairs, formats, prefix, batch_size)
+
+# Columns of the string2pdb output:
+OUTPUT_COLUMNS = ['Target_protein','Target_Uniprot_AC', 'StringID_Target','Interactor', 'Interactor_UniProt_AC', 'StringID_Interactor',
+                  'String_score', 'Experimental_score', 'Database_score', 'Textmining_score', 'PDB_ID', 'Experiment_Type', 'Resolution']
+
+# Column types of the parquet/arrow outputs (see ppi2pdb.formats):
+OUTPUT_TYPES = {
+    'Target_protein': 'string',
+    'Target_Uniprot_AC': 'string',
+    'StringID_Target': 'string',
+    'Interactor': 'string',
+    'Interactor_UniProt_AC': 'string',
+    'StringID_Interactor': 'string',
+    'String_score': 'float',
+    'Experimental_score': 'float',
+    'Database_score': 'float',
+    'Textmining_score': 'float',
+    'PDB_ID': 'string',
+    'Experiment_Type': 'string',
+    'Resolution': 'float'
+}
+
+
+@timed('load_aliases')
+def load_aliases(aliases_file_path):
+    """
+    Loads the pre-processed alias file with STRING ID and UniProt AC mappings.
+    Parameter:
+        aliases_file_path (str): path of the csv generated by string2upac.
+    Returns:
+        DataFrame with the 'string_protein_id' and 'primary_uniprot_ac' columns.
+    """
+    return pd.read_csv(aliases_file_path)
+
+
+def index_aliases(alias_df):
+    """
+    Indexes the alias file by STRING ID, for constant time string2uniprot() lookups.
+    Parameter:
+        alias_df (DataFrame): alias file from load_aliases().
+    Returns:
+        dict of STRING ID -> list of primary UniProt accessions.
+    """
+    return alias_df.groupby('string_protein_id', sort=False)['primary_uniprot_ac'].agg(list).to_dict()
+
+
+@timed('get_string_ids')
+def get_string_ids(identifier, string_db=None):
+    """
+    Maps a Uniprot AC to STRING identifiers, with the STRING API or the local STRING database.
+    Parameters:
+        1. identifier (str): Uniprot AC of the target protein.
+        2. string_db (StringDB): local STRING database, see ppi2pdb.string_db; None to use the STRING API.
+    Returns:
+        DataFrame with a 'stringId' column.
+    """
+    if string_db is not None:
+        return string_db.string_ids(identifier)
+
+    base_url = api_url('string', '/api/tsv/get_string_ids')
+    params = {
+        'identifier': identifier,  
+        'species': 9606,         
+        'limit': 0,  
+        'caller_identity': "MAVISp_web_app"     
+    }
+
+    string_response = get_session().get(base_url, params=params)
+    string_response.raise_for_status()
+
+    # Read tsv data into pandas dataframe:
+    return pd.read_csv(StringIO(string_response.text), sep='\t')
+
+
+@timed('get_interaction_partners')
+def get_interaction_partners(string_id, threshold, network, string_db=None):
+    """
+    Gets the interaction partners of a STRING identifier, with the STRING API or the local STRING database.
+    Parameters:
+        1. string_id (str): STRING identifier of the target protein.
+        2. threshold (float): minimum STRING confidence score.
+        3. network (str): 'physical' or 'functional' STRING network.
+        4. string_db (StringDB): local STRING database, see ppi2pdb.string_db; None to use the STRING API.
+    Returns:
+        DataFrame with the stringId_A/B, preferredName_A/B, score, escore, dscore and tscore columns.
+    """
+    if string_db is not None:
+        return string_db.interaction_partners(string_id, threshold, network)
+
+    interactors_url = api_url('string', '/api/tsv/interaction_partners')
+    interactors_params = {
+        'identifier': string_id,  
+        'species': 9606,
+        'required_score': threshold,
+        'limit': 0,
+        'network_type': network,
+        'caller_identity': "MAVISp_web_app"
+    }
+
+    interactors_response = get_session().get(interactors_url, params=interactors_params)
+    interactors_response.raise_for_status()
+
+    # Read tsv data into pandas dataframe:
+    return pd.read_csv(StringIO(interactors_response.text), sep='\t')
+
+
+@timed('string2pdb')
+def string2pdb(identifier, alias_df, threshold=0.15, network="physical", string_db=None):
+    """
+    Retrieves the STRING interactors of a target and the PDB entries shared with each of them.
+    Parameters:
+        1. identifier (str): Uniprot AC of the target protein.
+        2. alias_df (DataFrame or dict): STRING ID - UniProt AC mappings, see load_aliases() and index_aliases().
+        3. threshold (float): minimum STRING confidence score.
+        4. network (str): 'physical' or 'functional' STRING network.
+        5. string_db (StringDB): local STRING database used instead of the STRING API, see ppi2pdb.string_db.
+    Returns:
+        DataFrame with OUTPUT_COLUMNS, sorted as in the csv output (empty if no interactors are found).
+    Raises:
+        requests.exceptions.RequestException if the STRING API cannot be reached,
+        ValueError if the identifier is not found in STRING.
+    """
+    data = get_string_ids(identifier, string_db)
+
+    # Convert each String_Id to UniProt AC and store in a new column:
+    data['UniProt_AC'] = data['stringId'].apply(lambda x: string2uniprot(x, alias_df))
+
+    # Explode the DataFrame for rows where UniProt_AC has multiple values:
+    data = data.explode('UniProt_AC')
+
+    # Check if identifier is in the converted UniProt_AC column:
+    if identifier not in data['UniProt_AC'].values:
+        raise ValueError(f"No STRING identifier found for {identifier} in the results.")
+
+    # Initialize matching_row to None:
+    matching_row = None 
+
+    # Check for multiple rows with different STRING IDs:
+    unique_string_ids = data['stringId'].nunique()
+
+    if unique_string_ids > 1:
+        print(f"Warning: Multiple STRING IDs found for {identifier}. Proceeding with the String ID whose UniProt AC matches the input identifier:{identifier}.")
+        # Select the row where UniProt_AC matches identifier
+        matching_row = data[data['UniProt_AC'] == identifier]
+        string_id = matching_row.iloc[0]['stringId']
+            
+    else:
+        # Only one unique STRING ID, proceed with it:
+        string_id = data.iloc[0]['stringId']
+
+    # Get interactors from STRING API (or the local STRING database)
+    interactors_df = get_interaction_partners(string_id, threshold, network, string_db)
+
+    # Filter interactors with score >= threshold and (dscore > 0 OR escore > 0):
+    filtered_interactors = interactors_df[
+        (interactors_df['score'] >= threshold) &
+        ((interactors_df['dscore'] > 0) | (interactors_df['escore'] > 0))
+    ].copy()
+
+    # Assign interactor's Uniprot_AC column:
+    filtered_interactors["Interactor_UniProt_AC"] = filtered_interactors["stringId_B"].apply(
+    lambda x: string2uniprot(x, alias_df))
+
+    # Remove rows where no UniProt accession was found for the StringID: 
+    filtered_interactors = filtered_interactors[filtered_interactors["Interactor_UniProt_AC"].notnull()]
+
+    # Explode rows for multiple primary accessions:
+    filtered_interactors = filtered_interactors.explode("Interactor_UniProt_AC")
+
+    # Add target's Uniprot_AC column:
+    filtered_interactors['Target_Uniprot_AC'] = identifier
+
+    if filtered_interactors.empty:
+        print(f"No interactors found with score >= {threshold}.")
+        return pd.DataFrame(columns=OUTPUT_COLUMNS)
+
+    # Extract columns:
+    interactors = filtered_interactors[['preferredName_A','Target_Uniprot_AC', 'stringId_A', 'preferredName_B', 'Interactor_UniProt_AC','stringId_B',
+                                        'score', 'escore', 'dscore', 'tscore']]
+
+
+    # Query PDB for the target protein:
+    target_entries = query_pdb(identifier)
+
+    if not target_entries:
+        print(f"Warning: No PDB entries found for target {identifier}. Proceeding without PDB mapping.")
+
+        interactors = interactors.copy()
+        interactors['PDB_ID'] = None
+        interactors['Experiment_Type'] = None
+        interactors['Resolution'] = None
+                
+        interactors = interactors.rename(columns={
+            'preferredName_A': 'Target_protein',
+            'stringId_A': 'StringID_Target',
+            'preferredName_B': 'Interactor',
+            'stringId_B': 'StringID_Interactor',
+            'score': 'String_score',
+            'escore': 'Experimental_score',
+            'dscore': 'Database_score',
+            'tscore': 'Textmining_score'
+        })
+
+        # Sort the DataFrame: 
+        return interactors.sort_values(
+            by=['String_score','Interactor_UniProt_AC'],  
+            ascending=[False, True]  
+        )
+
+    pdb_columns = []
+    for _, interactor_row in interactors.iterrows():
+        this_interactor = {
+            'Target_protein': interactor_row['preferredName_A'],
+            'Target_Uniprot_AC': interactor_row['Target_Uniprot_AC'],
+            'StringID_Target': interactor_row['stringId_A'],
+            'Interactor': interactor_row['preferredName_B'],
+            'Interactor_UniProt_AC': interactor_row['Interactor_UniProt_AC'],
+            'StringID_Interactor': interactor_row['stringId_B'],
+            'String_score': interactor_row['score'],
+            'Experimental_score': interactor_row['escore'],
+            'Database_score': interactor_row['dscore'],
+            'Textmining_score': interactor_row['tscore']
+        }
+
+        common_pdb_ids = find_common_pdbs(target_entries, interactor_row['Interactor_UniProt_AC'])
+
+        if common_pdb_ids:
+            pdb_details = get_experiment_details(common_pdb_ids)
+            for pdb_info_detail in pdb_details:
+                this_pdb = this_interactor.copy()
+                this_pdb['PDB_ID'] = pdb_info_detail['PDB_ID']
+                this_pdb['Experiment_Type'] = pdb_info_detail['Experiment_Type']
+                this_pdb['Resolution'] = pdb_info_detail['Resolution']
+                pdb_columns.append(this_pdb)
+        else:
+            this_interactor['PDB_ID'] = None
+            this_interactor['Experiment_Type'] = None
+            this_interactor['Resolution'] = None
+            pdb_columns.append(this_interactor)
+
+    # Sort the DataFrame: descending by String_score, then alphabetically by Interactor_UniProt_AC and PDB_ID:
+    return pd.DataFrame(pdb_columns).sort_values(
+        by=['String_score', 'Interactor_UniProt_AC', 'PDB_ID'], 
+        ascending=[False, True, True] 
+    )
+
+
+def main(args):
+    """
+    Runs string2pdb with the command line arguments parsed by ppi2pdb.cli
+    """
+    # Load alias file into DataFrame:
+    try:
+        alias_df = load_aliases(args.aliases_file_path)
+    except Exception as e:
+        print(f"Error: Unable to read alias file {args.aliases_file_path} ({e})")
+        sys.exit(1)
+
+    string_db = None
+    if args.string_db:
+        try:
+            string_db = load_string_db(args.string_db)
+        except Exception as e:
+            print(f"Error: Unable to read local STRING database {args.string_db} ({e})")
+            sys.exit(1)
+
+    try:
+        interactors = string2pdb(args.identifier, alias_df, threshold=args.threshold, network=args.network,
+                                 string_db=string_db)
+    except requests.exceptions.RequestException as e:
+        print(f"Error: Unable to get data ({e})")
+        sys.exit(1)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    # Save the results to CSV (or --format) file:
+    output_file = write_table(interactors, f"{args.identifier}_string_interactors.csv", args.format, OUTPUT_TYPES,
+                              index=False)
+    print(f"Results saved to {output_file}")
+    if args.store:
+        store_results(args, 'string2pdb', [('string', [interactors], OUTPUT_TYPES, [args.identifier])])
+
+    if args.afmulti and not interactors.empty:
+        make_target_interactor_sequence_files(interactors, args.af_format, f"{args.identifier}_string",
+                                              args.af3_batch_size)
+
+    if args.depth == 2:
+        write_second_shell(args, alias_df, string_db)
+
+
+@timed('write_second_shell')
+def write_second_shell(args, alias_df, string_db):
+    """
+    Expands the target to the partners of its STRING partners in the local STRING
+    database (see ppi2pdb.graph) and writes the annotated pairs to
+    <AC>_string_second_shell.csv (or --format).
+    """
+    from .graph import SHELL_COLUMNS, SHELL_TYPES, InteractionGraph, second_shell_interactors
+
+    graph = InteractionGraph.from_string_db(string_db, index_aliases(alias_df), args.network, args.threshold)
+    shell = second_shell_interactors(graph, [args.identifier], args.max_fanout).get(
+        args.identifier, pd.DataFrame(columns=SHELL_COLUMNS))
+    output_file = write_table(shell, f"{args.identifier}_string_second_shell.csv", args.format, SHELL_TYPES,
+                              index=False)
+    print(f"Second shell saved to {output_file}")
@@ -0,0 +1,255 @@
+"""
+Local STRING database built from the bulk downloads, replacing the
+get_string_ids and interaction_partners calls of string2pdb.
+
+`ppi2pdb build-string-db` reads once:
+- 9606.protein.physical.links.detailed.v12.0.txt(.gz) (physical network) and/or
+  9606.protein.links.detailed.v12.0.txt(.gz) (functional network);
+- 9606.protein.info.v12.0.txt(.gz), for the preferred names of the proteins;
+- the string2upac alias csv (string_protein_id, primary_uniprot_ac), for the
+  UniProt AC -> STRING ID lookups;
+
+and writes a directory of .npy arrays, memory mapped when loaded:
+- proteins.npy, names.npy: sorted STRING IDs and their preferred names, the
+  position of a protein in proteins.npy is its integer ID;
+- alias_acs.npy, alias_proteins.npy: UniProt ACs, sorted, and their protein IDs;
+- <network>.indptr.npy, <network>.indices.npy, <network>.scores.npy: the
+  network as a CSR adjacency matrix, with the combined, experimental, database
+  and textmining scores of every edge as float32 (SCORE_COLUMNS);
+- meta.json: networks, sizes and source files.
+
+The bulk links files list every interaction in both directions, so the
+partners of a protein are the edges of its row.
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from .metrics import timed
+
+NETWORKS = ('physical', 'functional')
+
+# interaction_partners columns, in the order of the scores arrays
+SCORE_COLUMNS = ['score', 'escore', 'dscore', 'tscore']
+
+# links.detailed columns of SCORE_COLUMNS; the experimental channel is called
+# 'experiments' in the physical file and 'experimental' in the functional one
+LINKS_COLUMNS = {
+    'physical': ['combined_score', 'experiments', 'database', 'textmining'],
+    'functional': ['combined_score', 'experimental', 'database', 'textmining'],
+}
+
+LINKS_CHUNK_ROWS = 2_000_000
+
+TAXON_ID = 9606
+
+
+def read_info(info_file):
+    """
+    Reads the STRING protein.info file.
+
+    Returns:
+        (sorted array of STRING IDs, array of their preferred names)
+    """
+    info = pd.read_csv(info_file, sep='\t', usecols=[0, 1], dtype=str)
+    info.columns = ['string_protein_id', 'preferred_name']
+    info = info.drop_duplicates('string_protein_id').sort_values('string_protein_id')
+    return info['string_protein_id'].to_numpy(dtype=str), info['preferred_name'].fillna('').to_numpy(dtype=str)
+
+
+def encode(ids, proteins, source):
+    """
+    Returns the integer IDs of ids in the sorted proteins array.
+
+    Raises:
+        ValueError if an ID is not in proteins.
+    """
+    codes = pd.Categorical(ids, categories=proteins).codes
+    if (codes < 0).any():
+        raise ValueError(f"{source}: {ids[np.argmax(codes < 0)]} is not in the protein info file")
+    return codes.astype(np.int32)
+
+
+@timed('read_links')
+def read_links(links_file, network, proteins):
+    """
+    Reads a links.detailed file in chunks, encoding the proteins as integers.
+
+    Returns:
+        (source IDs, target IDs, float32 scores with SCORE_COLUMNS)
+    """
+    columns = LINKS_COLUMNS[network]
+    sources, targets, scores = [], [], []
+    for chunk in pd.read_csv(links_file, sep=' ', usecols=['protein1', 'protein2'] + columns,
+                             dtype={c: np.int16 for c in columns}, chunksize=LINKS_CHUNK_ROWS):
+        sources.append(encode(chunk['protein1'].to_numpy(), proteins, links_file))
+        targets.append(encode(chunk['protein2'].to_numpy(), proteins, links_file))
+        scores.append(chunk[columns].to_numpy(dtype=np.float32) / np.float32(1000))
+
+    if not sources:
+        return np.empty(0, np.int32), np.empty(0, np.int32), np.empty((0, len(columns)), np.float32)
+    return np.concatenate(sources), np.concatenate(targets), np.concatenate(scores)
+
+
+def to_csr(sources, targets, scores, n_proteins):
+    """
+    Sorts the edges by source protein, then by descending combined score.
+
+    Returns:
+        (indptr, indices, scores) of the CSR adjacency matrix
+    """
+    order = np.lexsort((-scores[:, 0], sources))
+    indptr = np.zeros(n_proteins + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n_proteins), out=indptr[1:])
+    return indptr, targets[order], scores[order]
+
+
+@timed('build_string_db')
+def build_string_db(output, info_file, aliases_file, physical=None, functional=None):
+    """
+    Builds the local STRING database in the output directory.
+
+    Args:
+        output: output directory, created if needed.
+        info_file: STRING protein.info file.
+        aliases_file: string2upac alias csv.
+        physical: protein.physical.links.detailed file, or None.
+        functional: protein.links.detailed file, or None.
+    Returns:
+        the meta.json dict
+    """
+    links = {name: path for name, path in zip(NETWORKS, (physical, functional)) if path}
+    if not links:
+        raise ValueError("at least one of the physical and functional links files is needed")
+
+    os.makedirs(output, exist_ok=True)
+    proteins, names = read_info(info_file)
+    np.save(os.path.join(output, 'proteins.npy'), proteins)
+    np.save(os.path.join(output, 'names.npy'), names)
+
+    aliases = pd.read_csv(aliases_file, usecols=['string_protein_id', 'primary_uniprot_ac'], dtype=str).dropna()
+    aliases = aliases[aliases['string_protein_id'].isin(proteins)].drop_duplicates()
+    aliases = aliases.sort_values(['primary_uniprot_ac', 'string_protein_id'])
+    np.save(os.path.join(output, 'alias_acs.npy'), aliases['primary_uniprot_ac'].to_numpy(dtype=str))
+    np.save(os.path.join(output, 'alias_proteins.npy'),
+            encode(aliases['string_protein_id'].to_numpy(), proteins, aliases_file))
+
+    meta = {'proteins': len(proteins), 'aliases': len(aliases), 'networks': {},
+            'sources': {'info': os.path.abspath(info_file), 'aliases': os.path.abspath(aliases_file)}}
+    for network, links_file in links.items():
+        print(f"Reading {network} network {links_file}")
+        indptr, indices, scores = to_csr(*read_links(links_file, network, proteins), len(proteins))
+        np.save(os.path.join(output, f'{network}.indptr.npy'), indptr)
+        np.save(os.path.join(output, f'{network}.indices.npy'), indices)
+        np.save(os.path.join(output, f'{network}.scores.npy'), scores)
+        meta['networks'][network] = {'edges': len(indices)}
+        meta['sources'][network] = os.path.abspath(links_file)
+
+    with open(os.path.join(output, 'meta.json'), 'w') as fh:
+        json.dump(meta, fh, indent=2)
+    return meta
+
+
+class StringDB:
+    """
+    Local STRING database written by build_string_db(), answering the
+    get_string_ids and interaction_partners queries of string2pdb.
+
+    Args:
+        path: directory of the database.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as fh:
+            self.meta = json.load(fh)
+        self.proteins = self._load('proteins')
+        self.names = self._load('names')
+        self.alias_acs = self._load('alias_acs')
+        self.alias_proteins = self._load('alias_proteins')
+        self.networks = {network: tuple(self._load(f'{network}.{part}') for part in ('indptr', 'indices', 'scores'))
+                         for network in self.meta['networks']}
+
+    def _load(self, name):
+        return np.load(os.path.join(self.path, name + '.npy'), mmap_mode='r')
+
+    def protein_id(self, string_id):
+        """
+        Returns the integer ID of a STRING ID, or None if unknown.
+        """
+        position = np.searchsorted(self.proteins, string_id)
+        if position < len(self.proteins) and self.proteins[position] == string_id:
+            return int(position)
+        return None
+
+    def string_ids(self, identifier):
+        """
+        Returns the STRING IDs of a UniProt AC, as the stringId and preferredName
+        columns of get_string_ids (empty if the AC is unknown).
+        """
+        start = int(np.searchsorted(self.alias_acs, identifier, side='left'))
+        end = int(np.searchsorted(self.alias_acs, identifier, side='right'))
+        ids = np.asarray(self.alias_proteins[start:end])
+        return pd.DataFrame({'queryItem': identifier, 'stringId': self.proteins[ids].astype(object),
+                             'preferredName': self.names[ids].astype(object), 'ncbiTaxonId': TAXON_ID})
+
+    def interaction_partners(self, string_id, threshold, network='physical'):
+        """
+        Returns the partners of string_id with combined score >= threshold, with
+        the columns of interaction_partners used by string2pdb, highest score first.
+
+        Raises:
+            ValueError if network is not in the database.
+        """
+        if network not in self.networks:
+            raise ValueError(f"the {network} network is not in the local STRING database {self.path}")
+        indptr, indices, scores = self.networks[network]
+
+        protein = self.protein_id(string_id)
+        if protein is None:
+            start = end = 0
+        else:
+            start, end = int(indptr[protein]), int(indptr[protein + 1])
+        partners = np.asarray(indices[start:end])
+        # scores are stored as float32 thousandths, rounded back to the 3 decimals of the API
+        partner_scores = np.round(np.asarray(scores[start:end], dtype=np.float64), 3)
+
+        keep = partner_scores[:, 0] >= threshold
+        partners, partner_scores = partners[keep], partner_scores[keep]
+
+        n_partners = len(partners)
+        columns = {
+            'stringId_A': np.full(n_partners, string_id, dtype=object),
+            'stringId_B': self.proteins[partners].astype(object),
+            'preferredName_A': np.full(n_partners, self.names[protein] if n_partners else '', dtype=object),
+            'preferredName_B': self.names[partners].astype(object),
+            'ncbiTaxonId': np.full(n_partners, TAXON_ID),
+        }
+        columns.update(zip(SCORE_COLUMNS, partner_scores.T))
+        return pd.DataFrame(columns, copy=False)
+
+
+@timed('load_string_db')
+def load_string_db(path):
+    """
+    Loads the local STRING database written by build_string_db() in path.
+    """
+    return StringDB(path)
+
+
+def main(args):
+    """
+    Runs build-string-db with the command line arguments parsed by ppi2pdb.cli.
+    """
+    try:
+        meta = build_string_db(args.o, args.info, args.aliases_file_path, args.physical, args.functional)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+        exit(1)
+
+    edges = ', '.join(f"{network}: {info['edges']} edges" for network, info in meta['networks'].items())
+    print(f"Local STRING database written to {args.o} ({meta['proteins']} proteins, {meta['aliases']} "
+          f"UniProt ACs, {edges})")